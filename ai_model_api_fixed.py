@@ -1,9 +1,39 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, stream_with_context
 import json
 import os
 import logging
+import tempfile
+import threading
+import time
 from datetime import datetime
-from collections import deque
+
+import json_codec
+import wire_format
+from signal_rules import DECISION_THRESHOLDS, DEFAULT_PATTERN_WEIGHTS, SIGNAL_POLARITY, compile_rules, merge_parameters
+from signal_history import (FIELD_READERS, PAGE_FIELDS, SIGNAL_CODES, SignalHistory, DuplicateOutcome,
+                            OtherWorkerPrediction, encode_context)
+from outcome_stats import BREAKDOWNS, OutcomeStats
+from window_stats import WindowStats, parse_window
+from prediction_log import PredictionLog
+from model_registry import ModelRegistry
+from response_cache import ResponseCache
+from metrics import ENDPOINT_SLOTS, MetricsRegistry, SLOTS, STAGE_SLOTS
+from micro_batch import MicroBatcher
+from confluence import ConfluenceCache, parse_weights
+from option_chain import OptionChainStore
+from streaming_indicators import StreamingEngine
+from traffic_replay import TrafficRecorder
+from warm_start import DEFAULT_MODEL, WarmStart
+
+try:
+    import numpy as np
+except ImportError:  # Batch scoring falls back to the per-snapshot path
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # No flock (Windows): /optimize is only exclusive within a worker
+    fcntl = None
 
 app = Flask(__name__)
 
@@ -11,310 +41,123 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Below this many snapshots the NumPy setup cost outweighs vectorization
+VECTORIZE_MIN_BATCH = 32
+
+# Signal history ring buffer: rows kept per worker, and whether to keep the
+# (zlib-compressed) raw request payloads alongside the fixed-width columns
+SIGNAL_HISTORY_CAPACITY = int(os.environ.get('SIGNAL_HISTORY_CAPACITY', 1000))
+SIGNAL_HISTORY_RAW = os.environ.get('SIGNAL_HISTORY_RAW', '0') == '1'
+
+# Optional prediction/outcome log shared by all workers (see prediction_log.py)
+PREDICTION_LOG_PATH = os.environ.get('PREDICTION_LOG_PATH')
+
+# Bar interval for the /stream_ticks ingestion path
+STREAM_BAR_SECONDS = int(os.environ.get('STREAM_BAR_SECONDS', 60))
+
+# Optional JSON file of tuned weights/thresholds (see weight_optimizer.py). Every
+# worker loads it at startup and reloads it within PARAMETERS_POLL_SECONDS of a change.
+MODEL_PARAMETERS_PATH = os.environ.get('MODEL_PARAMETERS_PATH')
+PARAMETERS_POLL_SECONDS = float(os.environ.get('PARAMETERS_POLL_SECONDS', 5))
+
+# Optional history file (see backtest.py) that POST /optimize fits the default model
+# to, instead of its raw signal history. Clients cannot name a file themselves.
+OPTIMIZER_HISTORY_PATH = os.environ.get('OPTIMIZER_HISTORY_PATH')
+
+# flock()ed while any worker runs /optimize, so only one fits and writes parameters at a time
+OPTIMIZER_LOCK_PATH = (f"{MODEL_PARAMETERS_PATH}.optimize.lock" if MODEL_PARAMETERS_PATH
+                       else os.path.join(tempfile.gettempdir(), 'ai_model_optimize.lock'))
+
+# Optional directory of named model configs, one <name>.json each (see model_registry.py).
+# Requests pick a model with ?model=, or by the payload's strategy or symbol; anything
+# else is scored by the default model. Rescanned every PARAMETERS_POLL_SECONDS.
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR')
+
+# Response cache for repeated polls within a candle (see response_cache.py):
+# entries per worker (0 disables it), seconds an entry stays valid, and
+# whether a cache hit skips recording a duplicate history/log row
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 60))
+RESPONSE_CACHE_DEDUP_HISTORY = os.environ.get('RESPONSE_CACHE_DEDUP_HISTORY', '0') == '1'
+
+# Prometheus metrics (see metrics.py). Point METRICS_DIR at a directory shared
+# by all gunicorn workers so /metrics reports every worker; unset, each worker
+# reports only itself.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+
+# Micro-batching of /predict under the ASGI app (see micro_batch.py): milliseconds a
+# request waits for others to score with (0 disables it), and the batch size that
+# is scored at once without waiting for the window to end
+MICRO_BATCH_WINDOW_MS = float(os.environ.get('MICRO_BATCH_WINDOW_MS', 0))
+MICRO_BATCH_MAX = int(os.environ.get('MICRO_BATCH_MAX', 256))
+
+# Rolling windows reported by /window_stats (see window_stats.py)
+STATS_WINDOWS = tuple(spec.strip() for spec in os.environ.get('STATS_WINDOWS', '5m,1h,1d').split(','))
+
+# Optional capture of every /predict request and its answer, for traffic_replay.py
+TRAFFIC_CAPTURE_PATH = os.environ.get('TRAFFIC_CAPTURE_PATH')
+
+# Optional warm-start snapshots (see warm_start.py): each worker saves its signal history,
+# tracker, breakdowns, rolling windows and prediction log totals to <path>.<boot id> every
+# WARM_START_SAVE_SECONDS and at exit, and a booting worker claims and restores one of them
+WARM_START_PATH = os.environ.get('WARM_START_PATH')
+WARM_START_SAVE_SECONDS = float(os.environ.get('WARM_START_SAVE_SECONDS', 60))
+
+# Option chains held per worker for /option_chain (see option_chain.py); the
+# least recently updated (symbol, expiry) is dropped beyond this many
+OPTION_CHAIN_MAX = int(os.environ.get('OPTION_CHAIN_MAX', 64))
+
+# Multi-timeframe confluence (see confluence.py): weight of each timeframe's technical
+# strength when a /predict payload brings or references higher-timeframe snapshots
+CONFLUENCE_WEIGHTS = parse_weights(os.environ.get('CONFLUENCE_WEIGHTS', '1m:1,5m:0.6,15m:0.4'))
+
+# Largest page /get_stats returns per request
+STATS_MAX_LIMIT = 1000
+
 class ProfessionalTradingAI:
-    def __init__(self):
+    def __init__(self, polarity=SIGNAL_POLARITY):
         self.model_data = {
-            'signals': deque(maxlen=1000),  # Store last 1000 signals for learning
+            'signals': SignalHistory(SIGNAL_HISTORY_CAPACITY, store_raw=SIGNAL_HISTORY_RAW),  # Recent signals for learning
             'accuracy_tracker': {'correct': 0, 'total': 0},
-            'pattern_weights': {
-                # Technical Indicators
-                'rsi_neutral': 0.5,
-                'rsi_oversold': 0.8,
-                'rsi_overbought': 0.8,
-                'ema_bearish': 0.7,
-                'ema_bullish': 0.7,
-                'sma_bearish': 0.7,
-                'sma_bullish': 0.7,
-                'macd_neutral': 0.4,
-                'macd_bullish': 0.8,
-                'macd_bearish': 0.8,
-                'vix_calm': 0.9,
-                'vix_high': -0.6,
-                'bollinger_within': 0.3,
-                'bollinger_oversold': 0.8,
-                'bollinger_overbought': 0.8,
-                'cci_sell': 0.8,
-                'cci_buy': 0.8,
-                'supertrend_bullish': 0.9,
-                'supertrend_bearish': 0.9,
-                'volume_weak': -0.4,
-                'volume_strong': 0.6,
-                'aroon_uptrend': 0.7,
-                'aroon_downtrend': 0.7,
-                'parabolic_bearish': 0.6,
-                'parabolic_bullish': 0.6,
-                'mfi_oversold': 0.8,
-                'mfi_overbought': 0.8,
-                'price_ranging': -0.3,
-                'price_trending': 0.4,
-                'volume_strength_weak': -0.4,
-                'volume_strength_strong': 0.5,
-                'atr_high': -0.2,
-                'atr_low': 0.2,
-                'adx_strong_trend': 0.6,
-                'stochastic_oversold': 0.7,
-                'stochastic_overbought': 0.7,
-                
-                # Writers Zone Analysis
-                'writers_bullish': 0.9,
-                'writers_bearish': 0.9,
-                'writers_neutral': 0.0,
-                'premium_ratio_call_heavy': 0.6,
-                'premium_ratio_put_heavy': 0.6,
-                'premium_ratio_balanced': 0.1,
-                'high_ce_premium': 0.5,
-                'high_pe_premium': 0.5,
-                'strong_support': 0.4,
-                'strong_resistance': 0.4,
-                'market_structure_bullish': 0.3,
-                'market_structure_bearish': 0.3
-            }
+            'outcome_breakdown': OutcomeStats(),  # Feedback attributed to prediction ids
+            'window_stats': WindowStats(STATS_WINDOWS),  # Rolling counters for /window_stats
+            'pattern_weights': dict(DEFAULT_PATTERN_WEIGHTS),
+            # Cutoffs used by make_professional_decision
+            'decision_thresholds': dict(DECISION_THRESHOLDS)
         }
+        # Rule table compiled against the weights and thresholds above (see signal_rules.py).
+        # Requests read self.rules once, so update_parameters() swaps both atomically.
+        self.polarity = polarity
+        self.rules = compile_rules(self.model_data['pattern_weights'], polarity, self.model_data['decision_thresholds'])
+        self._parameters_lock = threading.Lock()
+        self._parameters_mtime = None
+        # Shared on-disk log, attached by the app when PREDICTION_LOG_PATH is set
+        self.prediction_log = None
+        # Results of recent payloads, keyed by rules.decision_key (None when disabled)
+        self.response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL) if RESPONSE_CACHE_SIZE > 0 else None
+        self.dedup_history = RESPONSE_CACHE_DEDUP_HISTORY
+        # Higher-timeframe analyses for confluence payloads, kept until their candle closes
+        self.confluence = ConfluenceCache(CONFLUENCE_WEIGHTS)
+        # Stage latency and prediction counters, attached by the app (see metrics.py)
+        self.metrics = None
         logger.info("Professional Trading AI initialized")
     
     def analyze_technical_indicators(self, data):
         """Analyze comprehensive technical indicators"""
-        signals = []
-        strength = 0
-        
-        # RSI Analysis
-        rsi_value = float(data.get('RSI', {}).get('rsi', 50))
-        rsi_status = data.get('RSI', {}).get('status', 'Neutral')
-        
-        if rsi_value < 30:
-            signals.append("RSI_OVERSOLD")
-            strength += self.model_data['pattern_weights']['rsi_oversold']
-        elif rsi_value > 70:
-            signals.append("RSI_OVERBOUGHT")
-            strength -= self.model_data['pattern_weights']['rsi_overbought']
-        elif rsi_status == 'Neutral':
-            signals.append("RSI_NEUTRAL")
-            strength += self.model_data['pattern_weights']['rsi_neutral']
-        
-        # EMA Analysis
-        ema_status = data.get('EMA20', {}).get('status', 'Neutral')
-        if ema_status == 'Bearish':
-            signals.append("EMA_BEARISH")
-            strength -= self.model_data['pattern_weights']['ema_bearish']
-        elif ema_status == 'Bullish':
-            signals.append("EMA_BULLISH")
-            strength += self.model_data['pattern_weights']['ema_bullish']
-        
-        # SMA Analysis
-        sma_status = data.get('SMA50', {}).get('status', 'Neutral')
-        if sma_status == 'Bearish':
-            signals.append("SMA_BEARISH")
-            strength -= self.model_data['pattern_weights']['sma_bearish']
-        elif sma_status == 'Bullish':
-            signals.append("SMA_BULLISH")
-            strength += self.model_data['pattern_weights']['sma_bullish']
-        
-        # MACD Analysis
-        macd_status = data.get('MACD', {}).get('status', 'Neutral')
-        macd_histogram = float(data.get('MACD', {}).get('histogram', 0))
-        
-        if macd_status == 'Bullish':
-            signals.append("MACD_BULLISH")
-            strength += self.model_data['pattern_weights']['macd_bullish']
-        elif macd_status == 'Bearish':
-            signals.append("MACD_BEARISH")
-            strength -= self.model_data['pattern_weights']['macd_bearish']
-        else:
-            signals.append("MACD_NEUTRAL")
-            strength += self.model_data['pattern_weights']['macd_neutral']
-        
-        # VIX Analysis
-        vix_value = float(data.get('VIX', {}).get('vix', 15))
-        vix_status = data.get('VIX', {}).get('status', 'Normal')
-        
-        if vix_status == 'Calm Market':
-            signals.append("VIX_CALM")
-            strength += self.model_data['pattern_weights']['vix_calm']
-        elif vix_value > 18:
-            signals.append("VIX_HIGH")
-            strength += self.model_data['pattern_weights']['vix_high']
-        
-        # Bollinger Bands Analysis
-        bb_status = data.get('BollingerBands', {}).get('status', 'Within Bands')
-        if bb_status == 'Within Bands':
-            signals.append("BOLLINGER_WITHIN")
-            strength += self.model_data['pattern_weights']['bollinger_within']
-        elif bb_status == 'Above Upper' or bb_status == 'Overbought':
-            signals.append("BOLLINGER_OVERBOUGHT")
-            strength -= self.model_data['pattern_weights']['bollinger_overbought']
-        elif bb_status == 'Below Lower' or bb_status == 'Oversold':
-            signals.append("BOLLINGER_OVERSOLD")
-            strength += self.model_data['pattern_weights']['bollinger_oversold']
-        
-        # CCI Analysis
-        cci_value = float(data.get('CCI', {}).get('value', 0))
-        cci_status = data.get('CCI', {}).get('status', 'Neutral')
-        
-        if cci_status == 'Sell':
-            signals.append("CCI_SELL")
-            strength += self.model_data['pattern_weights']['cci_sell']
-        elif cci_status == 'Buy':
-            signals.append("CCI_BUY")
-            strength += self.model_data['pattern_weights']['cci_buy']
-        
-        # SuperTrend Analysis
-        supertrend_status = data.get('SuperTrend', {}).get('status', 'Neutral')
-        if supertrend_status == 'Bullish':
-            signals.append("SUPERTREND_BULLISH")
-            strength += self.model_data['pattern_weights']['supertrend_bullish']
-        elif supertrend_status == 'Bearish':
-            signals.append("SUPERTREND_BEARISH")
-            strength -= self.model_data['pattern_weights']['supertrend_bearish']
-        
-        # Volume Indicators Analysis
-        volume_status = data.get('VolumeIndicators', {}).get('status', 'Normal')
-        if volume_status == 'Weak':
-            signals.append("VOLUME_WEAK")
-            strength += self.model_data['pattern_weights']['volume_weak']
-        elif volume_status == 'Strong':
-            signals.append("VOLUME_STRONG")
-            strength += self.model_data['pattern_weights']['volume_strong']
-        
-        # Volume Strength Analysis
-        volume_strength = data.get('VolumeStrength', {}).get('type', 'Normal')
-        if volume_strength == 'Weak Volume':
-            signals.append("VOLUME_STRENGTH_WEAK")
-            strength += self.model_data['pattern_weights']['volume_strength_weak']
-        elif volume_strength == 'Strong Volume':
-            signals.append("VOLUME_STRENGTH_STRONG")
-            strength += self.model_data['pattern_weights']['volume_strength_strong']
-        
-        # Aroon Analysis
-        aroon_status = data.get('Aroon', {}).get('status', 'Neutral')
-        if aroon_status == 'Uptrend':
-            signals.append("AROON_UPTREND")
-            strength += self.model_data['pattern_weights']['aroon_uptrend']
-        elif aroon_status == 'Downtrend':
-            signals.append("AROON_DOWNTREND")
-            strength -= self.model_data['pattern_weights']['aroon_downtrend']
-        
-        # Parabolic SAR Analysis
-        psar_status = data.get('ParabolicSAR', {}).get('status', 'Neutral')
-        if psar_status == 'Bearish':
-            signals.append("PARABOLIC_BEARISH")
-            strength -= self.model_data['pattern_weights']['parabolic_bearish']
-        elif psar_status == 'Bullish':
-            signals.append("PARABOLIC_BULLISH")
-            strength += self.model_data['pattern_weights']['parabolic_bullish']
-        
-        # MFI Analysis
-        mfi_value = float(data.get('MFI', {}).get('value', 50))
-        mfi_status = data.get('MFI', {}).get('status', 'Neutral')
-        
-        if mfi_status == 'Oversold':
-            signals.append("MFI_OVERSOLD")
-            strength += self.model_data['pattern_weights']['mfi_oversold']
-        elif mfi_status == 'Overbought':
-            signals.append("MFI_OVERBOUGHT")
-            strength -= self.model_data['pattern_weights']['mfi_overbought']
-        
-        # Price Action Analysis
-        price_action = data.get('PriceAction', {}).get('type', 'Normal')
-        if price_action == 'Ranging':
-            signals.append("PRICE_RANGING")
-            strength += self.model_data['pattern_weights']['price_ranging']
-        elif price_action == 'Trending':
-            signals.append("PRICE_TRENDING")
-            strength += self.model_data['pattern_weights']['price_trending']
-        
-        # ATR Analysis
-        atr_value = float(data.get('ATR', {}).get('value', 20))
-        if atr_value > 25:
-            signals.append("ATR_HIGH")
-            strength += self.model_data['pattern_weights']['atr_high']
-        elif atr_value < 15:
-            signals.append("ATR_LOW")
-            strength += self.model_data['pattern_weights']['atr_low']
-        
-        # ADX Analysis
-        adx_value = float(data.get('ADX', {}).get('value', 20))
-        if adx_value > 25:
-            signals.append("ADX_STRONG_TREND")
-            strength += self.model_data['pattern_weights']['adx_strong_trend']
-        
-        # Stochastic Analysis
-        stoch_value = float(data.get('Stochastic', {}).get('value', 50))
-        stoch_status = data.get('Stochastic', {}).get('status', 'Neutral')
-        if stoch_value < 20:
-            signals.append("STOCHASTIC_OVERSOLD")
-            strength += self.model_data['pattern_weights']['stochastic_oversold']
-        elif stoch_value > 80:
-            signals.append("STOCHASTIC_OVERBOUGHT")
-            strength -= self.model_data['pattern_weights']['stochastic_overbought']
-        
+        signals, strength, _ = self.rules.analyze_technical(data)
         return signals, strength
     
     def analyze_writers_zone(self, writers_data):
         """Analyze Writers Zone Analysis data"""
-        signals = []
-        strength = 0
-        
-        # Extract writers zone data
-        writers_zone = writers_data.get('writersZone', 'NEUTRAL')
-        writers_confidence = float(writers_data.get('confidence', 0))
-        put_call_ratio = float(writers_data.get('putCallPremiumRatio', 1))
-        market_structure = writers_data.get('marketStructure', 'BALANCED')
-        max_ce_ltp = float(writers_data.get('maxCELTP', 0))
-        max_pe_ltp = float(writers_data.get('maxPELTP', 0))
-        support_levels = writers_data.get('supportLevels', [])
-        resistance_levels = writers_data.get('resistanceLevels', [])
-        
-        # Writers Zone Direction Analysis
-        if writers_zone == 'BULLISH' and writers_confidence > 0.3:
-            signals.append("WRITERS_BULLISH")
-            strength += self.model_data['pattern_weights']['writers_bullish'] * writers_confidence
-        elif writers_zone == 'BEARISH' and writers_confidence > 0.3:
-            signals.append("WRITERS_BEARISH")
-            strength -= self.model_data['pattern_weights']['writers_bearish'] * writers_confidence
-        else:
-            signals.append("WRITERS_NEUTRAL")
-            strength += self.model_data['pattern_weights']['writers_neutral']
-        
-        # Put-Call Premium Ratio Analysis
-        if put_call_ratio > 1.2:
-            signals.append("PREMIUM_RATIO_PUT_HEAVY")
-            strength -= self.model_data['pattern_weights']['premium_ratio_put_heavy']
-        elif put_call_ratio < 0.8:
-            signals.append("PREMIUM_RATIO_CALL_HEAVY")
-            strength += self.model_data['pattern_weights']['premium_ratio_call_heavy']
-        else:
-            signals.append("PREMIUM_RATIO_BALANCED")
-            strength += self.model_data['pattern_weights']['premium_ratio_balanced']
-        
-        # Market Structure Analysis
-        if market_structure == 'CALL_PREMIUM_HIGH':
-            signals.append("MARKET_STRUCTURE_BULLISH")
-            strength += self.model_data['pattern_weights']['market_structure_bullish']
-        elif market_structure == 'PUT_PREMIUM_HIGH':
-            signals.append("MARKET_STRUCTURE_BEARISH")
-            strength -= self.model_data['pattern_weights']['market_structure_bearish']
-        
-        # Premium Analysis
-        if max_ce_ltp > max_pe_ltp and max_ce_ltp > 10:
-            signals.append("HIGH_CE_PREMIUM")
-            strength += self.model_data['pattern_weights']['high_ce_premium']
-        elif max_pe_ltp > max_ce_ltp and max_pe_ltp > 10:
-            signals.append("HIGH_PE_PREMIUM")
-            strength -= self.model_data['pattern_weights']['high_pe_premium']
-        
-        # Support and Resistance Analysis
-        if len(support_levels) >= 2:
-            signals.append("STRONG_SUPPORT")
-            strength += self.model_data['pattern_weights']['strong_support']
-        
-        if len(resistance_levels) >= 2:
-            signals.append("STRONG_RESISTANCE")
-            strength -= self.model_data['pattern_weights']['strong_resistance']
-        
+        signals, strength, _ = self.rules.analyze_writers(writers_data)
         return signals, strength
     
-    def professional_signal_generation(self, request_data):
-        """Generate professional trading signals with both technical and writers zone data"""
+    def professional_signal_generation(self, request_data, endpoint='predict'):
+        """Generate professional trading signals with both technical and writers zone data
+
+        endpoint (one of metrics.PREDICTION_ENDPOINTS) labels the error counter
+        when the snapshot cannot be scored.
+        """
         try:
             # Handle both single object and array formats
             if isinstance(request_data, list) and len(request_data) > 0:
@@ -335,48 +178,97 @@ class ProfessionalTradingAI:
             rsi_value = float(technical_data.get('RSI', {}).get('rsi', 50))
             
             # Analyze all components
-            all_signals = []
-            total_strength = 0
-            
-            # Technical Indicators Analysis
-            tech_signals, tech_strength = self.analyze_technical_indicators(technical_data)
-            all_signals.extend(tech_signals)
-            total_strength += tech_strength
-            
-            # Writers Zone Analysis (if data available)
-            if writers_data and 'writersZone' in writers_data:
-                writers_signals, writers_strength = self.analyze_writers_zone(writers_data)
-                all_signals.extend(writers_signals)
-                total_strength += writers_strength
-            
-            # VIX Filter and Market Regime
-            vix_condition = self.determine_vix_condition(vix_value)
+            rules = self.rules
+            has_writers = bool(writers_data) and 'writersZone' in writers_data
+            # A confluence payload's result also depends on other timeframes, so it is never cached
+            multi_timeframe = technical_data.get('timeframes') is not None
+            confluence = None
+            cache = self.response_cache
+            cache_key = cached = None
+            if cache is not None and not multi_timeframe:
+                cache_key = rules.decision_key(technical_data, writers_data, has_writers)
+                if cache_key is not None:
+                    cached = cache.get(cache_key, rules)
             
-            # Professional Decision Making
-            signal, confidence = self.make_professional_decision(
-                all_signals, total_strength, technical_data, writers_data
-            )
+            if cached is None:
+                started = time.perf_counter_ns()
+                all_signals = []
+                total_strength = 0
+                
+                # Technical Indicators Analysis
+                tech_signals, tech_strength, signal_mask = rules.analyze_technical(technical_data)
+                all_signals.extend(tech_signals)
+                total_strength += tech_strength
+                technical_done = writers_done = time.perf_counter_ns()
+                
+                # Writers Zone Analysis (if data available)
+                writers_strength = 0
+                if has_writers:
+                    writers_signals, writers_strength, writers_mask = rules.analyze_writers(writers_data)
+                    all_signals.extend(writers_signals)
+                    total_strength += writers_strength
+                    signal_mask |= writers_mask
+                    writers_done = time.perf_counter_ns()
+                
+                # Multi-timeframe confluence (see confluence.py)
+                if multi_timeframe:
+                    total_strength, confluence = self.confluence.combine(
+                        technical_data, tech_signals, tech_strength, writers_strength, rules
+                    )
+                
+                # VIX Filter and Market Regime
+                vix_condition = self.determine_vix_condition(vix_value)
+                market_regime = self.determine_market_regime(technical_data, writers_data)
+                
+                # Professional Decision Making
+                signal, confidence = self.make_professional_decision(
+                    all_signals, total_strength, technical_data, writers_data, signal_mask, rules
+                )
+                metrics = self.metrics
+                if metrics is not None:
+                    metrics.observe(STAGE_SLOTS['analyze_technical'], technical_done - started)
+                    if has_writers:
+                        metrics.observe(STAGE_SLOTS['analyze_writers'], writers_done - technical_done)
+                    metrics.observe(STAGE_SLOTS['decision'], time.perf_counter_ns() - writers_done)
+                prediction_id = None
+            else:
+                (all_signals, total_strength, signal_mask, vix_condition, market_regime, signal, confidence,
+                 prediction_id) = cached
+                all_signals = list(all_signals)
             
-            # Store for learning
-            signal_data = {
-                'timestamp': datetime.now().isoformat(),
-                'signal': signal,
-                'confidence': confidence,
-                'all_signals': all_signals,
-                'strength': total_strength,
-                'technical_data': technical_data,
-                'writers_data': writers_data
-            }
-            self.model_data['signals'].append(signal_data)
+            # Store for learning; with dedup_history a cache hit reuses the cached prediction's id
+            if cached is None or not self.dedup_history:
+                context = encode_context(market_regime, vix_condition)
+                prediction_id = self.model_data['signals'].append(
+                    signal, confidence, total_strength, signal_mask, ltp, rsi_value, vix_value,
+                    technical_data, writers_data, context=context
+                )
+                if self.prediction_log is not None:
+                    prediction_id = str(self.prediction_log.append_prediction(
+                        signal, confidence, total_strength, signal_mask, ltp, rsi_value, vix_value, context=context
+                    ))
+                else:
+                    prediction_id = self.model_data['signals'].prediction_id(prediction_id)
+                    self.model_data['window_stats'].record_prediction(
+                        SIGNAL_CODES.get(signal, 0), confidence, context, time.time()
+                    )
+            if cached is None and cache_key is not None:
+                cache.put(cache_key, rules, (
+                    tuple(all_signals), total_strength, signal_mask, vix_condition, market_regime,
+                    signal, confidence, prediction_id
+                ))
+            if self.metrics is not None:
+                self.metrics.inc(SLOTS[('predictions_total', signal)])
             
-            return {
+            result = {
                 'signal': signal,
                 'confidence': round(confidence, 3),
+                'prediction_id': prediction_id,
                 'analysis': {
                     'detected_signals': all_signals,
                     'total_strength': round(total_strength, 2),
                     'vix_condition': vix_condition,
-                    'market_regime': self.determine_market_regime(technical_data, writers_data),
+                    'market_regime': market_regime,
                     'ltp': ltp,
                     'signal_count': len(all_signals),
                     'writers_zone': writers_data.get('writersZone', 'UNKNOWN'),
@@ -384,9 +276,14 @@ class ProfessionalTradingAI:
                 },
                 'timestamp': datetime.now().isoformat()
             }
+            if confluence is not None:
+                result['confluence'] = confluence
+            return result
             
         except Exception as e:
             logger.error(f"Error in signal generation: {e}")
+            if self.metrics is not None:
+                self.metrics.inc(SLOTS[('prediction_errors_total', endpoint)])
             return {
                 'signal': 'HOLD',
                 'confidence': 0.0,
@@ -394,6 +291,115 @@ class ProfessionalTradingAI:
                 'timestamp': datetime.now().isoformat()
             }
     
+    def record_outcome(self, predicted_signal, actual_outcome, prediction_id=None, pnl=None, holding_seconds=None):
+        """Count trade feedback in the worker tracker and the shared log
+
+        With a prediction_id (from the /predict response), the outcome, P&L and
+        holding time are attached to that prediction and counted in the
+        breakdowns. The id is a string: a record number in the shared log when
+        there is one, otherwise "<boot id>:<seq>" (see SignalHistory). Raises
+        ValueError for a malformed id, KeyError for an unknown one,
+        OtherWorkerPrediction for an id another worker handed out and
+        DuplicateOutcome for a prediction that already has an outcome.
+        """
+        correct = actual_outcome == 'correct'
+        pnl = float('nan') if pnl is None else float(pnl)
+        holding_seconds = float('nan') if holding_seconds is None else float(holding_seconds)
+        if self.prediction_log is not None:
+            if prediction_id is not None:
+                prediction_id = int(prediction_id)
+            self.prediction_log.append_outcome(predicted_signal, correct, prediction_id=prediction_id,
+                                               pnl=pnl, holding_seconds=holding_seconds)
+        else:
+            if prediction_id is not None:
+                history = self.model_data['signals']
+                signal_code, signal_mask, context = history.record_outcome(
+                    history.resolve_id(prediction_id), correct, pnl, holding_seconds
+                )
+                self.model_data['outcome_breakdown'].add(signal_code, signal_mask, context, correct, pnl,
+                                                         holding_seconds)
+            self.model_data['window_stats'].record_outcome(correct, pnl, time.time())
+        self.model_data['accuracy_tracker']['total'] += 1
+        if correct:
+            self.model_data['accuracy_tracker']['correct'] += 1
+    
+    def window_report(self, window):
+        """Rolling statistics for one of STATS_WINDOWS, ending now
+
+        Read from the shared prediction log when enabled, like tracker_totals.
+        """
+        if self.prediction_log is not None:
+            return self.prediction_log.window_report(window, time.time())
+        return self.model_data['window_stats'].report(window, time.time())
+    
+    def outcome_breakdown(self, breakdown, limit=None, min_outcomes=1):
+        """Attributed outcomes grouped by signal, regime, vix_condition or combination
+
+        Read from the shared prediction log when enabled, like tracker_totals.
+        """
+        if self.prediction_log is not None:
+            return self.prediction_log.breakdown(breakdown, limit, min_outcomes)
+        return self.model_data['outcome_breakdown'].report(breakdown, limit, min_outcomes)
+    
+    def tracker_totals(self):
+        """Return (correct, total feedback, total signals)
+
+        Read from the shared prediction log when enabled, so every worker
+        reports the same numbers; otherwise from this worker's memory.
+        """
+        if self.prediction_log is not None:
+            stats = self.prediction_log.stats()
+            return stats['correct'], stats['outcomes'], stats['predictions']
+        tracker = self.model_data['accuracy_tracker']
+        return tracker['correct'], tracker['total'], len(self.model_data['signals'])
+    
+    def update_parameters(self, pattern_weights=None, decision_thresholds=None, polarity=None):
+        """Compile new weights, thresholds and/or polarity and swap them in atomically
+
+        Keys not given keep their current values. The new rule table is built
+        before the swap, so requests in flight finish on the old one and later
+        requests see the new one; none are blocked or dropped.
+        """
+        with self._parameters_lock:
+            weights, thresholds = merge_parameters(self.rules.pattern_weights, self.rules.decision_thresholds,
+                                                   pattern_weights, decision_thresholds)
+            rules = compile_rules(weights, polarity or self.polarity, thresholds)
+            self.rules = rules
+            self.polarity = rules.polarity
+            self.model_data['pattern_weights'] = weights
+            self.model_data['decision_thresholds'] = thresholds
+        return rules
+
+    def save_parameters(self, path, **info):
+        """Write the current weights and thresholds to a JSON file (atomically replaced)"""
+        rules = self.rules
+        document = dict(info, pattern_weights=rules.pattern_weights,
+                        decision_thresholds=rules.decision_thresholds,
+                        updated_at=datetime.now().isoformat())
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(document, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def load_parameters(self, path):
+        """Apply weights and thresholds from a file written by save_parameters"""
+        mtime = os.stat(path).st_mtime_ns
+        with open(path) as f:
+            document = json.load(f)
+        self.update_parameters(document.get('pattern_weights'), document.get('decision_thresholds'))
+        self._parameters_mtime = mtime
+
+    def refresh_parameters(self, path):
+        """Reload the parameters file if another process has replaced it since the last load"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._parameters_mtime:
+            return False
+        self.load_parameters(path)
+        return True
+
     def determine_vix_condition(self, vix):
         """Determine VIX condition"""
         if vix > 25:
@@ -405,8 +411,15 @@ class ProfessionalTradingAI:
         else:
             return "NORMAL_VOLATILITY"
     
-    def make_professional_decision(self, signals, strength, technical_data, writers_data):
-        """Make professional trading decision based on all factors"""
+    def make_professional_decision(self, signals, strength, technical_data, writers_data, signal_mask=None, rules=None):
+        """Make professional trading decision based on all factors
+
+        signal_mask is the bitmask the rule engine returns alongside the signal
+        names; when omitted it is rebuilt from the names. rules is the
+        CompiledRules the strength was computed with (default: the current one).
+        """
+        if rules is None:
+            rules = self.rules
         
         # Extract key values
         vix_value = float(technical_data.get('VIX', {}).get('vix', 15))
@@ -415,19 +428,16 @@ class ProfessionalTradingAI:
         aroon_status = technical_data.get('Aroon', {}).get('status', 'Neutral')
         writers_zone = writers_data.get('writersZone', 'NEUTRAL')
         writers_confidence = float(writers_data.get('confidence', 0))
+        thresholds = rules.decision_thresholds
         
         # VIX Filter - No trading in high volatility
         if vix_value > 18:
             return 'HOLD', 0.0
         
-        # Count bullish and bearish signals
-        bullish_signals = [s for s in signals if any(word in s for word in 
-                          ['BULLISH', 'OVERSOLD', 'BUY', 'UPTREND', 'STRONG', 'ABOVE', 'CALM'])]
-        bearish_signals = [s for s in signals if any(word in s for word in 
-                          ['BEARISH', 'OVERBOUGHT', 'SELL', 'DOWNTREND', 'WEAK', 'BELOW', 'HIGH'])]
-        
-        bullish_count = len(bullish_signals)
-        bearish_count = len(bearish_signals)
+        # Count bullish and bearish signals (popcounts over precomputed polarity masks)
+        if signal_mask is None:
+            signal_mask = rules.signal_mask(signals)
+        bullish_count, bearish_count = rules.count_directions(signal_mask)
         
         # Base confidence from signal strength
         base_confidence = min(abs(strength) / 4.0, 1.0)  # Normalize to 0-1
@@ -440,7 +450,7 @@ class ProfessionalTradingAI:
             writers_boost = 0.2
         
         # Professional decision logic
-        if strength > 2.0 and bullish_count >= 4:
+        if strength > thresholds['strong_strength'] and bullish_count >= thresholds['strong_signal_count']:
             # Very strong bullish setup
             if supertrend_status == 'Bullish' and rsi_value < 60 and writers_zone == 'BULLISH':
                 return 'BUY_CE', min(base_confidence + writers_boost + 0.2, 0.95)
@@ -449,7 +459,7 @@ class ProfessionalTradingAI:
             else:
                 return 'BUY_CE', min(base_confidence + writers_boost, 0.8)
                 
-        elif strength < -2.0 and bearish_count >= 4:
+        elif strength < -thresholds['strong_strength'] and bearish_count >= thresholds['strong_signal_count']:
             # Very strong bearish setup
             if supertrend_status == 'Bearish' and rsi_value > 40 and writers_zone == 'BEARISH':
                 return 'BUY_PE', min(base_confidence + writers_boost + 0.2, 0.95)
@@ -458,14 +468,14 @@ class ProfessionalTradingAI:
             else:
                 return 'BUY_PE', min(base_confidence + writers_boost, 0.8)
                 
-        elif abs(strength) > 1.5:
+        elif abs(strength) > thresholds['moderate_strength']:
             # Moderate signals with writers zone confirmation
             if strength > 0 and bullish_count > bearish_count:
                 confidence = max(base_confidence + writers_boost, 0.65)
-                return 'BUY_CE', confidence if confidence >= 0.75 else 0.0
+                return 'BUY_CE', confidence if confidence >= thresholds['moderate_min_confidence'] else 0.0
             elif strength < 0 and bearish_count > bullish_count:
                 confidence = max(base_confidence + writers_boost, 0.65)
-                return 'BUY_PE', confidence if confidence >= 0.75 else 0.0
+                return 'BUY_PE', confidence if confidence >= thresholds['moderate_min_confidence'] else 0.0
         
         # Default to HOLD if insufficient conviction
         return 'HOLD', 0.0
@@ -495,89 +505,881 @@ class ProfessionalTradingAI:
         else:
             return "SIDEWAYS_MARKET"
 
+    def _split_request(self, request_data):
+        """Resolve technical and writers zone payloads the same way as professional_signal_generation"""
+        if isinstance(request_data, list) and len(request_data) > 0:
+            technical_data = request_data[0]
+        else:
+            technical_data = request_data
+        writers_data = request_data.get('writersZone', {}) if isinstance(request_data, dict) else {}
+        if 'writersZone' in technical_data:
+            writers_data = technical_data
+        return technical_data, writers_data
+
+    def score_feature_matrix(self, features, rules=None):
+        """Score an encoded feature matrix against pattern_weights in one vectorized pass
+
+        Returns (signal_names, fired, total_strength, signal_codes, confidence) where
+        fired is a boolean matrix with one column per entry of signal_names.
+        """
+        if rules is None:
+            rules = self.rules
+        fired, total_strength, signal_codes, confidence = rules.score_decisions(features)
+        return rules.signal_names, fired, total_strength, signal_codes, confidence
+
+    def professional_signal_generation_batch(self, snapshots, endpoint='predict_batch'):
+        """Generate signals for many snapshots, scoring them in a single vectorized pass
+
+        Each result is identical to professional_signal_generation for the same
+        snapshot. Snapshots that cannot be encoded go through the scalar path so
+        they produce the same error response, and so do confluence payloads.
+        """
+        if np is None or len(snapshots) < VECTORIZE_MIN_BATCH:
+            return [self.professional_signal_generation(snapshot, endpoint) for snapshot in snapshots]
+
+        rules = self.rules
+        results = [None] * len(snapshots)
+        rows, positions, payloads = [], [], []
+        for i, snapshot in enumerate(snapshots):
+            try:
+                technical_data, writers_data = self._split_request(snapshot)
+                has_writers = bool(writers_data) and 'writersZone' in writers_data
+                # Confluence payloads also depend on other timeframes (see confluence.py)
+                row = None if technical_data.get('timeframes') is not None else rules.encode(
+                    technical_data, writers_data, has_writers
+                )
+            except Exception:
+                row = None
+            if row is None:
+                results[i] = self.professional_signal_generation(snapshot, endpoint)
+                continue
+            rows.append(row)
+            positions.append(i)
+            payloads.append((technical_data, writers_data))
+
+        if rows:
+            features = np.array(rows, dtype=np.float64)
+            writers = [(writers_data.get('writersZone', 'UNKNOWN'), writers_data.get('confidence', 0))
+                       for _, writers_data in payloads]
+            for i, result in zip(positions, self._score_features(features, payloads, writers, rules)):
+                results[i] = result
+        return results
+
+    def professional_signal_generation_records(self, records, endpoint='predict_batch'):
+        """Generate signals for binary wire records (see wire_format.py)
+
+        Each result is identical to professional_signal_generation for the JSON
+        payload the record encodes, except that writers_confidence is always a
+        number. Small batches decode into payloads for the scalar path; larger
+        ones are copied column by column into a feature matrix and scored in
+        one vectorized pass.
+        """
+        if len(records) < VECTORIZE_MIN_BATCH:
+            return [self.professional_signal_generation(payload, endpoint)
+                    for payload in wire_format.to_payloads(records)]
+        if self.model_data['signals'].raw is not None:
+            payloads = [(payload, payload if 'writersZone' in payload else {})
+                        for payload in wire_format.to_payloads(records)]
+        else:
+            payloads = [(None, None)] * len(records)
+        rules = self.rules
+        return self._score_features(wire_format.to_features(records, rules), payloads,
+                                    wire_format.writers_echo(records), rules)
+
+    def _score_features(self, features, payloads, writers, rules):
+        """Results for the rows of a feature matrix encoded for rules
+
+        payloads are the (technical_data, writers_data) each row's history entry
+        records, and writers the (writers_zone, writers_confidence) it reports.
+        """
+        signal_names, fired, total_strength, signal_codes, confidence = self.score_feature_matrix(features, rules)
+        regimes = rules.regime_matrix(features).tolist()
+        vix_conditions = rules.vix_condition_matrix(features).tolist()
+        fired_rows = fired.tolist()
+        total_strength = total_strength.tolist()
+        signals = np.select([signal_codes == 1, signal_codes == -1], ['BUY_CE', 'BUY_PE'], 'HOLD').tolist()
+        confidence = confidence.tolist()
+        ltps = rules.column(features, 'ltp').tolist()
+        rsis = rules.column(features, 'rsi').tolist()
+        vixes = rules.column(features, 'vix').tolist()
+        signal_bits = np.left_shift(1, np.arange(len(signal_names), dtype=np.int64))
+        signal_masks = (fired.astype(np.int64) @ signal_bits).tolist()
+        timestamp = datetime.now().isoformat()
+
+        contexts = [encode_context(regime, vix_condition) for regime, vix_condition in zip(regimes, vix_conditions)]
+        first_logged = None
+        if self.prediction_log is not None:
+            first_logged = self.prediction_log.append_predictions(
+                zip(signals, confidence, total_strength, signal_masks, ltps, rsis, vixes, contexts)
+            )
+        else:
+            window_stats = self.model_data['window_stats']
+            now = time.time()
+            for k in range(len(signals)):
+                window_stats.record_prediction(SIGNAL_CODES.get(signals[k], 0), confidence[k], contexts[k], now)
+        if self.metrics is not None:
+            for label in ('BUY_CE', 'BUY_PE', 'HOLD'):
+                self.metrics.inc(SLOTS[('predictions_total', label)], signals.count(label))
+
+        results = []
+        for k, (technical_data, writers_data) in enumerate(payloads):
+            all_signals = [name for name, hit in zip(signal_names, fired_rows[k]) if hit]
+            prediction_id = self.model_data['signals'].append(
+                signals[k], confidence[k], total_strength[k], signal_masks[k], ltps[k], rsis[k], vixes[k],
+                technical_data, writers_data, context=contexts[k]
+            )
+            if first_logged is not None:
+                prediction_id = str(first_logged + k)
+            else:
+                prediction_id = self.model_data['signals'].prediction_id(prediction_id)
+            results.append({
+                'signal': signals[k],
+                'confidence': round(confidence[k], 3),
+                'prediction_id': prediction_id,
+                'analysis': {
+                    'detected_signals': all_signals,
+                    'total_strength': round(total_strength[k], 2),
+                    'vix_condition': vix_conditions[k],
+                    'market_regime': regimes[k],
+                    'ltp': ltps[k],
+                    'signal_count': len(all_signals),
+                    'writers_zone': writers[k][0],
+                    'writers_confidence': writers[k][1]
+                },
+                'timestamp': timestamp
+            })
+        return results
+
+
 # Initialize the AI model
 trading_ai = ProfessionalTradingAI()
+if PREDICTION_LOG_PATH:
+    trading_ai.prediction_log = PredictionLog(PREDICTION_LOG_PATH, STATS_WINDOWS)
+    logger.info(f"Shared prediction log: {PREDICTION_LOG_PATH}")
+metrics_registry = MetricsRegistry(METRICS_DIR)
+trading_ai.metrics = metrics_registry
 
-@app.route('/predict', methods=['POST'])
-def predict():
-    """Main prediction endpoint"""
-    try:
+# Restored before MODEL_PARAMETERS_PATH is loaded, so the parameters file still wins
+warm_start = None
+if WARM_START_PATH:
+    warm_start = WarmStart(WARM_START_PATH, WARM_START_SAVE_SECONDS,
+                           lambda: dict({DEFAULT_MODEL: trading_ai}, **model_registry.models))
+    if warm_start.open():
+        warm_start.restore(DEFAULT_MODEL, trading_ai)
+
+def new_model(name):
+    """A registry model with default parameters; its shared log sits next to the default one"""
+    model = ProfessionalTradingAI()
+    model.metrics = metrics_registry
+    if PREDICTION_LOG_PATH:
+        root, ext = os.path.splitext(PREDICTION_LOG_PATH)
+        model.prediction_log = PredictionLog(f"{root}.{name}{ext}", STATS_WINDOWS)
+    if warm_start is not None:
+        warm_start.restore(name, model)
+    return model
+
+model_registry = ModelRegistry(trading_ai, MODEL_REGISTRY_DIR, new_model, SIGNAL_POLARITY, PARAMETERS_POLL_SECONDS)
+
+if MODEL_PARAMETERS_PATH and os.path.exists(MODEL_PARAMETERS_PATH):
+    trading_ai.load_parameters(MODEL_PARAMETERS_PATH)
+    logger.info(f"Model parameters loaded from {MODEL_PARAMETERS_PATH}")
+
+# State of the background /optimize job in this worker; only changed and read under optimizer_lock
+optimizer_state = {'status': 'idle', 'started_at': None, 'finished_at': None, 'report': None, 'error': None}
+optimizer_lock = threading.Lock()
+
+def optimizer_status():
+    """A consistent copy of optimizer_state"""
+    with optimizer_lock:
+        return dict(optimizer_state)
+
+def lock_optimizer():
+    """Take the cross-worker /optimize lock: its descriptor, or None if another worker holds it"""
+    fd = os.open(OPTIMIZER_LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+    return fd
+
+next_parameters_check = 0.0
+
+# Per-symbol bar and indicator state for streamed ticks (per worker)
+stream_engine = StreamingEngine(trading_ai, STREAM_BAR_SECONDS, model_registry.resolve)
+
+# Latest option chain per symbol and expiry posted to /option_chain (per worker)
+option_chains = OptionChainStore(OPTION_CHAIN_MAX) if np is not None else None
+
+traffic_recorder = TrafficRecorder(TRAFFIC_CAPTURE_PATH) if TRAFFIC_CAPTURE_PATH else None
+
+@app.before_request
+def reload_parameters():
+    """Pick up parameters another worker (or an offline run) wrote to MODEL_PARAMETERS_PATH"""
+    global next_parameters_check
+    if MODEL_PARAMETERS_PATH and time.monotonic() >= next_parameters_check:
+        next_parameters_check = time.monotonic() + PARAMETERS_POLL_SECONDS
+        try:
+            if trading_ai.refresh_parameters(MODEL_PARAMETERS_PATH):
+                logger.info(f"Model parameters reloaded from {MODEL_PARAMETERS_PATH}")
+        except Exception as e:
+            logger.error(f"Error reloading model parameters: {e}")
+
+@app.after_request
+def count_request(response):
+    record_request(request.endpoint, response.status_code)
+    if warm_start is not None:
+        warm_start.save_if_due()
+    return response
+
+def record_request(endpoint, status):
+    """Count a request by endpoint, and as an error if it failed"""
+    if not metrics_registry.started:
+        metrics_registry.start()
+    slots = ENDPOINT_SLOTS.get(endpoint)
+    if slots is not None:
+        metrics_registry.inc(slots[0])
+        if status >= 400:
+            metrics_registry.inc(slots[1])
+
+def update_gauges():
+    """Copy this worker's history, cache, stream and optimizer state into its metric slots
+
+    Called by the metrics flush thread and before serving /metrics.
+    """
+    models = [trading_ai] + list(model_registry.models.values())
+    histories = [model.model_data['signals'] for model in models]
+    metrics_registry.set(SLOTS[('history_rows', None)], sum(len(history) for history in histories))
+    metrics_registry.set(SLOTS[('history_bytes', None)], sum(history.nbytes for history in histories))
+    caches = [model.response_cache for model in models if model.response_cache is not None]
+    if caches:
+        metrics_registry.set(SLOTS[('response_cache_entries', None)], sum(len(cache) for cache in caches))
+        metrics_registry.set(SLOTS[('response_cache_hits_total', None)], sum(cache.hits for cache in caches))
+        metrics_registry.set(SLOTS[('response_cache_misses_total', None)], sum(cache.misses for cache in caches))
+        metrics_registry.set(SLOTS[('response_cache_evictions_total', None)], sum(cache.evictions for cache in caches))
+    metrics_registry.set(SLOTS[('stream_symbols', None)], len(stream_engine.symbols))
+    metrics_registry.set(SLOTS[('optimizer_running', None)], int(optimizer_state['status'] == 'running'))
+
+metrics_registry.collect_gauges = update_gauges
+
+def request_json():
+    """Request body decoded with json_codec (non-JSON content types raise like get_json)"""
+    started = time.perf_counter_ns()
+    if request.is_json:
+        data = json_codec.loads(request.get_data())
+    else:
         data = request.get_json()
+    metrics_registry.observe(STAGE_SLOTS['parse'], time.perf_counter_ns() - started)
+    return data
+
+def json_response(body, status=200):
+    """Response whose body is serialised by json_codec"""
+    started = time.perf_counter_ns()
+    payload = json_codec.dumps(body)
+    metrics_registry.observe(STAGE_SLOTS['serialization'], time.perf_counter_ns() - started)
+    return Response(payload, status, mimetype='application/json')
+
+# Endpoint bodies shared by the Flask routes below and the ASGI app (ai_model_asgi.py).
+# Each returns (response dict, HTTP status); read_json returns the decoded request body
+# and params is the query string as a mapping.
+
+def query_flag(params, name):
+    """True for ?name=1 / true / yes"""
+    return params.get(name, '').lower() in ('1', 'true', 'yes')
+
+def select_model(params, data=None):
+    """(model name, model) for a request: ?model=, else the payload's strategy or symbol
+
+    Payloads that name no registered model get the default model (name None);
+    an unknown ?model= gets (None, None).
+    """
+    key = params.get('model')
+    if key:
+        name, model = model_registry.select(key)
+        return (name, model) if name is not None else (None, None)
+    payload = data[0] if isinstance(data, list) and data else data
+    if isinstance(payload, dict):
+        key = payload.get('strategy') or payload.get('symbol')
+    return model_registry.select(key)
+
+def unknown_model(params):
+    return {'error': f"Unknown model: {params['model']}"}, 404
+
+def attach_option_chain(data):
+    """Payload with the writers zone summary of the option chain it names, if any
+
+    A snapshot without writersZone can send "optionChain": "NIFTY" (nearest
+    expiry held) or {"symbol": "NIFTY", "expiry": "2024-01-25"}. Payloads
+    that name no held chain are returned unchanged.
+    """
+    payload = data[0] if isinstance(data, list) and data else data
+    if not isinstance(payload, dict) or 'writersZone' in payload or option_chains is None:
+        return data
+    reference = payload.get('optionChain')
+    if not reference:
+        return data
+    if isinstance(reference, dict):
+        summary = option_chains.summary(reference.get('symbol'), reference.get('expiry'))
+    else:
+        summary = option_chains.summary(reference)
+    if summary is None:
+        return data
+    payload = dict(payload, **summary)
+    return [payload] + data[1:] if isinstance(data, list) else payload
+
+def predict_response(read_json, params):
+    """Body and status for /predict"""
+    try:
+        data = read_json()
         
         if not data:
-            return jsonify({'error': 'No data provided'}), 400
+            return {'error': 'No data provided'}, 400
+        
+        name, model = select_model(params, data)
+        if model is None:
+            return unknown_model(params)
         
         # Generate professional trading signal
-        result = trading_ai.professional_signal_generation(data)
+        result = model.professional_signal_generation(attach_option_chain(data))
+        if name is not None:
+            result['model'] = name
         
         logger.info(f"Prediction: {result['signal']} with confidence {result['confidence']}")
         
-        return jsonify(result)
+        return result, 200
     
     except Exception as e:
         logger.error(f"Error in predict endpoint: {e}")
-        return jsonify({
+        return {
             'signal': 'HOLD',
             'confidence': 0.0,
             'error': str(e),
             'timestamp': datetime.now().isoformat()
-        }), 500
+        }, 500
 
-@app.route('/health', methods=['GET'])
-def health():
-    """Health check endpoint"""
+def predict_wire_response(body, params, batch=False):
+    """Body and status for /predict (one record) or /predict_batch with a binary body (see wire_format.py)"""
+    try:
+        started = time.perf_counter_ns()
+        try:
+            records = wire_format.decode(body)
+        except RuntimeError as e:
+            return {'error': str(e)}, 415
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        metrics_registry.observe(STAGE_SLOTS['parse'], time.perf_counter_ns() - started)
+        if len(records) == 0 or (not batch and len(records) != 1):
+            return {'error': 'Expected one record' if not batch else 'No records provided'}, 400
+        
+        name, model = select_model(params)
+        if model is None:
+            return unknown_model(params)
+        
+        results = model.professional_signal_generation_records(records, 'predict_batch' if batch else 'predict')
+        if name is not None:
+            for result in results:
+                result['model'] = name
+        
+        if not batch:
+            logger.info(f"Prediction: {results[0]['signal']} with confidence {results[0]['confidence']}")
+            return results[0], 200
+        logger.info(f"Batch prediction: {len(results)} binary snapshots scored")
+        return {
+            'results': results,
+            'count': len(results),
+            'timestamp': datetime.now().isoformat()
+        }, 200
+    
+    except Exception as e:
+        logger.error(f"Error in binary predict: {e}")
+        return {
+            'signal': 'HOLD',
+            'confidence': 0.0,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }, 500
+
+def predict_batch_response(read_json, params):
+    """Body and status for /predict_batch with a JSON body"""
+    try:
+        data = read_json()
+        
+        if not data:
+            return {'error': 'No data provided'}, 400
+        
+        # Accept either a bare list of snapshots or {"snapshots": [...]}
+        snapshots = data.get('snapshots') if isinstance(data, dict) else data
+        if not isinstance(snapshots, list) or not snapshots:
+            return {'error': 'Expected a non-empty list of snapshots'}, 400
+        
+        # Snapshots for different models are scored in one batch per model
+        groups = {}
+        for i, snapshot in enumerate(snapshots):
+            groups.setdefault(select_model(params, snapshot), []).append(i)
+        if (None, None) in groups:
+            return unknown_model(params)
+        snapshots = [attach_option_chain(snapshot) for snapshot in snapshots]
+        results = [None] * len(snapshots)
+        for (name, model), indices in groups.items():
+            batch = snapshots if len(groups) == 1 else [snapshots[i] for i in indices]
+            for i, result in zip(indices, model.professional_signal_generation_batch(batch)):
+                if name is not None:
+                    result['model'] = name
+                results[i] = result
+        
+        logger.info(f"Batch prediction: {len(results)} snapshots scored")
+        
+        return {
+            'results': results,
+            'count': len(results),
+            'timestamp': datetime.now().isoformat()
+        }, 200
+    
+    except Exception as e:
+        logger.error(f"Error in predict_batch endpoint: {e}")
+        return {
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }, 500
+
+def predict_many(requests):
+    """(body, status) for each /predict request given as (read_json, params)
+
+    Snapshots for the same model are scored in one professional_signal_generation_batch
+    call. Requests that would not reach the model (no data, an unreadable body, an
+    unknown ?model=) get exactly what predict_response returns for them.
+    """
+    responses = [None] * len(requests)
+    groups = {}
+    for i, (read_json, params) in enumerate(requests):
+        try:
+            data = read_json()
+        except Exception:
+            data = None
+        if data:
+            selected = select_model(params, data)
+            if selected[1] is not None:
+                groups.setdefault(selected, []).append((i, attach_option_chain(data)))
+                continue
+        responses[i] = predict_response(read_json, params)
+    
+    for (name, model), members in groups.items():
+        results = model.professional_signal_generation_batch([data for _, data in members], 'predict')
+        for (i, _), result in zip(members, results):
+            if name is not None:
+                result['model'] = name
+            responses[i] = (result, 200)
+        logger.info(f"Micro-batch: {len(members)} predictions" + (f" for {name}" if name else ""))
+    return responses
+
+predict_batcher = (MicroBatcher(predict_many, MICRO_BATCH_WINDOW_MS / 1000, MICRO_BATCH_MAX)
+                   if MICRO_BATCH_WINDOW_MS > 0 else None)
+
+def health_response(params):
+    """Body and status for /health
+
+    A constant-time liveness probe by default; ?detail=1 adds the totals,
+    accuracy, weights and cache counters.
+    """
+    if not query_flag(params, 'detail'):
+        return {'status': 'healthy', 'timestamp': datetime.now().isoformat(), 'model_loaded': True}, 200
+    
+    name, model = select_model(params)
+    if model is None:
+        return unknown_model(params)
+    correct, total, total_signals = model.tracker_totals()
     accuracy = 0.0
-    if trading_ai.model_data['accuracy_tracker']['total'] > 0:
-        accuracy = trading_ai.model_data['accuracy_tracker']['correct'] / trading_ai.model_data['accuracy_tracker']['total']
+    if total > 0:
+        accuracy = correct / total
     
-    return jsonify({
+    return {
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'model_loaded': True,
-        'total_signals': len(trading_ai.model_data['signals']),
+        'total_signals': total_signals,
         'accuracy': round(accuracy, 3),
-        'pattern_weights': trading_ai.model_data['pattern_weights']
-    })
+        'pattern_weights': model.model_data['pattern_weights'],
+        'response_cache': model.response_cache.stats() if model.response_cache is not None else None,
+        'model': name,
+        'models': model_registry.describe(),
+        'micro_batch': predict_batcher.stats() if predict_batcher is not None else None,
+        'confluence': model.confluence.stats(),
+        'warm_start': warm_start.stats() if warm_start is not None else None
+    }, 200
 
-@app.route('/update_accuracy', methods=['POST'])
-def update_accuracy():
-    """Update model accuracy based on trade outcomes"""
+def update_accuracy_response(read_json, params):
+    """Body and status for /update_accuracy (the model is picked like /predict picks it)
+
+    Optional fields: prediction_id from the /predict response, pnl and
+    holding_seconds. With an id the outcome is attached to that prediction.
+    Without the shared log the id belongs to the worker that made the
+    prediction (or restored it from a warm-start snapshot), and other
+    workers answer 421.
+    """
     try:
-        data = request.get_json()
+        data = read_json()
         predicted_signal = data.get('predicted_signal')
         actual_outcome = data.get('actual_outcome')  # 'correct' or 'incorrect'
+        prediction_id = data.get('prediction_id')
+        pnl = data.get('pnl')
+        holding_seconds = data.get('holding_seconds')
+        try:
+            pnl = None if pnl is None else float(pnl)
+            holding_seconds = None if holding_seconds is None else float(holding_seconds)
+            if not all(value is None or abs(value) < float('inf') for value in (pnl, holding_seconds)):
+                raise ValueError
+        except (TypeError, ValueError):
+            return {'error': "pnl and holding_seconds must be finite numbers"}, 400
         
-        trading_ai.model_data['accuracy_tracker']['total'] += 1
-        if actual_outcome == 'correct':
-            trading_ai.model_data['accuracy_tracker']['correct'] += 1
+        _, model = select_model(params, data)
+        if model is None:
+            return unknown_model(params)
+        try:
+            model.record_outcome(predicted_signal, actual_outcome, prediction_id, pnl, holding_seconds)
+        except KeyError:
+            return {'error': f"Unknown prediction id: {prediction_id}"}, 404
+        except OtherWorkerPrediction as e:
+            return {'error': f"{e}; set PREDICTION_LOG_PATH to take feedback on any worker"}, 421
+        except DuplicateOutcome as e:
+            return {'error': str(e)}, 409
+        except (TypeError, ValueError):
+            return {'error': f"Malformed prediction id: {prediction_id}"}, 400
         
-        return jsonify({'message': 'Accuracy updated successfully'})
+        return {'message': 'Accuracy updated successfully'}, 200
     
     except Exception as e:
         logger.error(f"Error updating accuracy: {e}")
-        return jsonify({'error': str(e)}), 500
+        return {'error': str(e)}, 500
 
-@app.route('/get_stats', methods=['GET'])
-def get_stats():
-    """Get model statistics"""
+def accuracy_response(params):
+    """Body and status for /accuracy: attributed outcomes broken down
+
+    Query parameters:
+        by            signal, regime, vix_condition or combination (default: all four)
+        limit         buckets per breakdown, most outcomes first
+        min_outcomes  skip buckets with fewer outcomes (default 1)
+        model         a registered model name or alias
+    """
+    try:
+        breakdowns = BREAKDOWNS
+        if params.get('by'):
+            breakdowns = tuple(breakdown.strip() for breakdown in params['by'].split(','))
+            unknown = [breakdown for breakdown in breakdowns if breakdown not in BREAKDOWNS]
+            if unknown:
+                return {'error': f"Unknown breakdowns: {', '.join(unknown)}",
+                        'available_breakdowns': list(BREAKDOWNS)}, 400
+        try:
+            limit = int(params['limit']) if params.get('limit') else None
+            min_outcomes = int(params.get('min_outcomes', 1))
+        except ValueError:
+            return {'error': "limit and min_outcomes must be integers"}, 400
+        
+        name, model = select_model(params)
+        if model is None:
+            return unknown_model(params)
+        
+        correct, total, _ = model.tracker_totals()
+        body = {
+            'total_outcomes': total,
+            'correct_outcomes': correct,
+            'accuracy': round(correct / total, 3) if total else 0.0,
+            'breakdowns': {breakdown: model.outcome_breakdown(breakdown, limit, min_outcomes)
+                           for breakdown in breakdowns},
+            'timestamp': datetime.now().isoformat()
+        }
+        if name is not None:
+            body['model'] = name
+        return body, 200
+    
+    except Exception as e:
+        logger.error(f"Error getting accuracy breakdown: {e}")
+        return {'error': str(e)}, 500
+
+def option_chain_response(read_json, params):
+    """Body and status for /option_chain: store a full or delta chain snapshot, return its summary"""
     try:
+        if option_chains is None:
+            return {'error': 'Option chain ingestion requires numpy'}, 501
+        data = read_json()
+        if not isinstance(data, dict):
+            return {'error': 'Expected an option chain object'}, 400
+        
+        try:
+            (symbol, expiry), summary, version, strikes = option_chains.update(data)
+        except KeyError as e:
+            return {'error': e.args[0]}, 409
+        except (TypeError, ValueError) as e:
+            return {'error': str(e)}, 400
+        
+        return {
+            'symbol': symbol,
+            'expiry': expiry,
+            'version': version,
+            'strikes': strikes,
+            'writers': summary,
+            'timestamp': datetime.now().isoformat()
+        }, 200
+    
+    except Exception as e:
+        logger.error(f"Error in option_chain endpoint: {e}")
+        return {'error': str(e)}, 500
+
+def window_stats_response(params):
+    """Body and status for /window_stats: rolling statistics over STATS_WINDOWS
+
+    Query parameters:
+        window  comma-separated windows from STATS_WINDOWS (default: all)
+        model   a registered model name or alias
+    """
+    try:
+        windows = STATS_WINDOWS
+        if params.get('window'):
+            windows = tuple(spec.strip() for spec in params['window'].split(','))
+            unknown = [spec for spec in windows if spec not in STATS_WINDOWS]
+            if unknown:
+                return {'error': f"Unknown windows: {', '.join(unknown)}",
+                        'available_windows': list(STATS_WINDOWS)}, 400
+        
+        name, model = select_model(params)
+        if model is None:
+            return unknown_model(params)
+        
+        body = {
+            'windows': {spec: model.window_report(spec) for spec in windows},
+            'timestamp': datetime.now().isoformat()
+        }
+        if name is not None:
+            body['model'] = name
+        return body, 200
+    
+    except Exception as e:
+        logger.error(f"Error getting window stats: {e}")
+        return {'error': str(e)}, 500
+
+def metrics_response():
+    """Prometheus text for /metrics, summed over every worker"""
+    update_gauges()
+    return metrics_registry.render(), 200
+
+def stats_response(params):
+    """Body and status for /get_stats
+
+    Query parameters:
+        limit    rows per page (default 10, at most STATS_MAX_LIMIT)
+        since    return the rows after this sequence number (the `seq` of a row,
+                 or `next_since` of the previous page) or ISO timestamp;
+                 without it, the newest rows
+        fields   comma-separated entry fields (default: seq and the classic fields)
+        raw=1    include the recorded request payloads (needs SIGNAL_HISTORY_RAW=1)
+        weights=1  include pattern_weights
+        model    a registered model name or alias (default: the default model)
+    """
+    try:
+        try:
+            limit = int(params.get('limit', 10))
+            if not 1 <= limit <= STATS_MAX_LIMIT:
+                raise ValueError
+        except ValueError:
+            return {'error': f"limit must be an integer from 1 to {STATS_MAX_LIMIT}"}, 400
+        
+        after_seq = after_ns = None
+        since = params.get('since')
+        if since:
+            try:
+                after_seq = int(since)
+            except ValueError:
+                try:
+                    since_time = datetime.fromisoformat(since)
+                    # Rows are stamped in nanoseconds, ISO timestamps stop at microseconds
+                    after_ns = (int(since_time.replace(microsecond=0).timestamp()) * 10**9
+                                + since_time.microsecond * 1000 + 999)
+                except ValueError:
+                    return {'error': "since must be a sequence number or an ISO timestamp"}, 400
+        
+        fields = PAGE_FIELDS
+        if params.get('fields'):
+            fields = tuple(field.strip() for field in params['fields'].split(','))
+            unknown = [field for field in fields if field != 'seq' and field not in FIELD_READERS]
+            if unknown:
+                return {'error': f"Unknown fields: {', '.join(unknown)}",
+                        'available_fields': ['seq'] + list(FIELD_READERS)}, 400
+        
+        name, model = select_model(params)
+        if model is None:
+            return unknown_model(params)
+        
+        correct, total, _ = model.tracker_totals()
         accuracy = 0.0
-        if trading_ai.model_data['accuracy_tracker']['total'] > 0:
-            accuracy = trading_ai.model_data['accuracy_tracker']['correct'] / trading_ai.model_data['accuracy_tracker']['total']
+        if total > 0:
+            accuracy = correct / total
         
-        recent_signals = list(trading_ai.model_data['signals'])[-10:]  # Last 10 signals
+        history = model.model_data['signals']
+        recent_signals, last_seq = history.page(
+            limit, after_seq, after_ns, include_raw=query_flag(params, 'raw'), fields=fields
+        )
         
-        return jsonify({
-            'total_predictions': trading_ai.model_data['accuracy_tracker']['total'],
-            'correct_predictions': trading_ai.model_data['accuracy_tracker']['correct'],
+        body = {
+            'total_predictions': total,
+            'correct_predictions': correct,
             'accuracy': round(accuracy, 3),
             'recent_signals': recent_signals,
-            'pattern_weights': trading_ai.model_data['pattern_weights']
-        })
+            'next_since': last_seq if last_seq is not None else after_seq,
+            'history_rows': len(history),
+            'first_seq': history.first_seq
+        }
+        if query_flag(params, 'weights'):
+            body['pattern_weights'] = model.model_data['pattern_weights']
+        if name is not None:
+            body['model'] = name
+        return body, 200
     
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
-        return jsonify({'error': str(e)}), 500
+        return {'error': str(e)}, 500
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    """Main prediction endpoint"""
+    arrival = time.time()
+    if request.mimetype == wire_format.CONTENT_TYPE:
+        body, status = predict_wire_response(request.get_data(), request.args)
+    else:
+        body, status = predict_response(request_json, request.args)
+    if traffic_recorder is not None:
+        traffic_recorder.record(arrival, request.query_string.decode('latin-1'), request.mimetype,
+                                request.get_data(), status, body)
+    return json_response(body, status)
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """Batch prediction endpoint: scores many snapshots in one pass"""
+    if request.mimetype == wire_format.CONTENT_TYPE:
+        return json_response(*predict_wire_response(request.get_data(), request.args, batch=True))
+    return json_response(*predict_batch_response(request_json, request.args))
+
+@app.route('/stream_ticks', methods=['POST'])
+def stream_ticks():
+    """Streaming ingestion: NDJSON ticks in, one NDJSON prediction per closed bar out"""
+    body = request.stream
+    
+    def generate():
+        for line in body:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                for event in stream_engine.process(json_codec.loads(line)):
+                    logger.info(f"Stream {event['symbol']}: {event['prediction']['signal']} "
+                                f"with confidence {event['prediction']['confidence']}")
+                    yield json_codec.dumps(event)
+            except Exception as e:
+                logger.error(f"Error in stream_ticks: {e}")
+                yield json_codec.dumps({'error': str(e), 'timestamp': datetime.now().isoformat()})
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Health check endpoint"""
+    body, status = health_response(request.args)
+    return json_response(body, status)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint"""
+    body, status = metrics_response()
+    return Response(body, status, mimetype='text/plain; version=0.0.4')
+
+@app.route('/update_accuracy', methods=['POST'])
+def update_accuracy():
+    """Update model accuracy based on trade outcomes"""
+    body, status = update_accuracy_response(request_json, request.args)
+    return json_response(body, status)
+
+@app.route('/accuracy', methods=['GET'])
+def accuracy():
+    """Accuracy, P&L and holding time of attributed outcomes by signal, regime, VIX condition and combination"""
+    body, status = accuracy_response(request.args)
+    return json_response(body, status)
+
+@app.route('/option_chain', methods=['POST'])
+def option_chain():
+    """Option chain ingestion: full or delta snapshots in, writers zone summary out"""
+    body, status = option_chain_response(request_json, request.args)
+    return json_response(body, status)
+
+@app.route('/window_stats', methods=['GET'])
+def window_stats():
+    """Signal mix, confidence, VIX blocks and hit rate over the last 5m / 1h / 1d"""
+    body, status = window_stats_response(request.args)
+    return json_response(body, status)
+
+@app.route('/optimize', methods=['GET', 'POST'])
+def optimize():
+    """Start a background fit of weights/thresholds to recorded outcomes (POST) or report its status (GET)"""
+    if request.method == 'GET':
+        return json_response(optimizer_status())
+    
+    try:
+        from weight_optimizer import optimize_model, load_table, request_options
+        
+        body = request.get_json(silent=True)
+        try:
+            horizon, options = request_options({} if body is None else body)
+        except ValueError as e:
+            return json_response({'error': str(e)}, 400)
+        model_param = {'model': (body or {}).get('model') or ''}
+        name, model = select_model(model_param)
+        if model is None:
+            return json_response(*unknown_model(model_param))
+        table = load_table(OPTIMIZER_HISTORY_PATH) if OPTIMIZER_HISTORY_PATH and name is None else None
+        
+        with optimizer_lock:
+            if optimizer_state['status'] == 'running':
+                return json_response({'error': 'An optimization is already running'}, 409)
+            lock_fd = lock_optimizer()
+            if lock_fd is None:
+                return json_response({'error': 'An optimization is already running in another worker'}, 409)
+            optimizer_state.update(status='running', started_at=datetime.now().isoformat(),
+                                   finished_at=None, report=None, error=None)
+            started = dict(optimizer_state)
+        
+        def run():
+            try:
+                if name is None:
+                    report = optimize_model(model, horizon, table, MODEL_PARAMETERS_PATH, **options)
+                else:
+                    # Saved as the model's next config version, which every worker reloads
+                    report = optimize_model(model, horizon, table, **options)
+                    if report['improved']:
+                        report['version'] = model_registry.save_parameters(
+                            name, report['pattern_weights'], report['decision_thresholds'],
+                            objective=report['objective'], holdout=report.get('holdout')
+                        )
+                    report['model'] = name
+                outcome = {'status': 'finished', 'report': report}
+                logger.info(f"Optimization finished: improved={report['improved']}")
+            except Exception as e:
+                logger.error(f"Error in optimization: {e}")
+                outcome = {'status': 'failed', 'error': str(e)}
+            # One update, so a reader never sees the status without finished_at
+            with optimizer_lock:
+                optimizer_state.update(outcome, finished_at=datetime.now().isoformat())
+            os.close(lock_fd)  # releases the flock
+        
+        threading.Thread(target=run, name='weight-optimizer', daemon=True).start()
+        return json_response(started, 202)
+    
+    except Exception as e:
+        logger.error(f"Error starting optimization: {e}")
+        return json_response({'error': str(e)}, 500)
+
+@app.route('/get_stats', methods=['GET'])
+def get_stats():
+    """Get model statistics"""
+    body, status = stats_response(request.args)
+    return json_response(body, status)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
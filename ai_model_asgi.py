@@ -0,0 +1,131 @@
+"""ASGI entry point for the prediction API, for serving under uvicorn
+
+Serves /predict, /predict_batch, /health, /get_stats, /window_stats, /update_accuracy, /accuracy,
+/option_chain and /metrics with the same ProfessionalTradingAI instance and endpoint bodies as the Flask app. The
+event loop keeps thousands of slow or idle connections open without tying
+up a worker. Requests are scored inline on the loop because a prediction
+takes microseconds, less than handing it to a thread would cost. With
+MICRO_BATCH_WINDOW_MS set, concurrent /predict requests are collected for
+that many milliseconds and scored as one batch (see micro_batch.py).
+
+    uvicorn ai_model_asgi:app --host 0.0.0.0 --port $PORT --workers 4
+"""
+import time
+from urllib.parse import parse_qsl
+
+import json_codec
+import wire_format
+from ai_model_api_fixed import (
+    accuracy_response, health_response, metrics_registry, metrics_response, option_chain_response,
+    predict_batch_response, predict_batcher, predict_response, predict_wire_response, record_request,
+    reload_parameters, stats_response, traffic_recorder, update_accuracy_response, warm_start, window_stats_response
+)
+from metrics import STAGE_SLOTS
+
+JSON_CONTENT_TYPE = (b'content-type', b'application/json')
+TEXT_CONTENT_TYPE = (b'content-type', b'text/plain; version=0.0.4')
+
+
+async def _read_body(receive):
+    """Collect the full request body"""
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+def _json_reader(raw):
+    def read_json():
+        started = time.perf_counter_ns()
+        data = json_codec.loads(raw)
+        metrics_registry.observe(STAGE_SLOTS['parse'], time.perf_counter_ns() - started)
+        return data
+    return read_json
+
+
+# path -> (method, handler(raw body, query params))
+ROUTES = {
+    '/predict': ('POST', lambda raw, params: predict_response(_json_reader(raw), params)),
+    '/predict_batch': ('POST', lambda raw, params: predict_batch_response(_json_reader(raw), params)),
+    '/update_accuracy': ('POST', lambda raw, params: update_accuracy_response(_json_reader(raw), params)),
+    '/option_chain': ('POST', lambda raw, params: option_chain_response(_json_reader(raw), params)),
+    '/health': ('GET', lambda raw, params: health_response(params)),
+    '/get_stats': ('GET', lambda raw, params: stats_response(params)),
+    '/accuracy': ('GET', lambda raw, params: accuracy_response(params)),
+    '/window_stats': ('GET', lambda raw, params: window_stats_response(params)),
+    '/metrics': ('GET', lambda raw, params: metrics_response()),
+}
+
+
+# Routes that also accept a binary body (see wire_format.py), by Content-Type
+WIRE_ROUTES = {
+    '/predict': lambda raw, params: predict_wire_response(raw, params),
+    '/predict_batch': lambda raw, params: predict_wire_response(raw, params, batch=True),
+}
+
+
+def _content_type(scope):
+    """Media type of the request, without parameters"""
+    for name, value in scope.get('headers', ()):
+        if name == b'content-type':
+            return value.decode('latin-1').split(';', 1)[0].strip().lower()
+    return None
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """Minimal ASGI router over the shared endpoint bodies"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    arrival = time.time()
+    route = ROUTES.get(scope['path'])
+    if route is None:
+        body, status = {'error': 'Not found'}, 404
+    elif scope['method'] != route[0]:
+        body, status = {'error': 'Method not allowed'}, 405
+    else:
+        raw = await _read_body(receive)
+        if raw is None:  # client went away
+            return
+        reload_parameters()
+        query_string = scope.get('query_string', b'')
+        params = dict(parse_qsl(query_string.decode('latin-1')))
+        if scope['path'] in WIRE_ROUTES and _content_type(scope) == wire_format.CONTENT_TYPE:
+            body, status = WIRE_ROUTES[scope['path']](raw, params)
+        elif predict_batcher is not None and scope['path'] == '/predict':
+            body, status = await predict_batcher.submit((query_string, raw), (_json_reader(raw), params))
+        else:
+            body, status = route[1](raw, params)
+        if traffic_recorder is not None and scope['path'] == '/predict':
+            traffic_recorder.record(arrival, query_string.decode('latin-1'), _content_type(scope), raw, status, body)
+
+    if isinstance(body, str):  # Prometheus text from /metrics
+        payload, content_type = body.encode(), TEXT_CONTENT_TYPE
+    else:
+        started = time.perf_counter_ns()
+        payload, content_type = json_codec.dumps(body), JSON_CONTENT_TYPE
+        metrics_registry.observe(STAGE_SLOTS['serialization'], time.perf_counter_ns() - started)
+    record_request(scope['path'][1:], status)
+    headers = [content_type, (b'content-length', str(len(payload)).encode())]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': payload})
+    if warm_start is not None:
+        warm_start.save_if_due()
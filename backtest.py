@@ -0,0 +1,355 @@
+"""Vectorized backtest of the decision pipeline over historical snapshots
+
+History is a flat table (CSV or Parquet) with one row per snapshot and one
+column per rule input, named like the inputs in signal_rules.py: ``ltp``,
+``rsi``, ``rsi_status``, ``ema_status``, ... ``writers_zone``,
+``writers_confidence``, ``put_call_ratio``, ``market_structure``,
+``max_ce_ltp``, ``max_pe_ltp``, ``support_levels`` and ``resistance_levels``
+(the last two as level counts). Missing columns and empty cells take the
+same defaults as a payload without that field. Rows without a
+``writers_zone`` are scored without Writers Zone analysis, like a request
+without the ``writersZone`` key.
+
+The table is encoded into a feature matrix once; every run then scores it
+column-wise with the same NumPy code as /predict_batch, so sweeping
+pattern_weights or decision thresholds only repeats the scoring.
+
+P&L is measured in underlying points: a BUY_CE earns the move from ``ltp``
+to the exit price and a BUY_PE earns its negative. The move comes from, in
+order of preference:
+
+- the ``exit_price`` column;
+- recorded feedback: ``signal``, ``outcome`` and ``pnl`` columns as the
+  signal history keeps them. The pnl of a BUY_CE is the move, the pnl of a
+  BUY_PE its negative, and an outcome without a pnl counts as a one-point
+  move for or against the recorded signal. HOLD rows and rows without
+  feedback say nothing about the move and are not traded;
+- the ``ltp`` ``horizon`` rows later for the same ``symbol`` (all rows are
+  one symbol without that column). Rows without a later price are not
+  traded.
+
+The backtest only needs signal_rules.py, not the web app.
+
+Usage:
+    python backtest.py history.csv [--horizon 1] [--weights weights.json]
+                                   [--thresholds thresholds.json] [--json]
+"""
+import argparse
+import csv
+import json
+import logging
+import time
+
+import numpy as np
+
+from signal_rules import (
+    CONTEXT_INPUTS, DECISION_THRESHOLDS, DEFAULT_PATTERN_WEIGHTS, SIGNAL_POLARITY, TECHNICAL_INPUTS,
+    WRITERS_INPUTS, FLOAT, STATUS, COUNT, compile_rules, merge_parameters
+)
+
+SIGNAL_COLUMNS = (('BUY_CE', 1), ('BUY_PE', -1), ('HOLD', 0))
+
+# Recorded outcome cells, as text (signal history) or as booleans/1-0
+OUTCOME_SIGNS = {'correct': 1.0, 'incorrect': -1.0, True: 1.0, False: -1.0}
+
+
+def load_table(path):
+    """Read a CSV or Parquet history file into a dict of column arrays (empty text cells as '')"""
+    try:
+        import pandas as pd
+    except ImportError:  # Plain csv reader: slower to load, same result
+        if path.endswith(('.parquet', '.pq')):
+            raise RuntimeError("Reading Parquet history requires pandas and pyarrow")
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            values = list(zip(*reader)) or [()] * len(header)
+        return {name: np.array(column, dtype=object) for name, column in zip(header, values)}
+
+    frame = pd.read_parquet(path) if path.endswith(('.parquet', '.pq')) else pd.read_csv(path)
+    table = {}
+    for name in frame.columns:
+        column = frame[name]
+        if pd.api.types.is_numeric_dtype(column):
+            table[name] = column.to_numpy(dtype=np.float64)
+        else:
+            table[name] = column.fillna('').to_numpy(dtype=object)
+    return table
+
+
+def _missing(column):
+    """Cells that are empty in the source table"""
+    if column.dtype.kind == 'f':
+        return np.isnan(column)
+    if column.dtype.kind in 'OUS':
+        return column == ''
+    return np.zeros(len(column), dtype=bool)
+
+
+def _numeric_column(column, default):
+    """Float column with empty cells replaced by the payload default"""
+    missing = _missing(column)
+    if missing.any():
+        column = np.where(missing, default, column)
+    return column.astype(np.float64)
+
+
+def _status_column(column, codes, default):
+    """Status codes for a column of status strings (empty cells read as the default status)"""
+    codes = dict(codes)
+    codes[''] = codes.get(default, 0)
+    lookup = codes.get
+    return np.array([lookup(value, 0) for value in column.tolist()], dtype=np.float64)
+
+
+def _flat_value(data, node, field, default, kind):
+    """Read one rule input from a payload the way the live analysis converts it"""
+    source = data if node is None else data.get(node, {})
+    value = source.get(field, default)
+    if kind == FLOAT:
+        return float(value)
+    if kind == COUNT:
+        return float(len(value))
+    # Statuses that cannot match a rule (unhashable, or empty) become a non-matching string
+    return value if isinstance(value, str) and value else repr(value)
+
+
+def table_from_snapshots(snapshots):
+    """Flatten (technical_data, writers_data) payload pairs into a column table
+
+    This is how recorded request payloads (e.g. the raw signal history) become
+    backtest input. Writers Zone columns are only filled for snapshots the
+    live path would have run Writers Zone analysis on. The payload's
+    ``symbol``, if any, becomes the symbol column.
+    """
+    specs = CONTEXT_INPUTS + TECHNICAL_INPUTS + WRITERS_INPUTS
+    columns = {spec[0]: [] for spec in specs}
+    columns['has_writers'] = []
+    columns['symbol'] = []
+    for technical_data, writers_data in snapshots:
+        has_writers = bool(writers_data) and 'writersZone' in writers_data
+        columns['has_writers'].append(1.0 if has_writers else 0.0)
+        columns['symbol'].append(str(technical_data.get('symbol') or ''))
+        for name, node, field, default, kind in CONTEXT_INPUTS + TECHNICAL_INPUTS:
+            columns[name].append(_flat_value(technical_data, node, field, default, kind))
+        for name, node, field, default, kind in WRITERS_INPUTS:
+            if has_writers or name == 'writers_confidence':
+                columns[name].append(_flat_value(writers_data or {}, node, field, default, kind))
+            else:
+                columns[name].append('' if kind == STATUS else 0.0)
+    kinds = {spec[0]: spec[4] for spec in specs}
+    kinds['symbol'] = STATUS
+    return {
+        name: np.array(values, dtype=object if kinds.get(name) == STATUS else np.float64)
+        for name, values in columns.items()
+    }
+
+
+def table_from_history(history):
+    """Column table of the signal history rows that kept their payloads (SIGNAL_HISTORY_RAW=1)
+
+    Once any row has feedback, only rows with feedback are included, with
+    their signal, outcome and pnl columns, so the backtest scores recorded
+    outcomes. The history is copied first, so it may take appends meanwhile.
+    """
+    history = history.copy()
+    entries = [history.entry(i, True, ('signal', 'outcome', 'pnl')) for i in range(len(history))]
+    entries = [entry for entry in entries if 'technical_data' in entry]
+    feedback = [entry for entry in entries if entry['outcome'] is not None]
+    table = table_from_snapshots([(entry['technical_data'], entry['writers_data']) for entry in feedback or entries])
+    if feedback:
+        table['signal'] = np.array([entry['signal'] for entry in feedback], dtype=object)
+        table['outcome'] = np.array([entry['outcome'] for entry in feedback], dtype=object)
+        table['pnl'] = np.array([np.nan if entry['pnl'] is None else entry['pnl'] for entry in feedback])
+    return table
+
+
+def encode_table(rules, table):
+    """Encode a column table into the feature matrix layout of CompiledRules
+
+    Produces the same rows as CompiledRules.encode would for the equivalent
+    payloads, stored column-major so each rule reads one contiguous column.
+    """
+    rows = len(next(iter(table.values()))) if table else 0
+    features = np.zeros((rows, len(rules.columns)), dtype=np.float64, order='F')
+
+    if 'has_writers' in table:
+        has_writers = _numeric_column(table['has_writers'], 0) != 0
+    elif 'writers_zone' in table:
+        has_writers = ~_missing(table['writers_zone'])
+    else:
+        has_writers = np.zeros(rows, dtype=bool)
+    features[:, rules.column_index['has_writers']] = has_writers
+
+    for name, _, _, default, kind in CONTEXT_INPUTS + TECHNICAL_INPUTS + WRITERS_INPUTS:
+        if kind == COUNT:
+            default = len(default)
+        column = table.get(name)
+        if column is None:
+            values = np.full(rows, rules.status_codes.get(name, {}).get(default, 0) if kind == STATUS else default)
+        elif kind == STATUS:
+            values = _status_column(column, rules.status_codes.get(name, {}), default)
+        else:
+            values = _numeric_column(column, default)
+        features[:, rules.column_index[name]] = values
+
+    # Snapshots without Writers Zone data only carry their confidence
+    writers_columns = [rules.column_index[spec[0]] for spec in WRITERS_INPUTS if spec[0] != 'writers_confidence']
+    features[np.ix_(~has_writers, writers_columns)] = 0
+    return features
+
+
+def recorded_move(table):
+    """Move implied by recorded feedback: signed pnl, else +/-1 by outcome; NaN without feedback"""
+    if 'signal' not in table:
+        raise ValueError("Recorded outcomes need the signal column they were given for")
+    direction = _status_column(table['signal'], dict(SIGNAL_COLUMNS), 'HOLD')
+    rows = len(direction)
+    pnl = _numeric_column(table['pnl'], np.nan) if 'pnl' in table else np.full(rows, np.nan)
+    outcome = np.full(rows, np.nan)
+    if 'outcome' in table:
+        outcome = np.array([OUTCOME_SIGNS.get(value, np.nan) for value in table['outcome'].tolist()])
+    move = np.where(np.isnan(pnl), outcome, pnl) * direction
+    return np.where(direction != 0, move, np.nan)
+
+
+def forward_move(table, ltp, horizon):
+    """Price move from ltp to the exit price; NaN where there is no exit"""
+    if 'exit_price' in table:
+        return _numeric_column(table['exit_price'], np.nan) - ltp
+    if 'outcome' in table or 'pnl' in table:
+        return recorded_move(table)
+
+    # Row order within each symbol, then the ltp `horizon` rows later in the same symbol
+    rows = len(ltp)
+    if 'symbol' in table:
+        group = np.unique(table['symbol'].astype(str), return_inverse=True)[1].reshape(-1)
+    else:
+        group = np.zeros(rows, dtype=np.int64)
+    order = np.argsort(group, kind='stable')
+    exit_price = np.full(rows, np.nan)
+    if horizon < rows:
+        same = group[order[horizon:]] == group[order[:rows - horizon]]
+        exit_price[order[:rows - horizon][same]] = ltp[order[horizon:][same]]
+    return exit_price - ltp
+
+
+class Backtest:
+    """Historical snapshots encoded once and evaluated under any weights and thresholds"""
+
+    def __init__(self, table, horizon=1, polarity=SIGNAL_POLARITY):
+        self.polarity = polarity
+        self.base_weights = dict(DEFAULT_PATTERN_WEIGHTS)
+        self.rules = compile_rules(self.base_weights, polarity, DECISION_THRESHOLDS)
+        self.features = encode_table(self.rules, table)
+        self.move = forward_move(table, self.rules.column(self.features, 'ltp'), horizon)
+        self.tradable = ~np.isnan(self.move)
+
+        # Regimes do not depend on weights or thresholds
+        regimes = self.rules.regime_matrix(self.features)
+        self.regime_names, self.regime_index = np.unique(regimes, return_inverse=True)
+        self.regime_index = self.regime_index.reshape(-1)
+
+    @classmethod
+    def from_file(cls, path, horizon=1, polarity=SIGNAL_POLARITY):
+        return cls(load_table(path), horizon, polarity)
+
+    def __len__(self):
+        return len(self.features)
+
+    def configure(self, pattern_weights=None, decision_thresholds=None):
+        """Compile the base weights/thresholds updated with the given overrides"""
+        weights, thresholds = merge_parameters(self.base_weights, DECISION_THRESHOLDS,
+                                               pattern_weights, decision_thresholds)
+        self.rules = compile_rules(weights, self.polarity, thresholds)
+        return self.rules
+
+    def signals(self, pattern_weights=None, decision_thresholds=None):
+        """Signal codes (1=BUY_CE, -1=BUY_PE, 0=HOLD) and confidences for every row"""
+        _, _, signal_codes, confidence = self.configure(pattern_weights, decision_thresholds).score_decisions(self.features)
+        return signal_codes, confidence
+
+    def run(self, pattern_weights=None, decision_thresholds=None):
+        """Score every row and report signal counts, hit rate and P&L per market regime"""
+        start = time.perf_counter()
+        signal_codes, _ = self.signals(pattern_weights, decision_thresholds)
+        elapsed = time.perf_counter() - start
+
+        traded = (signal_codes != 0) & self.tradable
+        pnl = np.where(traded, signal_codes * np.nan_to_num(self.move), 0.0)
+        hits = traded & (pnl > 0)
+
+        groups = len(self.regime_names)
+        index = self.regime_index
+        counts = {label: np.bincount(index[signal_codes == code], minlength=groups) for label, code in SIGNAL_COLUMNS}
+        trades = np.bincount(index, weights=traded, minlength=groups)
+        wins = np.bincount(index, weights=hits, minlength=groups)
+        regime_pnl = np.bincount(index, weights=pnl, minlength=groups)
+
+        def summary(rows, signals, n_trades, n_hits, total_pnl):
+            return {
+                'rows': int(rows),
+                'signals': {label: int(n) for label, n in signals.items()},
+                'trades': int(n_trades),
+                'hit_rate': round(n_hits / n_trades, 4) if n_trades else 0.0,
+                'pnl': round(float(total_pnl), 2),
+                'avg_pnl': round(float(total_pnl) / n_trades, 4) if n_trades else 0.0
+            }
+
+        regimes = {
+            name: summary(
+                counts['BUY_CE'][g] + counts['BUY_PE'][g] + counts['HOLD'][g],
+                {label: counts[label][g] for label, _ in SIGNAL_COLUMNS},
+                trades[g], wins[g], regime_pnl[g]
+            )
+            for g, name in enumerate(self.regime_names.tolist())
+        }
+        overall = summary(
+            len(self), {label: counts[label].sum() for label, _ in SIGNAL_COLUMNS},
+            traded.sum(), hits.sum(), pnl.sum()
+        )
+        return {
+            'overall': overall,
+            'regimes': regimes,
+            'elapsed_seconds': round(elapsed, 4),
+            'rows_per_second': round(len(self) / elapsed) if elapsed else None
+        }
+
+
+def _load_overrides(path):
+    if not path:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the signal pipeline over historical snapshots")
+    parser.add_argument('path', help="CSV or Parquet file with one snapshot per row")
+    parser.add_argument('--horizon', type=int, default=1, help="rows of the same symbol ahead the exit price is taken from")
+    parser.add_argument('--polarity', default=SIGNAL_POLARITY)
+    parser.add_argument('--weights', help="JSON file of pattern_weights overrides")
+    parser.add_argument('--thresholds', help="JSON file of decision threshold overrides")
+    parser.add_argument('--json', action='store_true', help="print the full report as JSON")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    start = time.perf_counter()
+    backtest = Backtest.from_file(args.path, args.horizon, args.polarity)
+    load_seconds = time.perf_counter() - start
+    report = backtest.run(_load_overrides(args.weights), _load_overrides(args.thresholds))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{len(backtest)} rows loaded in {load_seconds:.2f}s, "
+          f"scored in {report['elapsed_seconds']:.3f}s ({report['rows_per_second']:,} rows/s)")
+    print(f"{'regime':<22} {'rows':>9} {'BUY_CE':>8} {'BUY_PE':>8} {'trades':>8} {'hit rate':>9} {'pnl':>12}")
+    for name, stats in list(report['regimes'].items()) + [('ALL', report['overall'])]:
+        print(f"{name:<22} {stats['rows']:>9} {stats['signals']['BUY_CE']:>8} {stats['signals']['BUY_PE']:>8} "
+              f"{stats['trades']:>8} {stats['hit_rate']:>9.2%} {stats['pnl']:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""Boot benchmark: cold workers vs a warm-start snapshot, with and without gunicorn --preload
+
+Seeds a signal history (and optionally a shared prediction log) in a child
+process, which saves it to a warm-start snapshot (see warm_start.py). Then
+it starts gunicorn four ways (cold/warm x fork-after-import/--preload). A
+warm run starts from one copy of the snapshot per worker, as a previous
+generation of workers would leave them. For each run it reports:
+- ms from launch to the first /predict answered
+- ms for the first /health?detail=1 after that. With --log this is where a
+  cold worker scans the whole prediction log.
+- per-worker RSS, PSS and private memory once every worker is up, and the
+  PSS of all processes together. PSS splits shared pages between the
+  processes that map them, so copy-on-write sharing after --preload shows
+  up as PSS below RSS.
+
+Usage:
+    python benchmark_boot.py [--workers 4] [--history 100000] [--predictions 200000] [--log] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmark_predict_batch import make_snapshot
+from load_test import HOST, stop_server
+from warm_start import snapshot_files
+
+CHUNK = 1000
+
+
+def seed(predictions):
+    """Fill the models the app builds from this environment and save a snapshot (run in a child)"""
+    import ai_model_api_fixed as api
+
+    model = api.trading_ai
+    rng = random.Random(1)
+    snapshots = [make_snapshot(rng) for _ in range(CHUNK)]
+    ids = []
+    for _ in range(0, predictions, CHUNK):
+        ids += [result['prediction_id'] for result in model.professional_signal_generation_batch(snapshots)]
+    # Feedback for every fourth prediction the history (or log) still holds
+    first = 0 if model.prediction_log is not None else max(len(ids) - len(model.model_data['signals']), 0)
+    for prediction_id in ids[first::4]:
+        model.record_outcome(None, rng.choice(['correct', 'incorrect']), prediction_id, pnl=rng.uniform(-50, 50))
+    model.tracker_totals()
+    api.warm_start.save()
+    print(json.dumps(api.warm_start.last_save))
+
+
+def worker_pids(master):
+    with open(f"/proc/{master}/task/{master}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def memory(pid):
+    """(RSS, PSS, private) bytes of a process from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0]) * 1024
+    return fields['Rss'], fields['Pss'], fields['Private_Clean'] + fields['Private_Dirty']
+
+
+def post(port, body, timeout=60):
+    request = urllib.request.Request(f"http://{HOST}:{port}/predict", data=body,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status
+
+
+def measure(port, workers, preload, env):
+    """Boot one server and return its timings and memory"""
+    command = [sys.executable, '-m', 'gunicorn', 'ai_model_api_fixed:app', '--workers', str(workers),
+               '--bind', f"{HOST}:{port}"] + (['--preload'] if preload else [])
+    body = json.dumps(make_snapshot(random.Random(2))).encode()
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    try:
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+            try:
+                post(port, body)
+                break
+            except OSError:
+                time.sleep(0.01)
+        first_prediction = time.perf_counter() - started
+        stats_started = time.perf_counter()
+        with urllib.request.urlopen(f"http://{HOST}:{port}/health?detail=1", timeout=120) as response:
+            total_signals = json.load(response)['total_signals']
+        first_stats = time.perf_counter() - stats_started
+
+        deadline = time.monotonic() + 120
+        while len(worker_pids(process.pid)) < workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+        for _ in range(workers * 10):  # let every worker serve (and restore lazily) before sampling
+            post(port, body)
+        time.sleep(1)
+        samples = [memory(pid) for pid in worker_pids(process.pid)]
+        master = memory(process.pid)
+    finally:
+        stop_server(process)
+    mb = 1024 * 1024
+    return {
+        'first_prediction_ms': round(first_prediction * 1000, 1),
+        'first_stats_ms': round(first_stats * 1000, 1),
+        'total_signals': total_signals,
+        'worker_rss_mb': round(sum(s[0] for s in samples) / len(samples) / mb, 1),
+        'worker_pss_mb': round(sum(s[1] for s in samples) / len(samples) / mb, 1),
+        'worker_private_mb': round(sum(s[2] for s in samples) / len(samples) / mb, 1),
+        'total_pss_mb': round((master[1] + sum(s[1] for s in samples)) / mb, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--history', type=int, default=100000, help="SIGNAL_HISTORY_CAPACITY of the servers")
+    parser.add_argument('--predictions', type=int, default=200000, help="predictions seeded before the runs")
+    parser.add_argument('--log', action='store_true', help="also use a shared prediction log")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--seed', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.predictions)
+        return
+
+    directory = tempfile.mkdtemp(prefix='benchmark_boot_')
+    try:
+        seed_path = os.path.join(directory, 'seed.snapshot')
+        env = dict(os.environ, SIGNAL_HISTORY_CAPACITY=str(args.history))
+        env.pop('WARM_START_PATH', None)
+        if args.log:
+            env['PREDICTION_LOG_PATH'] = os.path.join(directory, 'predictions.log')
+        else:
+            env.pop('PREDICTION_LOG_PATH', None)
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--seed', '--predictions', str(args.predictions)],
+                       env=dict(env, WARM_START_PATH=seed_path), check=True, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+        snapshot = snapshot_files(seed_path)[0]
+
+        results = []
+        for preload in (False, True):
+            for warm in (False, True):
+                run_env = dict(env)
+                if warm:
+                    # One snapshot per worker, as the previous generation of workers leaves them;
+                    # workers claim and save over them, so every run starts from fresh copies
+                    run_path = os.path.join(tempfile.mkdtemp(dir=directory), 'run.snapshot')
+                    run_env['WARM_START_PATH'] = run_path
+                    for worker in range(args.workers):
+                        shutil.copyfile(snapshot, f"{run_path}.seed{worker}")
+                result = measure(args.port, args.workers, preload, run_env)
+                results.append(dict(result, start='warm' if warm else 'cold', preload=preload))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.workers} workers, SIGNAL_HISTORY_CAPACITY={args.history}, {args.predictions} predictions seeded"
+          + (", shared prediction log" if args.log else ""))
+    print(f"{'start':<5} {'preload':<7} {'first predict ms':>16} {'first stats ms':>14} {'signals':>8} "
+          f"{'worker RSS MB':>13} {'PSS MB':>7} {'private MB':>10} {'total PSS MB':>12}")
+    for r in results:
+        print(f"{r['start']:<5} {str(r['preload']):<7} {r['first_prediction_ms']:>16,.1f} {r['first_stats_ms']:>14,.1f} "
+              f"{r['total_signals']:>8} {r['worker_rss_mb']:>13.1f} {r['worker_pss_mb']:>7.1f} "
+              f"{r['worker_private_mb']:>10.1f} {r['total_pss_mb']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
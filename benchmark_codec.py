@@ -0,0 +1,61 @@
+"""Microbenchmark: parse + score + encode per /predict request, stdlib json vs json_codec
+
+Usage:
+    python benchmark_codec.py [--requests 20000] [--repeat 5]
+"""
+import argparse
+import json
+import logging
+import random
+import time
+
+import json_codec
+from ai_model_api_fixed import ProfessionalTradingAI
+from benchmark_predict_batch import make_snapshot
+
+logging.disable(logging.INFO)
+
+
+def stage_times(bodies, model, loads, dumps, repeat):
+    """Best per-request microseconds for parse, score and encode over the request bodies"""
+    best = {'parse': float('inf'), 'score': float('inf'), 'encode': float('inf')}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payloads = [loads(body) for body in bodies]
+        parsed = time.perf_counter()
+        results = [model.professional_signal_generation(payload) for payload in payloads]
+        scored = time.perf_counter()
+        for result in results:
+            dumps(result)
+        encoded = time.perf_counter()
+        for stage, seconds in (('parse', parsed - start), ('score', scored - parsed), ('encode', encoded - scored)):
+            best[stage] = min(best[stage], seconds * 1e6 / len(bodies))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    # n8n sends the indicator object wrapped in an array
+    bodies = [json.dumps([make_snapshot(rng)]).encode() for _ in range(args.requests)]
+    model = ProfessionalTradingAI()
+    model.response_cache = None  # measure scoring, not repeated payloads hitting the cache
+
+    codecs = [('stdlib', json_codec.stdlib_loads, json_codec.stdlib_dumps)]
+    if json_codec.BACKEND != 'stdlib':
+        codecs.append((json_codec.BACKEND, json_codec.loads, json_codec.dumps))
+
+    print(f"{args.requests} requests, {sum(map(len, bodies)) // len(bodies)} bytes each (µs per request)")
+    print(f"{'codec':<8} {'parse':>8} {'score':>8} {'encode':>8} {'total':>8}")
+    for name, loads, dumps in codecs:
+        times = stage_times(bodies, model, loads, dumps, args.repeat)
+        total = sum(times.values())
+        print(f"{name:<8} {times['parse']:>8.2f} {times['score']:>8.2f} {times['encode']:>8.2f} {total:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
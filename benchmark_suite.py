@@ -0,0 +1,250 @@
+"""Benchmark and regression gate for the prediction path
+
+Scores synthetic n8n payloads in every shape the API accepts: technical
+indicators only or with the writers zone fields, sent as a bare object or
+wrapped in a list. Each shape runs in-process through
+professional_signal_generation (target `model`) and as a POST to /predict
+through the Flask test client (target `flask`). Every case reports ops/sec,
+p50/p99 latency and the memory one call allocates. CPython does not count
+allocations without a debug build, so memory is measured with tracemalloc:
+the peak bytes a call allocates above its starting point, and the bytes it
+leaves allocated. The response cache is off, so every call is a real
+prediction.
+
+Results are written as JSON. `compare` checks them against a baseline and
+exits with status 1 when a gated metric is worse by more than the threshold.
+Record the baseline on the machine that runs the gate, since timings from
+different machines are not comparable.
+
+Usage:
+    python benchmark_suite.py run [--output results.json] [--calls 2000] [--rounds 5]
+                                  [--targets model,flask] [--baseline baseline.json]
+    python benchmark_suite.py compare baseline.json results.json [--threshold 0.15]
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import json_codec
+from benchmark_predict_batch import make_snapshot
+
+logging.disable(logging.INFO)
+
+# Fields of make_snapshot that belong to the writers zone analysis
+WRITERS_FIELDS = (
+    'writersZone', 'confidence', 'putCallPremiumRatio', 'marketStructure', 'maxCELTP', 'maxPELTP',
+    'supportLevels', 'resistanceLevels',
+)
+
+CONTENTS = ('technical', 'writers')
+SHAPES = ('dict', 'list')
+TARGETS = ('model', 'flask')
+
+# metric -> +1 if higher is better, -1 if lower is better
+METRICS = {
+    'ops_per_sec': 1,
+    'p50_us': -1,
+    'p99_us': -1,
+    'peak_bytes_per_call': -1,
+    'retained_bytes_per_call': -1,
+}
+GATED_METRICS = ('ops_per_sec', 'p50_us', 'peak_bytes_per_call')
+
+
+def make_payload(rng, content, shape):
+    """A synthetic /predict body: technical-only or with writers zone fields, as a dict or a one-item list"""
+    snapshot = make_snapshot(rng)
+    if content == 'technical':
+        for field in WRITERS_FIELDS:
+            del snapshot[field]
+    return [snapshot] if shape == 'list' else snapshot
+
+
+def model_caller(model):
+    return model.professional_signal_generation
+
+
+def flask_caller(client):
+    def call(body):
+        response = client.post('/predict', data=body, content_type='application/json')
+        if response.status_code != 200:
+            raise RuntimeError(f"/predict returned {response.status_code}: {response.data[:200]!r}")
+        return response
+    return call
+
+
+def measure(call, inputs, calls, rounds):
+    """Timing and memory metrics for calling `call` on `inputs` in turn"""
+    for item in inputs[:min(len(inputs), 200)]:  # warm up
+        call(item)
+
+    round_rates, round_p50, round_p99 = [], [], []
+    clock = time.perf_counter_ns
+    for _ in range(rounds):
+        samples = [0] * calls
+        started = clock()
+        for i in range(calls):
+            item = inputs[i % len(inputs)]
+            t0 = clock()
+            call(item)
+            samples[i] = clock() - t0
+        elapsed = clock() - started
+        samples.sort()
+        round_rates.append(calls * 1e9 / elapsed)
+        round_p50.append(samples[calls // 2] / 1e3)
+        round_p99.append(samples[min(calls - 1, int(calls * 0.99))] / 1e3)
+
+    memory_calls = min(calls, 500)
+    peaks = []
+    tracemalloc.start()
+    try:
+        start_size = tracemalloc.get_traced_memory()[0]
+        for i in range(memory_calls):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            call(inputs[i % len(inputs)])
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - start_size
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'ops_per_sec': round(statistics.median(round_rates), 1),
+        'p50_us': round(statistics.median(round_p50), 2),
+        'p99_us': round(statistics.median(round_p99), 2),
+        'peak_bytes_per_call': round(statistics.median(peaks)),
+        'retained_bytes_per_call': round(max(retained, 0) / memory_calls, 1),
+    }
+
+
+def run(args):
+    """Run every selected case; returns the results document"""
+    import ai_model_api_fixed
+    from ai_model_api_fixed import ProfessionalTradingAI, app, trading_ai
+
+    targets = args.targets.split(',')
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        raise SystemExit(f"Unknown targets: {', '.join(sorted(unknown))} (expected {', '.join(TARGETS)})")
+
+    model = ProfessionalTradingAI()
+    model.response_cache = None
+    trading_ai.response_cache = None
+    ai_model_api_fixed.model_registry.directory = None  # every /predict goes to the default model
+    client = app.test_client()
+
+    cases = {}
+    for target in targets:
+        for content in CONTENTS:
+            for shape in SHAPES:
+                rng = random.Random(args.seed)
+                payloads = [make_payload(rng, content, shape) for _ in range(args.payloads)]
+                if target == 'model':
+                    call, inputs = model_caller(model), payloads
+                else:
+                    call, inputs = flask_caller(client), [json_codec.dumps(payload) for payload in payloads]
+                name = f"{target}/{content}/{shape}"
+                cases[name] = measure(call, inputs, args.calls, args.rounds)
+                print(format_row(name, cases[name]), flush=True)
+
+    return {
+        'created_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'json_codec': json_codec.BACKEND,
+        'settings': {'calls': args.calls, 'rounds': args.rounds, 'payloads': args.payloads, 'seed': args.seed},
+        'cases': cases,
+    }
+
+
+def format_header():
+    return f"{'case':<24} {'ops/s':>10} {'p50 µs':>9} {'p99 µs':>9} {'peak B':>9} {'kept B':>8}"
+
+
+def format_row(name, result):
+    return (f"{name:<24} {result['ops_per_sec']:>10,.0f} {result['p50_us']:>9.2f} {result['p99_us']:>9.2f} "
+            f"{result['peak_bytes_per_call']:>9,} {result['retained_bytes_per_call']:>8,.0f}")
+
+
+def compare(baseline, results, threshold, metrics):
+    """Regressions as (case, metric, baseline, current, relative change); also prints a report"""
+    regressions = []
+    print(f"{'case':<24} {'metric':<24} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in sorted(results['cases'].items()):
+        base = baseline['cases'].get(name)
+        if base is None:
+            print(f"{name:<24} (not in the baseline)")
+            continue
+        for metric in metrics:
+            if metric not in base or metric not in current:
+                continue
+            change = (current[metric] - base[metric]) / base[metric] if base[metric] else 0.0
+            worse = -change * METRICS[metric] > threshold
+            flag = '  REGRESSION' if worse else ''
+            print(f"{name:<24} {metric:<24} {base[metric]:>12,.2f} {current[metric]:>12,.2f} {change:>+8.1%}{flag}")
+            if worse:
+                regressions.append((name, metric, base[metric], current[metric], change))
+    return regressions
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def gate(baseline, results, args):
+    metrics = args.metrics.split(',')
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        raise SystemExit(f"Unknown metrics: {', '.join(sorted(unknown))} (expected {', '.join(METRICS)})")
+    regressions = compare(baseline, results, args.threshold, metrics)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the benchmarks and write the results")
+    run_parser.add_argument('--output', default='benchmark_results.json')
+    run_parser.add_argument('--calls', type=int, default=2000, help="calls per round")
+    run_parser.add_argument('--rounds', type=int, default=5, help="rounds per case; metrics are medians over rounds")
+    run_parser.add_argument('--payloads', type=int, default=500, help="distinct payloads per case")
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--targets', default=','.join(TARGETS))
+    run_parser.add_argument('--baseline', help="also compare against this baseline and fail on regressions")
+
+    compare_parser = commands.add_parser('compare', help="compare results with a baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('results')
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument('--threshold', type=float, default=0.15, help="allowed relative change (0.15 = 15%%)")
+        sub.add_argument('--metrics', default=','.join(GATED_METRICS), help="metrics the gate checks")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        print(format_header())
+        results = run(args)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"wrote {args.output}")
+        if args.baseline:
+            sys.exit(gate(load(args.baseline), results, args))
+    else:
+        sys.exit(gate(load(args.baseline), load(args.results), args))
+
+
+if __name__ == '__main__':
+    main()
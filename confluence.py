@@ -0,0 +1,197 @@
+"""Multi-timeframe confluence, with per-timeframe analyses cached until their candle closes
+
+A /predict payload can bring the same symbol's higher-timeframe snapshots
+along with its own:
+
+    {"symbol": "NIFTY", "timeframe": "1m", "RSI": {...}, ..., "writersZone": ...,
+     "timeframes": {"5m": {"RSI": {...}, ...}, "15m": null}}
+
+The payload itself is the primary timeframe: `timeframe`, or else the
+shortest one in CONFLUENCE_WEIGHTS. It is analyzed in full as usual. For
+every timeframe named in `timeframes`, the technical analysis is taken from
+the cache while that timeframe's candle is open. Otherwise the snapshot sent
+is analyzed and cached until the candle closes. `null`, or a list of
+timeframe names instead of an object, means "from the cache only". A
+timeframe with neither a snapshot nor a cached analysis is reported as
+missing and left out.
+
+n8n polls the 1m timeframe many times per 15m candle, and higher timeframes
+are analyzed once per candle, so confluence costs about the same CPU per
+request as a plain prediction.
+
+A candle closes at the next multiple of its length since the epoch (5m
+candles at :00, :05, ...), or at the snapshot's `candleClose` (epoch seconds)
+when it has one. A snapshot whose candleClose differs from the cached
+candle's replaces the cached analysis. The cache belongs to one rule set,
+like the response cache, so swapped parameters re-analyze every timeframe.
+
+The decision then sees the confluence strength instead of the primary's:
+the mean of the timeframes' technical strengths, weighted by
+CONFLUENCE_WEIGHTS, plus the writers zone strength (which has no
+timeframe). Higher timeframes that disagree pull the strength towards zero,
+and with it the signal towards HOLD. The signal counts and the trend checks
+of make_professional_decision still use the primary timeframe.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from window_stats import parse_window
+
+
+def parse_weights(spec):
+    """{timeframe: weight} from a spec such as '1m:1,5m:0.6,15m:0.4'"""
+    weights = {}
+    for item in spec.split(','):
+        timeframe, _, weight = item.partition(':')
+        parse_window(timeframe)
+        weight = float(weight)
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError(f"Invalid confluence weight for {timeframe.strip()}: {weight}")
+        weights[timeframe.strip()] = weight
+    if not weights or not any(weights.values()):
+        raise ValueError("Confluence weights need at least one positive weight")
+    return weights
+
+
+def direction(strength):
+    return 'BULLISH' if strength > 0 else 'BEARISH' if strength < 0 else 'NEUTRAL'
+
+
+class ConfluenceCache:
+    """Technical analyses per (symbol, timeframe), valid until the candle closes"""
+
+    def __init__(self, weights, max_entries=4096):
+        self.weights = weights
+        self.seconds = {timeframe: parse_window(timeframe) for timeframe in weights}
+        self.primary = min(self.seconds, key=self.seconds.get)
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (symbol, timeframe) -> (closes_at, strength, frame report)
+        self.rules = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.missing = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _closes_at(self, timeframe, snapshot, now):
+        close = snapshot.get('candleClose')
+        if close is not None:
+            close = float(close)
+            if not math.isfinite(close):
+                raise ValueError(f"candleClose of {timeframe} must be a number of epoch seconds")
+            return close
+        seconds = self.seconds[timeframe]
+        return (now // seconds + 1) * seconds
+
+    def _timeframe(self, timeframe):
+        if timeframe not in self.weights:
+            raise ValueError(f"Unknown timeframe: {timeframe} (expected one of {', '.join(self.weights)})")
+        return timeframe
+
+    def analyze(self, symbol, timeframe, snapshot, rules, now):
+        """(strength, frame report, source) for one timeframe, or None if it is missing"""
+        key = (symbol, timeframe)
+        closes_at = self._closes_at(timeframe, snapshot, now) if snapshot else None
+        with self.lock:
+            if rules is not self.rules:
+                self.entries.clear()
+                self.rules = rules
+            entry = self.entries.get(key)
+            if entry is not None and now < entry[0] and (closes_at is None or closes_at == entry[0]):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2], 'cache'
+            if not snapshot:
+                self.missing += 1
+                return None
+            self.misses += 1
+        signals, strength, _ = rules.analyze_technical(snapshot)
+        return strength, self.store(key, closes_at, signals, strength, rules), 'request'
+
+    def store(self, key, closes_at, signals, strength, rules):
+        """Cache one analysis; returns its part of the report, built once per candle"""
+        frame = {
+            'weight': self.weights[key[1]],
+            'strength': round(strength, 2),
+            'direction': direction(strength),
+            'signals': list(signals),
+            'candle_close': datetime.fromtimestamp(closes_at).isoformat(),
+        }
+        with self.lock:
+            if self.rules is not None and rules is not self.rules:
+                return frame  # analyzed with rules that have since been swapped out
+            self.rules = rules
+            self.entries[key] = (closes_at, strength, frame)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return frame
+
+    def combine(self, request_data, signals, technical_strength, writers_strength, rules, now=None):
+        """(confluence strength, report) for a payload with `timeframes`
+
+        signals and technical_strength are the primary timeframe's analysis,
+        which is cached for requests that reference it from another timeframe.
+        """
+        if now is None:
+            now = time.time()
+        symbol = str(request_data.get('symbol') or '')
+        primary = self._timeframe(request_data.get('timeframe') or self.primary)
+        frames = request_data['timeframes']
+        if isinstance(frames, list):
+            frames = dict.fromkeys(frames)
+        if not isinstance(frames, dict):
+            raise ValueError("timeframes must be an object of snapshots or a list of timeframe names")
+
+        primary_closes_at = self._closes_at(primary, request_data, now)
+        frame = self.store((symbol, primary), primary_closes_at, signals, technical_strength, rules)
+        analyses = {primary: (technical_strength, frame, 'request')}
+        missing = []
+        for timeframe, snapshot in frames.items():
+            if self._timeframe(timeframe) == primary:
+                continue
+            if snapshot is not None and not isinstance(snapshot, dict):
+                raise ValueError(f"The {timeframe} snapshot must be an object or null")
+            analysis = self.analyze(symbol, timeframe, snapshot, rules, now)
+            if analysis is None:
+                missing.append(timeframe)
+            else:
+                analyses[timeframe] = analysis
+
+        total_weight = sum(self.weights[timeframe] for timeframe in analyses)
+        if total_weight > 0:
+            strength = sum(self.weights[timeframe] * analysis[0] for timeframe, analysis in analyses.items())
+            strength /= total_weight
+        else:
+            strength = technical_strength
+        directions = {analysis[1]['direction'] for analysis in analyses.values()}
+        report = {
+            'primary': primary,
+            'strength': round(strength + writers_strength, 2),
+            'technical_strength': round(strength, 2),
+            'aligned': len(directions) == 1 and 'NEUTRAL' not in directions,
+            'timeframes': {
+                timeframe: dict(analysis[1], source=analysis[2])
+                for timeframe, analysis in sorted(analyses.items(), key=lambda item: self.seconds[item[0]])
+            },
+            'missing': missing,
+        }
+        return strength + writers_strength, report
+
+    def stats(self):
+        """Counters for /health"""
+        lookups = self.hits + self.misses
+        return {
+            'weights': self.weights,
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'missing': self.missing,
+        }
@@ -0,0 +1,55 @@
+"""Request/response JSON codec with an optional orjson fast path
+
+orjson parses the n8n payload and serialises responses several times
+faster than the stdlib json module. It is optional: without it, or with
+JSON_CODEC=stdlib, the stdlib is used with the same settings as Flask's
+jsonify (sorted keys, compact separators, trailing newline). Inputs orjson
+rejects but the stdlib accepts (NaN and Infinity literals) fall back to the
+stdlib, so both backends accept the same requests; responses orjson cannot
+encode (integers beyond 64 bits) fall back too. Responses are equivalent
+JSON, except that orjson writes NaN as null where the stdlib writes NaN.
+"""
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+if os.environ.get('JSON_CODEC', 'auto') == 'stdlib':
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'stdlib'
+
+if orjson is not None:
+    _DUMP_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE | orjson.OPT_SERIALIZE_NUMPY
+
+
+def stdlib_loads(data):
+    return json.loads(data)
+
+
+def stdlib_dumps(obj):
+    """Serialise like flask.jsonify"""
+    return (json.dumps(obj, separators=(',', ':'), sort_keys=True) + '\n').encode()
+
+
+def loads(data):
+    """Parse a JSON request body (bytes or str)"""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return stdlib_loads(data)
+
+
+def dumps(obj):
+    """Serialise a response body to UTF-8 bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=_DUMP_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+    return stdlib_dumps(obj)
@@ -0,0 +1,227 @@
+"""Load test: sync gunicorn workers vs the ASGI app under uvicorn
+
+Starts each server on the same box with the same number of worker
+processes (`batched` is the ASGI app with micro-batching), drives /predict with keep-alive clients at each concurrency
+level, and reports p50/p99 latency and throughput. Optional slow clients
+send their headers and then stall, like a slow n8n client, and hold
+their connection for the whole run.
+
+Usage:
+    python load_test.py [--servers sync,async,batched] [--concurrency 100,250,500,1000]
+                        [--duration 10] [--workers 4] [--slow-clients 0] [--batch-window-ms 2] [--json]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmark_predict_batch import make_snapshot
+
+HOST = '127.0.0.1'
+
+SERVERS = {
+    'sync': [sys.executable, '-m', 'gunicorn', 'ai_model_api_fixed:app',
+             '--workers', '{workers}', '--bind', '{host}:{port}', '--backlog', '4096'],
+    'async': [sys.executable, '-m', 'uvicorn', 'ai_model_asgi:app', '--workers', '{workers}',
+              '--host', '{host}', '--port', '{port}', '--backlog', '4096',
+              '--no-access-log', '--log-level', 'warning'],
+}
+SERVERS['batched'] = SERVERS['async']
+
+# Extra environment per server ({batch_window_ms} is filled in from the command line)
+SERVER_ENV = {'batched': {'MICRO_BATCH_WINDOW_MS': '{batch_window_ms}'}}
+
+
+def raise_file_limit():
+    """Allow as many sockets as the hard limit permits (1000 connections exceed the usual soft limit)"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def start_server(name, port, workers, batch_window_ms=2):
+    """Launch a server in the background and wait for /health"""
+    command = [arg.format(workers=workers, host=HOST, port=port) for arg in SERVERS[name]]
+    env = dict(os.environ)
+    env.update({key: value.format(batch_window_ms=batch_window_ms) for key, value in SERVER_ENV.get(name, {}).items()})
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{name} server exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://{HOST}:{port}/health", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{name} server did not become ready")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def build_request(port, payload):
+    body = json.dumps(payload).encode()
+    head = (f"POST /predict HTTP/1.1\r\nHost: {HOST}:{port}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n").encode()
+    return head + body
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep_alive, body)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("server closed the connection")
+    version, status = status_line.split(b' ', 2)[:2]
+    length, keep_alive = 0, version == b'HTTP/1.1'
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.partition(b':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'connection':
+            keep_alive = value == b'keep-alive' or (keep_alive and value != b'close')
+    body = await reader.readexactly(length)
+    return int(status), keep_alive, body
+
+
+async def client(port, request, deadline, latencies, counters):
+    """One connection sending requests back to back, reconnecting when the server closes it"""
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(HOST, port)
+            writer.write(request)
+            status, keep_alive, _ = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            counters['errors'] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.01)
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            counters['errors'] += 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def slow_client(port, request, deadline):
+    """Send the headers, then stall until the end of the run"""
+    try:
+        _, writer = await asyncio.open_connection(HOST, port)
+        writer.write(request[:request.index(b'\r\n\r\n') + 4])
+        await asyncio.sleep(max(deadline - time.perf_counter(), 0))
+        writer.close()
+    except OSError:
+        pass
+
+
+async def drive(port, connections, slow, duration, seed):
+    rng = random.Random(seed)
+    requests = [build_request(port, make_snapshot(rng)) for _ in range(16)]
+    latencies, counters = [], {'errors': 0}
+    deadline = time.perf_counter() + duration
+    tasks = [slow_client(port, requests[0], deadline) for _ in range(slow)]
+    tasks += [client(port, requests[i % len(requests)], deadline, latencies, counters) for i in range(connections)]
+    await asyncio.gather(*tasks)
+    return latencies, counters['errors']
+
+
+def client_process(args):
+    """Entry point of one load-generating process"""
+    raise_file_limit()
+    return asyncio.run(drive(*args))
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)]
+
+
+def run_level(pool, processes, port, concurrency, slow, duration):
+    """Spread the connections over the client processes and merge their results"""
+    jobs = []
+    for p in range(processes):
+        connections = concurrency // processes + (p < concurrency % processes)
+        stalled = slow // processes + (p < slow % processes)
+        jobs.append((port, connections, stalled, duration, p))
+    latencies, errors = [], 0
+    for part, part_errors in pool.map(client_process, jobs):
+        latencies += part
+        errors += part_errors
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servers', default='sync,async')
+    parser.add_argument('--concurrency', default='100,250,500,1000')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="server worker processes")
+    parser.add_argument('--client-processes', type=int, default=max((os.cpu_count() or 2) // 2, 1))
+    parser.add_argument('--slow-clients', type=int, default=0, help="stalled connections held during each run")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--batch-window-ms', type=float, default=2, help="micro-batch window of the batched server")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    raise_file_limit()
+    levels = [int(c) for c in args.concurrency.split(',')]
+    results = {}
+    with multiprocessing.Pool(args.client_processes) as pool:
+        for name in args.servers.split(','):
+            server = start_server(name, args.port, args.workers, args.batch_window_ms)
+            try:
+                run_level(pool, args.client_processes, args.port, 10, 0, 1)  # warm up
+                results[name] = {level: run_level(pool, args.client_processes, args.port, level,
+                                                  args.slow_clients, args.duration) for level in levels}
+            finally:
+                stop_server(server)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'server':<7} {'conns':>6} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, by_level in results.items():
+        for level, stats in by_level.items():
+            print(f"{name:<7} {level:>6} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>9,.0f} "
+                  f"{stats['p50_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['max_ms']:>8.2f}")
+        print(f"{name:<7} max rps {max(stats['rps'] for stats in by_level.values()):,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""Prometheus metrics that aggregate across gunicorn workers
+
+Every metric is a fixed int64 slot. Recording a sample adds to a plain
+list in the worker. A process that serves requests calls start() on its
+first one, which creates its own file of slots in METRICS_DIR and maps it
+with mmap. After that, a background thread refreshes the gauges (the
+`collect` callback) and copies the list into the file every flush_seconds.
+The list is also copied before a scrape and at exit. A gunicorn --preload
+master and forked optimizer processes never serve requests, so they never
+show up. /metrics is served by whichever worker the scrape lands on, and
+it sums the files of all workers. Counters and histograms include workers
+that have exited, so they never go backwards. Gauges only count live
+workers. Without a directory the slots live in anonymous memory and only
+the current process is reported.
+
+A worker's file is named after its pid and a random boot id, so a worker
+that gets the pid of one that exited starts a new file instead of
+truncating the old one's counters. Of several files with one pid, only the
+newest can belong to a live worker.
+
+Updates take no lock: each process writes only its own slots, and the
+servers this app runs under (gunicorn sync workers, the ASGI event loop)
+handle one request at a time per process. A lock would cost more than the
+sample itself. Under threaded workers, a thread switch in the middle of an
+increment can occasionally drop a sample.
+
+Latencies are recorded in nanoseconds and exposed in seconds. Clear
+METRICS_DIR when the server starts, like prometheus_client's multiprocess
+directory, so files left by an earlier deployment are not counted.
+"""
+import atexit
+import logging
+import mmap
+import os
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'trading_ai'
+
+# Stages timed per request (see professional_signal_generation and the endpoints)
+STAGES = ('parse', 'analyze_technical', 'analyze_writers', 'decision', 'serialization')
+
+# Histogram upper bounds in nanoseconds (1µs .. 100ms); one more bucket holds +Inf
+STAGE_BUCKETS_NS = (
+    1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000,
+    1000000, 5000000, 25000000, 100000000,
+)
+
+SIGNALS = ('BUY_CE', 'BUY_PE', 'HOLD')
+ENDPOINTS = (
+    'predict', 'predict_batch', 'stream_ticks', 'health', 'update_accuracy', 'accuracy', 'get_stats',
+    'window_stats', 'option_chain', 'optimize', 'metrics',
+)
+# Endpoints that generate predictions (the label of prediction_errors_total)
+PREDICTION_ENDPOINTS = ('predict', 'predict_batch', 'stream_ticks')
+
+# (name, type, help, label name, label values); counters and gauges without labels use ()
+METRICS = (
+    ('predictions_total', 'counter', "Predictions made, by signal", 'signal', SIGNALS),
+    ('prediction_errors_total', 'counter', "Predictions that failed and were returned as HOLD, by endpoint",
+     'endpoint', PREDICTION_ENDPOINTS),
+    ('requests_total', 'counter', "HTTP requests, by endpoint", 'endpoint', ENDPOINTS),
+    ('request_errors_total', 'counter', "HTTP responses with a 4xx/5xx status, by endpoint", 'endpoint', ENDPOINTS),
+    ('response_cache_hits_total', 'counter', "Response cache hits", None, ()),
+    ('response_cache_misses_total', 'counter', "Response cache misses", None, ()),
+    ('response_cache_evictions_total', 'counter', "Response cache LRU evictions", None, ()),
+    ('workers', 'gauge', "Live worker processes", None, ()),
+    ('history_rows', 'gauge', "Rows held in the signal history ring buffers", None, ()),
+    ('history_bytes', 'gauge', "Memory held by the signal history ring buffers", None, ()),
+    ('response_cache_entries', 'gauge', "Entries held in the response caches", None, ()),
+    ('stream_symbols', 'gauge', "Symbols with an open bar on the tick stream", None, ()),
+    ('optimizer_running', 'gauge', "Workers running a weight optimization", None, ()),
+)
+
+
+def _layout():
+    """Slot index of every series and histogram; slot 0 holds a fingerprint of the layout"""
+    slots, index = {}, 1
+    for name, kind, _, _, values in METRICS:
+        for value in values or (None,):
+            slots[(name, value)] = index
+            index += 1
+    stage_slots = {}
+    for stage in STAGES:
+        stage_slots[stage] = index
+        index += len(STAGE_BUCKETS_NS) + 2  # buckets, +Inf, sum
+    fingerprint = zlib.crc32(repr((METRICS, STAGES, STAGE_BUCKETS_NS)).encode())
+    return slots, stage_slots, index, fingerprint
+
+
+# Offset of a histogram's sum slot from its first bucket slot
+SUM_OFFSET = len(STAGE_BUCKETS_NS) + 1
+
+# SLOTS[(metric, label value)] and STAGE_SLOTS[stage] are what callers pass to inc/set/observe
+SLOTS, STAGE_SLOTS, SLOT_COUNT, FINGERPRINT = _layout()
+# Flask endpoint name (or ASGI path without the slash) -> (requests slot, errors slot)
+ENDPOINT_SLOTS = {
+    endpoint: (SLOTS[('requests_total', endpoint)], SLOTS[('request_errors_total', endpoint)])
+    for endpoint in ENDPOINTS
+}
+GAUGE_SLOTS = tuple(
+    SLOTS[(name, value)] for name, kind, _, _, values in METRICS if kind == 'gauge' for value in values or (None,)
+)
+
+
+class MetricsRegistry:
+    """This process's metric slots, plus the reader that merges every worker"""
+
+    def __init__(self, directory=None, flush_seconds=1.0, collect=None):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self.collect_gauges = collect
+        self._reset()
+        # Forked children (gunicorn --preload workers) start from zero with no file
+        os.register_at_fork(after_in_child=self._reset)
+        atexit.register(self.flush)
+
+    def _path(self):
+        return os.path.join(self.directory, f"worker_{self.pid}_{self.boot_id}.metrics")
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.boot_id = os.urandom(4).hex()
+        self.started = False
+        self.map = None
+        self.values = [0] * SLOT_COUNT
+        self.values[0] = FINGERPRINT
+        self.values[SLOTS[('workers', None)]] = 1
+
+    def start(self):
+        """Publish this process as a worker: create its slot file and flush thread"""
+        self.started = True
+        if not self.directory:
+            return
+        nbytes = 8 * SLOT_COUNT
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(), 'w+b') as f:
+            f.truncate(nbytes)
+            self.map = mmap.mmap(f.fileno(), nbytes)
+        self.flush()
+        threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        pid = self.pid
+        while self.pid == pid:
+            time.sleep(self.flush_seconds)
+            try:
+                if self.collect_gauges is not None:
+                    self.collect_gauges()
+            except Exception as e:
+                logger.error(f"Error collecting gauges: {e}")
+            self.flush()
+
+    def flush(self):
+        """Copy this process's slots to its file"""
+        if self.map is not None and self.pid == os.getpid():
+            self.map[:] = array('q', self.values).tobytes()
+
+    def inc(self, slot, amount=1):
+        self.values[slot] += amount
+
+    def set(self, slot, value):
+        self.values[slot] = value
+
+    def observe(self, stage_slot, elapsed_ns):
+        """Record one latency sample for a stage (stage_slot from STAGE_SLOTS)"""
+        values = self.values
+        values[stage_slot + bisect_left(STAGE_BUCKETS_NS, elapsed_ns)] += 1
+        values[stage_slot + SUM_OFFSET] += elapsed_ns
+
+    def _worker_files(self):
+        """(path, pid, modified time in ns, slots) for every worker file with the current layout"""
+        if not self.directory:
+            yield None, self.pid, 0, self.values
+            return
+        for entry in os.scandir(self.directory):
+            if not (entry.name.startswith('worker_') and entry.name.endswith('.metrics')):
+                continue
+            try:
+                pid = int(entry.name[len('worker_'):-len('.metrics')].split('_')[0])
+                with open(entry.path, 'rb') as f:
+                    modified_ns = os.fstat(f.fileno()).st_mtime_ns
+                    data = f.read()
+            except (ValueError, OSError):
+                continue
+            if len(data) != 8 * SLOT_COUNT:
+                continue
+            values = array('q', data)
+            if values[0] == FINGERPRINT:
+                yield entry.path, pid, modified_ns, values
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def collect(self):
+        """Slot totals over all workers: counters from every file, gauges from live workers only"""
+        totals = [0] * SLOT_COUNT
+        self.flush()
+        own_path = self._path() if self.map is not None else None
+        files = list(self._worker_files())
+        newest = {}
+        for path, pid, modified_ns, _ in files:
+            newest[pid] = max(newest.get(pid, modified_ns), modified_ns)
+        for path, pid, modified_ns, values in files:
+            for i in range(1, SLOT_COUNT):
+                totals[i] += values[i]
+            if path is None or path == own_path:
+                continue
+            # A file of this process's pid that is not its own, or an older file of a reused pid, is dead
+            if pid == self.pid or modified_ns < newest[pid] or not self._alive(pid):
+                for i in GAUGE_SLOTS:
+                    totals[i] -= values[i]
+        return totals
+
+    def render(self):
+        """Prometheus text exposition (format 0.0.4) of the merged totals"""
+        totals = self.collect()
+        lines = []
+        for name, kind, help_text, label, values in METRICS:
+            full_name = f"{PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            if label is None:
+                lines.append(f"{full_name} {totals[SLOTS[(name, None)]]}")
+            for value in values:
+                lines.append(f'{full_name}{{{label}="{value}"}} {totals[SLOTS[(name, value)]]}')
+
+        full_name = f"{PREFIX}_stage_seconds"
+        lines.append(f"# HELP {full_name} Latency of each request stage")
+        lines.append(f"# TYPE {full_name} histogram")
+        for stage in STAGES:
+            base = STAGE_SLOTS[stage]
+            cumulative = 0
+            for i, bound in enumerate(STAGE_BUCKETS_NS + (None,)):
+                cumulative += totals[base + i]
+                le = '+Inf' if bound is None else f"{bound / 1e9:g}"
+                lines.append(f'{full_name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{full_name}_sum{{stage="{stage}"}} {totals[base + SUM_OFFSET] / 1e9!r}')
+            lines.append(f'{full_name}_count{{stage="{stage}"}} {cumulative}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,86 @@
+"""Micro-batching of concurrent requests on an asyncio event loop
+
+When a candle closes, every n8n workflow posts to /predict within the same
+few milliseconds. Under the ASGI app, a MicroBatcher holds each request for
+at most `window_seconds`. When the window ends, or the batch reaches
+`max_batch`, it scores the whole batch in one synchronous call and resolves
+every waiting request with its own result. Requests with the same key
+(identical body and query string) in one window share a single entry and
+its result. Sync gunicorn workers serve one request at a time, so there is
+nothing to batch there.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Collects submissions for up to window_seconds, then scores them with one call"""
+
+    def __init__(self, score, window_seconds=0.002, max_batch=256):
+        if window_seconds <= 0 or max_batch < 1:
+            raise ValueError("The batch window must be positive and max_batch at least 1")
+        self.score = score  # list of items -> list of results, in order
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self.items = []  # (item, future) waiting for the current window
+        self.futures = {}  # key -> future of the entry already waiting for it
+        self.timer = None
+        self.batches = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.largest_batch = 0
+
+    async def submit(self, key, item):
+        """Result of scoring item, batched with the other submissions of this window"""
+        self.requests += 1
+        future = self.futures.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self.futures[key] = future
+            self.items.append((item, future))
+            if len(self.items) >= self.max_batch:
+                self.flush()
+            elif self.timer is None:
+                self.timer = loop.call_later(self.window_seconds, self.flush)
+        # A client that disconnects must not cancel a result other requests share
+        return await asyncio.shield(future)
+
+    def flush(self):
+        """Score every waiting submission now"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        items, self.items = self.items, []
+        self.futures = {}
+        if not items:
+            return
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(items))
+        try:
+            results = self.score([item for item, _ in items])
+        except Exception as e:
+            logger.error(f"Error scoring a micro-batch of {len(items)}: {e}")
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        """Counters for /health"""
+        return {
+            'window_ms': self.window_seconds * 1000,
+            'max_batch': self.max_batch,
+            'batches': self.batches,
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'largest_batch': self.largest_batch,
+            'mean_batch': round((self.requests - self.coalesced) / self.batches, 1) if self.batches else 0.0,
+        }
@@ -0,0 +1,168 @@
+"""Named models selected per request by symbol or strategy id
+
+Each model is one JSON file in the registry directory, named after the model:
+
+    NIFTY.json
+    {"version": 3, "aliases": ["nifty-scalper"], "polarity": "legacy",
+     "pattern_weights": {"vix_high": -0.8}, "decision_thresholds": {"strong_strength": 2.5}}
+
+Requests select a model by its file name or one of its aliases (a symbol or
+strategy id). Weights and thresholds the file leaves out keep the defaults.
+A model is built on the first request that selects it, and keeps its own
+signal history, accuracy tracker and response cache. Models with identical
+parameters share one compiled rule table (see signal_rules.compile_rules).
+
+The directory is rescanned every poll_seconds. A loaded model whose file
+`version` changed gets the new parameters through update_parameters, a hot
+swap that keeps its history. New and removed files update the index. Names
+the registry does not know select the default model.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _read_config(path):
+    with open(path) as f:
+        document = json.load(f)
+    if not isinstance(document, dict):
+        raise ValueError("a model config must be a JSON object")
+    return document
+
+
+class ModelRegistry:
+    """Lazily built models keyed by name, with aliases and versioned hot reload"""
+
+    def __init__(self, default_model, directory=None, factory=None, polarity='legacy', poll_seconds=5):
+        self.default_model = default_model
+        self.directory = directory
+        self.factory = factory  # name -> new model with default parameters
+        self.polarity = polarity
+        self.poll_seconds = poll_seconds
+        self.lock = threading.RLock()
+        self.configs = {}  # model name -> (path, mtime_ns, config document)
+        self.aliases = {}  # model name or alias -> model name
+        self.models = {}  # model name -> loaded model
+        self.versions = {}  # model name -> config version the loaded model runs
+        self.defaults = None  # (pattern_weights, decision_thresholds) of a fresh model
+        self.next_poll = 0.0
+
+    def select(self, key):
+        """(model name, model) for a model name, alias, symbol or strategy id
+
+        Empty or unknown keys select the default model, with name None.
+        """
+        if not key or not isinstance(key, str) or not self.directory:
+            return None, self.default_model
+        if time.monotonic() >= self.next_poll:
+            self.refresh()
+        name = self.aliases.get(key)
+        if name is None:
+            return None, self.default_model
+        model = self.models.get(name)
+        if model is None:
+            model = self._load(name)
+        return name, model
+
+    def resolve(self, key):
+        return self.select(key)[1]
+
+    def refresh(self):
+        """Rescan the directory, reindex it and hot-swap loaded models whose version changed"""
+        with self.lock:
+            self.next_poll = time.monotonic() + self.poll_seconds
+            configs = {}
+            try:
+                entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+            except FileNotFoundError:
+                entries = []
+            for entry in entries:
+                name = entry.name[:-len('.json')]
+                previous = self.configs.get(name)
+                try:
+                    mtime = entry.stat().st_mtime_ns
+                    if previous is not None and previous[1] == mtime:
+                        configs[name] = previous
+                        continue
+                    configs[name] = (entry.path, mtime, _read_config(entry.path))
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error reading model config {entry.path}: {e}")
+                    if previous is not None:
+                        configs[name] = previous
+
+            aliases = {name: name for name in configs}
+            for name, (_, _, document) in sorted(configs.items()):
+                for alias in document.get('aliases', ()):
+                    if aliases.setdefault(alias, name) != name:
+                        logger.error(f"Model alias {alias} is claimed by {aliases[alias]} and {name}")
+            self.configs, self.aliases = configs, aliases
+
+            for name in list(self.models):
+                if name not in configs:
+                    del self.models[name], self.versions[name]
+                    logger.info(f"Model {name} removed from the registry")
+                elif configs[name][2].get('version') != self.versions[name]:
+                    try:
+                        self._configure(self.models[name], configs[name][2])
+                        self.versions[name] = configs[name][2].get('version')
+                        logger.info(f"Model {name} reloaded at version {self.versions[name]}")
+                    except (TypeError, ValueError) as e:
+                        logger.error(f"Error reloading model {name}: {e}")
+
+    def _configure(self, model, document):
+        weights = dict(self.defaults[0], **document.get('pattern_weights', {}))
+        thresholds = dict(self.defaults[1], **document.get('decision_thresholds', {}))
+        model.update_parameters(weights, thresholds, polarity=document.get('polarity', self.polarity))
+
+    def _load(self, name):
+        """Build a model from its config on first use"""
+        with self.lock:
+            model = self.models.get(name)
+            if model is not None:
+                return model
+            document = self.configs[name][2]
+            model = self.factory(name)
+            if self.defaults is None:
+                self.defaults = (dict(model.rules.pattern_weights), dict(model.rules.decision_thresholds))
+            try:
+                self._configure(model, document)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Model {name}: {e}") from e
+            self.models[name] = model
+            self.versions[name] = document.get('version')
+            logger.info(f"Model {name} loaded at version {self.versions[name]}")
+            return model
+
+    def save_parameters(self, name, pattern_weights, decision_thresholds, **info):
+        """Write new parameters into a model's config with the next version (every worker reloads it)"""
+        with self.lock:
+            path = self.configs[name][0]
+            document = _read_config(path)
+            document.update(info, pattern_weights=pattern_weights, decision_thresholds=decision_thresholds)
+            version = document.get('version')
+            document['version'] = version + 1 if isinstance(version, int) else 1
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(document, f, indent=2)
+            os.replace(tmp_path, path)
+            self.next_poll = 0.0
+        return document['version']
+
+    def describe(self):
+        """Configured models with their aliases, versions and whether this worker has loaded them"""
+        if self.directory and time.monotonic() >= self.next_poll:
+            self.refresh()
+        models = {}
+        for name, (_, _, document) in sorted(self.configs.items()):
+            model = self.models.get(name)
+            models[name] = {
+                'aliases': list(document.get('aliases', ())),
+                'version': document.get('version'),
+                'loaded': model is not None,
+                'total_signals': len(model.model_data['signals']) if model is not None else 0,
+            }
+        return models
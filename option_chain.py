@@ -0,0 +1,241 @@
+"""Server-side option chains and the writers zone summary computed from them
+
+n8n posts the full chain of one expiry as columns, one list per field, all
+aligned with `strikes`:
+
+    {"symbol": "NIFTY", "expiry": "2024-01-25", "spot": 24631.3,
+     "strikes": [24500, 24550, ...],
+     "ce_oi": [...], "pe_oi": [...], "ce_ltp": [...], "pe_ltp": [...],
+     "ce_volume": [...], "pe_volume": [...]}
+
+Each chain is kept sorted by strike as one NumPy array per field. A snapshot
+with "mode": "delta" lists only the strikes that changed, and only the
+fields that changed; they are located with a binary search and written in
+place (new strikes are merged in). The summary is computed with array
+operations over the strikes around the money and cached until the next
+update. It has the same fields as the writers zone part of a /predict
+payload, so it is scored by the existing writers zone rules:
+
+- writersZone: BULLISH when put writers hold more open interest than call
+  writers (PCR >= PCR_BULLISH), BEARISH when call writers dominate
+  (PCR <= PCR_BEARISH), otherwise NEUTRAL
+- confidence: |ln PCR| / ln 2, capped at 1 (PCR 2 or 0.5 gives 1.0)
+- putCallPremiumRatio: premium held by put writers (LTP x OI) over call writers
+- marketStructure: PUT_PREMIUM_HIGH above 1.2, CALL_PREMIUM_HIGH below 0.8
+- maxCELTP / maxPELTP: LTP at the strike with the most call / put open interest
+- supportLevels / resistanceLevels: the strikes at or below spot / at or
+  above spot that hold at least LEVEL_OI_SHARE of the put / call open
+  interest on their side of the money, largest first. Open interest piled
+  on one strike is a writers' wall; two walls on a side fire STRONG_SUPPORT
+  / STRONG_RESISTANCE, so a chain with evenly spread open interest fires
+  neither
+
+Chains live in the memory of the worker that received them (see
+OptionChainStore).
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # OptionChain needs NumPy; the rest of the API does not
+    np = None
+
+FIELDS = ('ce_oi', 'pe_oi', 'ce_ltp', 'pe_ltp', 'ce_volume', 'pe_volume')
+CE_OI, PE_OI, CE_LTP, PE_LTP, CE_VOLUME, PE_VOLUME = range(len(FIELDS))
+
+# Strikes on each side of the money that the summary looks at
+ZONE_STRIKES = 10
+# Share of one side's open interest a strike needs to count as a support or
+# resistance level (the most a smooth chain's strikes reach is about 15-20%)
+LEVEL_OI_SHARE = 0.2
+# Open interest PCR cutoffs for the writers zone
+PCR_BULLISH = 1.2
+PCR_BEARISH = 0.8
+# Premium ratio cutoffs for the market structure
+PREMIUM_PUT_HIGH = 1.2
+PREMIUM_CALL_HIGH = 0.8
+
+
+def _column(snapshot, name, count):
+    """A snapshot field as a float array of `count` finite values"""
+    values = np.asarray(snapshot[name], dtype=np.float64)
+    if values.shape != (count,):
+        raise ValueError(f"{name} must be a list of {count} numbers, one per strike")
+    if not np.isfinite(values).all():
+        raise ValueError(f"{name} must contain only finite numbers")
+    return values
+
+
+def _levels(strikes, oi):
+    """Strikes holding at least LEVEL_OI_SHARE of the open interest given, largest first"""
+    total = oi.sum()
+    if total <= 0:
+        return strikes[:0]
+    walls = oi >= LEVEL_OI_SHARE * total
+    return strikes[walls][np.argsort(-oi[walls], kind='stable')]
+
+
+class OptionChain:
+    """Strike-indexed columns of one expiry's option chain"""
+
+    def __init__(self):
+        self.strikes = np.empty(0)
+        self.values = np.zeros((len(FIELDS), 0))
+        self.spot = None
+        self.version = 0
+        self.updated_at = None
+        self._summary = None
+
+    def apply(self, snapshot, delta=False):
+        """Replace the chain with a full snapshot, or write a delta into it"""
+        strikes = snapshot.get('strikes')
+        if not isinstance(strikes, list) or not strikes:
+            raise ValueError("strikes must be a non-empty list")
+        strikes = _column(snapshot, 'strikes', len(strikes))
+        order = np.argsort(strikes, kind='stable')
+        strikes = strikes[order]
+        if (np.diff(strikes) == 0).any():
+            raise ValueError("strikes must be unique")
+        fields = [(i, _column(snapshot, name, len(strikes))[order])
+                  for i, name in enumerate(FIELDS) if snapshot.get(name) is not None]
+        spot = self.spot
+        if snapshot.get('spot') is not None:
+            spot = float(snapshot['spot'])
+            if not math.isfinite(spot) or spot <= 0:
+                raise ValueError("spot must be a positive number")
+
+        if not delta:
+            self.strikes = strikes
+            self.values = np.zeros((len(FIELDS), len(strikes)))
+            positions = slice(None)
+        else:
+            positions = np.searchsorted(self.strikes, strikes)
+            known = positions < len(self.strikes)
+            known[known] = self.strikes[positions[known]] == strikes[known]
+            if not known.all():
+                merged = np.union1d(self.strikes, strikes)
+                values = np.zeros((len(FIELDS), len(merged)))
+                values[:, np.searchsorted(merged, self.strikes)] = self.values
+                self.strikes, self.values = merged, values
+                positions = np.searchsorted(merged, strikes)
+        for i, column in fields:
+            self.values[i, positions] = column
+
+        self.spot = spot
+        self.version += 1
+        self.updated_at = time.time()
+        self._summary = None
+
+    def _money(self):
+        """(index of the at-the-money strike, spot); spot is implied by put-call parity if not sent"""
+        strikes, values = self.strikes, self.values
+        if self.spot is not None:
+            return int(np.abs(strikes - self.spot).argmin()), self.spot
+        gap = np.abs(values[CE_LTP] - values[PE_LTP])
+        gap[(values[CE_LTP] <= 0) | (values[PE_LTP] <= 0)] = np.inf
+        atm = int(gap.argmin())
+        if not np.isfinite(gap[atm]):
+            atm = len(strikes) // 2
+            return atm, float(strikes[atm])
+        return atm, float(strikes[atm] + values[CE_LTP, atm] - values[PE_LTP, atm])
+
+    def summary(self):
+        """Writers zone fields for /predict, plus the PCR and the money they were computed around"""
+        if self._summary is not None:
+            return self._summary
+        atm, spot = self._money()
+        band = slice(max(atm - ZONE_STRIKES, 0), atm + ZONE_STRIKES + 1)
+        strikes, values = self.strikes[band], self.values[:, band]
+        ce_oi, pe_oi = values[CE_OI], values[PE_OI]
+        ce_total, pe_total = ce_oi.sum(), pe_oi.sum()
+        ce_premium, pe_premium = values[CE_LTP] @ ce_oi, values[PE_LTP] @ pe_oi
+
+        pcr = float(pe_total / ce_total) if ce_total > 0 else None
+        if pcr is None:
+            # No call open interest near the money: only put writers, if anyone
+            zone, confidence = ('BULLISH', 1.0) if pe_total > 0 else ('NEUTRAL', 0.0)
+        else:
+            zone = 'BULLISH' if pcr >= PCR_BULLISH else 'BEARISH' if pcr <= PCR_BEARISH else 'NEUTRAL'
+            confidence = min(abs(math.log(pcr)) / math.log(2), 1.0) if pcr > 0 else 1.0
+        premium_ratio = pe_premium / ce_premium if ce_premium > 0 else 1.0
+        if premium_ratio > PREMIUM_PUT_HIGH:
+            structure = 'PUT_PREMIUM_HIGH'
+        elif premium_ratio < PREMIUM_CALL_HIGH:
+            structure = 'CALL_PREMIUM_HIGH'
+        else:
+            structure = 'BALANCED'
+
+        below, above = strikes <= spot, strikes >= spot
+        support = _levels(strikes[below], pe_oi[below])
+        resistance = _levels(strikes[above], ce_oi[above])
+
+        self._summary = {
+            'writersZone': zone,
+            'confidence': round(confidence, 3),
+            'putCallPremiumRatio': round(float(premium_ratio), 3),
+            'marketStructure': structure,
+            'maxCELTP': float(values[CE_LTP, ce_oi.argmax()]) if ce_total > 0 else 0.0,
+            'maxPELTP': float(values[PE_LTP, pe_oi.argmax()]) if pe_total > 0 else 0.0,
+            'supportLevels': support.tolist(),
+            'resistanceLevels': resistance.tolist(),
+            'pcr': round(pcr, 3) if pcr is not None else None,
+            'atmStrike': float(self.strikes[atm]),
+            'spot': round(spot, 2),
+        }
+        return self._summary
+
+
+class OptionChainStore:
+    """The latest chain per (symbol, expiry) in this worker, least recently updated evicted first
+
+    Nothing is shared between processes: under several gunicorn workers a
+    chain posted to one worker is unknown to the others, so /predict with an
+    optionChain (and any delta) needs a single worker.
+    """
+
+    def __init__(self, max_chains=64):
+        if np is None:
+            raise RuntimeError("OptionChainStore requires numpy")
+        self.max_chains = max_chains
+        self.chains = OrderedDict()
+        self.lock = threading.Lock()
+
+    def update(self, snapshot):
+        """Apply one snapshot; returns ((symbol, expiry), summary, version, strike count)
+
+        Raises ValueError for a malformed snapshot and KeyError for a delta
+        against a chain this worker does not hold.
+        """
+        symbol, expiry = snapshot.get('symbol'), snapshot.get('expiry')
+        if not isinstance(symbol, str) or not symbol or not isinstance(expiry, str) or not expiry:
+            raise ValueError("symbol and expiry are required")
+        mode = snapshot.get('mode', 'full')
+        if mode not in ('full', 'delta'):
+            raise ValueError("mode must be 'full' or 'delta'")
+        key = (symbol, expiry)
+        with self.lock:
+            chain = self.chains.get(key)
+            if chain is None:
+                if mode == 'delta':
+                    raise KeyError(f"No {symbol} {expiry} chain to apply a delta to; send a full snapshot")
+                chain = OptionChain()
+            chain.apply(snapshot, delta=mode == 'delta')
+            self.chains[key] = chain
+            self.chains.move_to_end(key)
+            while len(self.chains) > self.max_chains:
+                self.chains.popitem(last=False)
+            return key, chain.summary(), chain.version, len(chain.strikes)
+
+    def summary(self, symbol, expiry=None):
+        """Summary of a symbol's chain: the given expiry, or else the nearest one held (None if none)"""
+        with self.lock:
+            if expiry is None:
+                expiries = [key[1] for key in self.chains if key[0] == symbol]
+                if not expiries:
+                    return None
+                expiry = min(expiries)  # ISO dates sort chronologically
+            chain = self.chains.get((symbol, expiry))
+            return chain.summary() if chain is not None else None
@@ -0,0 +1,83 @@
+"""Accuracy, P&L and holding time of attributed outcomes, broken down incrementally
+
+Every outcome attached to a prediction id adds to one bucket per breakdown:
+the prediction's signal, its market regime, its VIX condition and its exact
+combination of detected signals (the signal mask). Only the bucket counters
+are kept, so a report costs the number of distinct buckets, not the number
+of predictions.
+"""
+from signal_history import SIGNAL_LABELS, decode_context, decode_signal_mask
+
+BREAKDOWNS = ('signal', 'regime', 'vix_condition', 'combination')
+
+# Bucket layout: outcomes, correct, outcomes with P&L, P&L sum, outcomes with holding time, holding sum
+OUTCOMES, CORRECT, PNL_COUNT, PNL_SUM, HOLDING_COUNT, HOLDING_SUM = range(6)
+
+
+class OutcomeStats:
+    """Running outcome counters per signal, regime, VIX condition and signal combination"""
+
+    def __init__(self):
+        # breakdown -> raw key (signal code, context nibble or signal mask) -> bucket
+        self.groups = {breakdown: {} for breakdown in BREAKDOWNS}
+        self.outcomes = 0
+
+    def add(self, signal_code, signal_mask, context, correct, pnl=float('nan'), holding_seconds=float('nan')):
+        """Count one attributed outcome (NaN pnl/holding_seconds: not reported)"""
+        self.outcomes += 1
+        groups = self.groups
+        for breakdown, key in (('signal', signal_code), ('regime', context & 15),
+                               ('vix_condition', context >> 4), ('combination', signal_mask)):
+            bucket = groups[breakdown].get(key)
+            if bucket is None:
+                bucket = groups[breakdown][key] = [0, 0, 0, 0.0, 0, 0.0]
+            bucket[OUTCOMES] += 1
+            bucket[CORRECT] += correct
+            if pnl == pnl:
+                bucket[PNL_COUNT] += 1
+                bucket[PNL_SUM] += pnl
+            if holding_seconds == holding_seconds:
+                bucket[HOLDING_COUNT] += 1
+                bucket[HOLDING_SUM] += holding_seconds
+
+    def state(self):
+        """JSON-serialisable counters (see warm_start.py)"""
+        return {'outcomes': self.outcomes,
+                'groups': {breakdown: [(key, list(bucket)) for key, bucket in buckets.items()]
+                           for breakdown, buckets in self.groups.items()}}
+
+    def load_state(self, state):
+        """Replace the counters with a state() of another instance"""
+        self.outcomes = state['outcomes']
+        self.groups = {breakdown: {key: list(bucket) for key, bucket in state['groups'].get(breakdown, ())}
+                       for breakdown in BREAKDOWNS}
+
+    @staticmethod
+    def _label(breakdown, key):
+        if breakdown == 'signal':
+            return SIGNAL_LABELS.get(key, 'HOLD')
+        if breakdown == 'regime':
+            return decode_context(key)[0]
+        if breakdown == 'vix_condition':
+            return decode_context(key << 4)[1]
+        return decode_signal_mask(key)
+
+    def report(self, breakdown, limit=None, min_outcomes=1):
+        """Buckets of one breakdown, most outcomes first"""
+        if breakdown not in self.groups:
+            raise ValueError(f"Unknown breakdown: {breakdown} (expected one of {BREAKDOWNS})")
+        buckets = [(key, bucket) for key, bucket in self.groups[breakdown].items() if bucket[OUTCOMES] >= min_outcomes]
+        buckets.sort(key=lambda item: item[1][OUTCOMES], reverse=True)
+        rows = []
+        for key, bucket in buckets[:limit]:
+            rows.append({
+                'key': self._label(breakdown, key),
+                'outcomes': bucket[OUTCOMES],
+                'correct': bucket[CORRECT],
+                'accuracy': round(bucket[CORRECT] / bucket[OUTCOMES], 3),
+                'total_pnl': round(bucket[PNL_SUM], 2) if bucket[PNL_COUNT] else None,
+                'avg_pnl': round(bucket[PNL_SUM] / bucket[PNL_COUNT], 2) if bucket[PNL_COUNT] else None,
+                'avg_holding_seconds': (round(bucket[HOLDING_SUM] / bucket[HOLDING_COUNT], 1)
+                                        if bucket[HOLDING_COUNT] else None),
+            })
+        return rows
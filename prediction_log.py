@@ -0,0 +1,399 @@
+"""Append-only prediction and outcome log shared by every gunicorn worker
+
+The log is a single file of fixed 64-byte little-endian records behind a
+64-byte header. Workers append with O_APPEND writes, which the kernel
+serialises per write. The one read-then-write, checking that a prediction
+has no outcome yet before appending one, holds an flock on the file, so two
+workers cannot both attribute feedback to the same prediction; readers also
+count only the first outcome of a prediction. Readers keep the
+file mapped, remap it only when it has grown, and only decode records
+appended since their last read. Because the file outlives the process,
+stats survive restarts.
+
+A prediction's id is its record number, which the writer learns from its
+own file offset right after the append. Outcome records reuse the numeric
+fields: signal_mask holds the attributed prediction id + 1 (0 for feedback
+without an id), confidence the P&L and strength the holding time in seconds
+(NaN when not reported). The byte after the outcome field packs the
+prediction's market regime and VIX condition (see signal_history.encode_context).
+
+Offline analysis:
+    python prediction_log.py predictions.log [--csv out.csv]
+"""
+import argparse
+import mmap
+import os
+import struct
+import threading
+import time
+import weakref
+import zlib
+
+from outcome_stats import OutcomeStats
+from signal_history import SIGNAL_CODES, SIGNAL_LABELS, DuplicateOutcome
+from window_stats import WindowStats
+
+try:
+    import numpy as np
+except ImportError:  # read_records() needs NumPy; appending and stats do not
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # No flock (Windows): readers still drop the duplicate outcomes
+    fcntl = None
+
+MAGIC = b'NTAIPLOG'
+VERSION = 1
+HEADER = struct.Struct('<8sII48x')
+RECORD = struct.Struct('<qddQdddIbbbB')
+
+KIND_PREDICTION = 1
+KIND_OUTCOME = 2
+
+# NumPy view of RECORD, for zero-copy reads of the whole log
+RECORD_FIELDS = [
+    ('timestamp_ns', '<i8'),
+    ('confidence', '<f8'),
+    ('strength', '<f8'),
+    ('signal_mask', '<u8'),
+    ('ltp', '<f8'),
+    ('rsi', '<f8'),
+    ('vix', '<f8'),
+    ('pid', '<u4'),
+    ('kind', 'i1'),
+    ('signal', 'i1'),
+    ('outcome', 'i1'),
+    ('context', 'u1'),
+]
+
+
+# Open logs, reopened in every forked child by a single fork hook
+_logs = weakref.WeakSet()
+
+
+def _reopen_after_fork():
+    for log in list(_logs):
+        log._reopen()
+
+
+os.register_at_fork(after_in_child=_reopen_after_fork)
+
+
+def _create(path):
+    """Create the log with its header atomically (only one worker wins the link)"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+    try:
+        os.link(tmp_path, path)
+    except FileExistsError:
+        pass
+    finally:
+        os.unlink(tmp_path)
+
+
+def _check_header(path):
+    """Validate the header of an existing log"""
+    with open(path, 'rb') as f:
+        magic, version, record_size = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"{path} is not a version {VERSION} prediction log")
+
+
+class PredictionLog:
+    """Writer and incremental reader for one prediction log file"""
+
+    def __init__(self, path, stats_windows=None):
+        self.path = path
+        if not os.path.exists(path):
+            _create(path)
+        _check_header(path)
+        self._open()
+        # A worker forked from a gunicorn --preload master gets its own descriptors:
+        # _append reads the offset of its own write, which a shared one would not give
+        _logs.add(self)
+
+        # Running totals over the records read so far
+        self._lock = threading.Lock()
+        self._map = None  # read-only mapping of the file, remapped when it has grown
+        self._scanned = 0
+        self._counts = {'predictions': 0, 'outcomes': 0, 'correct': 0}
+        self._signals = {label: 0 for label in SIGNAL_CODES}
+        self.outcome_stats = OutcomeStats()
+        self._attributed = bytearray()  # bit per record: prediction already has an outcome
+        # Rolling counters over every worker's records (stats_windows such as ('5m', '1h'))
+        self.window_stats = WindowStats(stats_windows) if stats_windows else None
+
+    def _open(self):
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        self.read_fd = os.open(self.path, os.O_RDONLY)
+        self._write_lock = threading.Lock()
+        self._outcome_lock = threading.Lock()  # flock is per open file, so threads also need this
+
+    def _reopen(self):
+        """Replace the descriptors and locks inherited across a fork by the child's own"""
+        os.close(self.fd)
+        os.close(self.read_fd)
+        self._open()
+        self._lock = threading.Lock()  # another parent thread may have held it at the fork
+
+    def close(self):
+        _logs.discard(self)
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        os.close(self.fd)
+        os.close(self.read_fd)
+
+    def _pack_prediction(self, signal, confidence, strength, signal_mask, ltp, rsi, vix, context, timestamp_ns, pid):
+        return RECORD.pack(
+            timestamp_ns, confidence, strength, signal_mask, ltp, rsi, vix, pid,
+            KIND_PREDICTION, SIGNAL_CODES.get(signal, 0), -1, context
+        )
+
+    def _append(self, data):
+        """Append records; returns the number of the first one"""
+        with self._write_lock:
+            os.write(self.fd, data)
+            # O_APPEND moved this descriptor's offset to the end of our own write
+            end = os.lseek(self.fd, 0, os.SEEK_CUR)
+        return (end - HEADER.size - len(data)) // RECORD.size
+
+    def append_prediction(self, signal, confidence, strength, signal_mask, ltp, rsi, vix, timestamp_ns=None,
+                          context=0):
+        """Append one prediction record; returns its id"""
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        return self._append(self._pack_prediction(
+            signal, confidence, strength, signal_mask, ltp, rsi, vix, context, timestamp_ns, os.getpid()
+        ))
+
+    def append_predictions(self, rows, timestamp_ns=None):
+        """Append many (signal, confidence, strength, signal_mask, ltp, rsi, vix, context) rows in one write
+
+        Returns the id of the first row; the rest follow consecutively.
+        """
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        pid = os.getpid()
+        data = b''.join(self._pack_prediction(*row, timestamp_ns, pid) for row in rows)
+        if data:
+            return self._append(data)
+        return None
+
+    def append_outcome(self, predicted_signal, correct, timestamp_ns=None, prediction_id=None,
+                       pnl=float('nan'), holding_seconds=float('nan')):
+        """Append one outcome record for /update_accuracy feedback
+
+        With a prediction_id, the prediction's own signal is recorded and the
+        outcome counts in the breakdowns. Raises KeyError for an id that is not
+        a prediction in this log and DuplicateOutcome if any worker has already
+        recorded one.
+        """
+        context = 0
+        if prediction_id is not None:
+            record = self.prediction(prediction_id)
+            predicted_signal, context = SIGNAL_LABELS.get(record[9], 'HOLD'), record[11]
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        nan = float('nan')
+        data = RECORD.pack(
+            timestamp_ns, pnl, holding_seconds, 0 if prediction_id is None else prediction_id + 1,
+            nan, nan, nan, os.getpid(),
+            KIND_OUTCOME, SIGNAL_CODES.get(predicted_signal, 0), 1 if correct else 0, context
+        )
+        if prediction_id is None:
+            self._append(data)
+            return
+        with self._outcome_lock:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                if self.has_outcome(prediction_id):
+                    raise DuplicateOutcome(f"Prediction {prediction_id} already has an outcome")
+                self._append(data)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def prediction(self, prediction_id):
+        """The unpacked prediction record with this id (KeyError if there is none)"""
+        record = None
+        if isinstance(prediction_id, int) and prediction_id >= 0:
+            data = os.pread(self.read_fd, RECORD.size, HEADER.size + prediction_id * RECORD.size)
+            if len(data) == RECORD.size:
+                record = RECORD.unpack(data)
+        if record is None or record[8] != KIND_PREDICTION:
+            raise KeyError(f"Unknown prediction id: {prediction_id}")
+        return record
+
+    def has_outcome(self, prediction_id):
+        """True if an outcome for this prediction is in the log"""
+        with self._lock:
+            self._scan()
+            return self._is_attributed(prediction_id)
+
+    def _is_attributed(self, prediction_id):
+        byte = prediction_id >> 3
+        return byte < len(self._attributed) and bool(self._attributed[byte] >> (prediction_id & 7) & 1)
+
+    def record_count(self):
+        """Number of complete records in the file"""
+        return max(os.path.getsize(self.path) - HEADER.size, 0) // RECORD.size
+
+    def _scan(self):
+        """Fold the records appended since the last scan into the totals (caller holds the lock)"""
+        total = self.record_count()
+        if total <= self._scanned:
+            return
+        if len(self._attributed) * 8 < total:
+            self._attributed.extend(bytes(total // 8 + 1 - len(self._attributed)))
+        window_stats = self.window_stats
+        start = HEADER.size + self._scanned * RECORD.size
+        end = HEADER.size + total * RECORD.size
+        if self._map is None or len(self._map) < end:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self.read_fd, 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        try:
+            for record in RECORD.iter_unpack(view[start:end]):
+                kind, signal, outcome = record[8], record[9], record[10]
+                if kind == KIND_PREDICTION:
+                    self._counts['predictions'] += 1
+                    self._signals[SIGNAL_LABELS.get(signal, 'HOLD')] += 1
+                    if window_stats is not None:
+                        window_stats.record_prediction(signal, record[1], record[11], record[0] / 1e9)
+                elif kind == KIND_OUTCOME:
+                    prediction_id = record[3] - 1
+                    attributed = 0 <= prediction_id < total
+                    # Only the first outcome for a prediction counts (a writer without flock can race)
+                    if attributed and self._is_attributed(prediction_id):
+                        continue
+                    self._counts['outcomes'] += 1
+                    self._counts['correct'] += outcome == 1
+                    if window_stats is not None:
+                        window_stats.record_outcome(outcome == 1, record[1], record[0] / 1e9)
+                    if attributed:
+                        self._attributed[prediction_id >> 3] |= 1 << (prediction_id & 7)
+                        prediction = RECORD.unpack_from(view, HEADER.size + prediction_id * RECORD.size)
+                        self.outcome_stats.add(prediction[9], prediction[3], prediction[11],
+                                               outcome == 1, record[1], record[2])
+        finally:
+            view.release()
+        self._scanned = total
+
+    def _tail_crc(self, records):
+        """CRC of the last of the first `records` records (of the header for 0), to recognise the file"""
+        if records == 0:
+            return zlib.crc32(os.pread(self.read_fd, HEADER.size, 0))
+        return zlib.crc32(os.pread(self.read_fd, RECORD.size, HEADER.size + (records - 1) * RECORD.size))
+
+    def checkpoint(self):
+        """The totals scanned so far, for warm_start.py: (state, attributed bitmap, window rings)"""
+        with self._lock:
+            state = {
+                'path': self.path,
+                'scanned': self._scanned,
+                'tail_crc': self._tail_crc(self._scanned),
+                'counts': dict(self._counts),
+                'signals': dict(self._signals),
+                'outcome_stats': self.outcome_stats.state(),
+                'window_stats': None,
+            }
+            rings = {}
+            if self.window_stats is not None:
+                state['window_stats'], rings = self.window_stats.state()
+            return state, bytes(self._attributed), rings
+
+    def resume(self, state, attributed, rings):
+        """Continue from a checkpoint() instead of scanning the log from its first record
+
+        Returns False and keeps the reader as it was if it has already
+        scanned, or if the file does not hold the checkpointed records (a
+        different or truncated log).
+        """
+        with self._lock:
+            scanned = state['scanned']
+            if (self._scanned or state['path'] != self.path or self.record_count() < scanned
+                    or self._tail_crc(scanned) != state['tail_crc']):
+                return False
+            self._counts = dict(state['counts'])
+            self._signals = dict(self._signals, **state['signals'])
+            self.outcome_stats.load_state(state['outcome_stats'])
+            self._attributed = bytearray(attributed)
+            if self.window_stats is not None and state['window_stats'] is not None:
+                self.window_stats.load_state(state['window_stats'], rings)
+            self._scanned = scanned
+            return True
+
+    def stats(self):
+        """Totals over every record written by any worker, read incrementally from the mapping"""
+        with self._lock:
+            self._scan()
+            return dict(self._counts, signals=dict(self._signals))
+
+    def window_report(self, window, now):
+        """WindowStats.report over every worker's records, ending at `now`"""
+        with self._lock:
+            self._scan()
+            return self.window_stats.report(window, now)
+
+    def breakdown(self, breakdown, limit=None, min_outcomes=1):
+        """OutcomeStats.report over every attributed outcome in the log"""
+        with self._lock:
+            self._scan()
+            return self.outcome_stats.report(breakdown, limit, min_outcomes)
+
+
+def read_records(path):
+    """Map the whole log as a read-only NumPy structured array (no copy)"""
+    if np is None:
+        raise RuntimeError("read_records requires numpy")
+    _check_header(path)
+    count = max(os.path.getsize(path) - HEADER.size, 0) // RECORD.size
+    if count == 0:
+        return np.zeros(0, dtype=RECORD_FIELDS)
+    return np.memmap(path, dtype=RECORD_FIELDS, mode='r', offset=HEADER.size, shape=(count,))
+
+
+def to_dataframe(path):
+    """Load the log into a pandas DataFrame with decoded signal labels and timestamps"""
+    import pandas as pd
+
+    records = read_records(path)
+    frame = pd.DataFrame({name: records[name] for name, _ in RECORD_FIELDS})
+    frame['timestamp'] = pd.to_datetime(frame['timestamp_ns'], unit='ns')
+    outcomes = frame['kind'] == KIND_OUTCOME
+    frame['prediction_id'] = (frame['signal_mask'].astype('int64') - 1).where(outcomes & (frame['signal_mask'] > 0))
+    frame['pnl'] = frame['confidence'].where(outcomes)
+    frame['holding_seconds'] = frame['strength'].where(outcomes)
+    frame['kind'] = frame['kind'].map({KIND_PREDICTION: 'prediction', KIND_OUTCOME: 'outcome'})
+    frame['signal'] = frame['signal'].map(SIGNAL_LABELS)
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise or export a prediction log")
+    parser.add_argument('path')
+    parser.add_argument('--csv', help="export every record to this CSV file (needs pandas)")
+    args = parser.parse_args()
+
+    _check_header(args.path)
+    log = PredictionLog(args.path)
+    stats = log.stats()
+    records = log.record_count()
+    log.close()
+    accuracy = stats['correct'] / stats['outcomes'] if stats['outcomes'] else 0.0
+    print(f"records: {records}")
+    print(f"predictions: {stats['predictions']} {stats['signals']}")
+    print(f"outcomes: {stats['outcomes']} accuracy: {accuracy:.3f}")
+
+    if args.csv:
+        to_dataframe(args.path).to_csv(args.csv, index=False)
+        print(f"wrote {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""LRU/TTL cache of prediction results keyed on the decision-relevant inputs
+
+n8n often polls /predict several times within one candle with the same or
+nearly the same indicator payload. CompiledRules.decision_key reduces a
+payload to the inputs that can change the outcome (status codes and each
+numeric input's position relative to the cutoffs it is compared against),
+so those polls share one entry. Entries belong to one compiled rule set:
+when the parameters are swapped, the cache empties on its next use.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with a per-entry time to live"""
+
+    def __init__(self, max_entries=1024, ttl_seconds=60):
+        if max_entries < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()  # key -> (value, expires_at), least recently used first
+        self.rules = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _check_rules(self, rules):
+        """Drop every entry computed with a different rule set (caller holds the lock)"""
+        if rules is not self.rules:
+            if self.entries:
+                self.invalidations += 1
+                self.entries.clear()
+            self.rules = rules
+
+    def get(self, key, rules):
+        """Cached value for a key under these rules, or None"""
+        with self.lock:
+            self._check_rules(rules)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, rules, value):
+        """Store a value, evicting the least recently used entries beyond max_entries"""
+        with self.lock:
+            if self.rules is not None and rules is not self.rules:
+                return  # computed with rules that have since been swapped out
+            self.rules = rules
+            self.entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Counters for /health"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,372 @@
+"""Fixed-width ring buffer for the signal history
+
+Each prediction is stored as one row of typed columns (stdlib ``array``), so
+memory grows by a fixed number of bytes per row regardless of payload size.
+Raw request payloads are optional and kept zlib-compressed. When no shared
+log is configured, a row's prediction id is "<boot id>:<sequence number>",
+and /update_accuracy feedback is attached to the row in place. The boot id
+is random per process, so ids of different workers never collide, even
+when a new worker reuses the pid of an old one. A history restored from a
+warm-start snapshot keeps honouring the ids of the process that saved it.
+
+Writes take the history's lock. Readers of single rows do not need it;
+anything that copies the whole ring (warm-start snapshots, the optimizer)
+goes through snapshot() or copy(), which hold it while they read.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+
+from signal_rules import SIGNAL_NAMES
+
+SIGNAL_CODES = {'HOLD': 0, 'BUY_CE': 1, 'BUY_PE': -1}
+SIGNAL_LABELS = {code: label for label, code in SIGNAL_CODES.items()}
+
+# Market regime and VIX condition of a prediction, packed into one byte (regime in
+# the low nibble); code 0 is UNKNOWN. Keep in sync with determine_market_regime
+# and determine_vix_condition.
+REGIME_LABELS = (
+    'UNKNOWN', 'HIGH_VOLATILITY', 'LOW_VOLATILITY', 'STRONG_BULLISH_TREND', 'STRONG_BEARISH_TREND',
+    'BULLISH_TREND', 'BEARISH_TREND', 'SIDEWAYS_RANGING', 'SIDEWAYS_MARKET',
+)
+VIX_CONDITION_LABELS = ('UNKNOWN', 'LOW_VOLATILITY', 'NORMAL_VOLATILITY', 'HIGH_VOLATILITY', 'EXTREME_VOLATILITY')
+REGIME_CODES = {label: code for code, label in enumerate(REGIME_LABELS)}
+VIX_CONDITION_CODES = {label: code for code, label in enumerate(VIX_CONDITION_LABELS)}
+
+# Outcome column values; NO_OUTCOME until feedback arrives
+NO_OUTCOME = -1
+OUTCOME_LABELS = {NO_OUTCOME: None, 0: 'incorrect', 1: 'correct'}
+
+# (column, array typecode)
+HISTORY_COLUMNS = (
+    ('timestamp_ns', 'q'),
+    ('signal', 'b'),
+    ('confidence', 'd'),
+    ('strength', 'd'),
+    ('signal_mask', 'Q'),
+    ('ltp', 'd'),
+    ('rsi', 'd'),
+    ('vix', 'd'),
+    ('context', 'B'),
+    ('outcome', 'b'),
+    ('pnl', 'd'),
+    ('holding_seconds', 'd'),
+)
+
+
+def decode_signal_mask(mask):
+    """Signal names set in a signal mask, in rule-table order"""
+    return [name for i, name in enumerate(SIGNAL_NAMES) if mask >> i & 1]
+
+
+def encode_context(market_regime, vix_condition):
+    """Pack a market regime and VIX condition into one byte"""
+    return REGIME_CODES.get(market_regime, 0) | VIX_CONDITION_CODES.get(vix_condition, 0) << 4
+
+
+def decode_context(context):
+    """(market regime, VIX condition) labels of a packed context byte"""
+    vix_code = context >> 4
+    return (REGIME_LABELS[context & 15] if context & 15 < len(REGIME_LABELS) else 'UNKNOWN',
+            VIX_CONDITION_LABELS[vix_code] if vix_code < len(VIX_CONDITION_LABELS) else 'UNKNOWN')
+
+
+def _optional(value):
+    """NaN marks a value the feedback did not include"""
+    return None if value != value else value
+
+
+def ns_to_isoformat(timestamp_ns):
+    """Local-time ISO timestamp with microseconds, like datetime.now().isoformat()"""
+    seconds, nanos = divmod(timestamp_ns, 10**9)
+    return datetime.fromtimestamp(seconds).replace(microsecond=nanos // 1000).isoformat()
+
+
+# Fields a history entry can carry, and how each is rebuilt from a ring slot.
+# 'seq' (the row's position in the whole append sequence) is added by entry().
+FIELD_READERS = {
+    'timestamp': lambda cols, slot: ns_to_isoformat(cols['timestamp_ns'][slot]),
+    'signal': lambda cols, slot: SIGNAL_LABELS[cols['signal'][slot]],
+    'confidence': lambda cols, slot: cols['confidence'][slot],
+    'all_signals': lambda cols, slot: decode_signal_mask(cols['signal_mask'][slot]),
+    'strength': lambda cols, slot: cols['strength'][slot],
+    'ltp': lambda cols, slot: cols['ltp'][slot],
+    'rsi': lambda cols, slot: cols['rsi'][slot],
+    'vix': lambda cols, slot: cols['vix'][slot],
+    'regime': lambda cols, slot: decode_context(cols['context'][slot])[0],
+    'vix_condition': lambda cols, slot: decode_context(cols['context'][slot])[1],
+    'outcome': lambda cols, slot: OUTCOME_LABELS[cols['outcome'][slot]],
+    'pnl': lambda cols, slot: _optional(cols['pnl'][slot]),
+    'holding_seconds': lambda cols, slot: _optional(cols['holding_seconds'][slot]),
+}
+ENTRY_FIELDS = ('timestamp', 'signal', 'confidence', 'all_signals', 'strength')
+PAGE_FIELDS = ('seq',) + ENTRY_FIELDS
+
+
+def _new_boot_id():
+    global _boot_id
+    _boot_id = os.urandom(4).hex()
+
+
+def boot_id():
+    """Random id of this process, renewed in forked children"""
+    return _boot_id
+
+
+_new_boot_id()
+os.register_at_fork(after_in_child=_new_boot_id)
+
+
+class DuplicateOutcome(ValueError):
+    """Feedback for a prediction that already has an outcome"""
+
+
+class OtherWorkerPrediction(LookupError):
+    """Feedback for a prediction held in another worker's history"""
+
+
+class SignalHistory:
+    """Ring buffer of predictions with one typed array per column"""
+
+    def __init__(self, capacity=1000, store_raw=False, compress_level=1):
+        if capacity < 1:
+            raise ValueError("History capacity must be at least 1")
+        self.capacity = capacity
+        self.store_raw = store_raw
+        self.compress_level = compress_level
+        self.columns = {name: array(code, bytes(array(code).itemsize * capacity)) for name, code in HISTORY_COLUMNS}
+        self.raw = [None] * capacity if store_raw else None
+        self.head = 0  # slot the next row is written to
+        self.count = 0
+        self.total_appended = 0
+        self.lock = threading.Lock()
+        # Ids handed out by this process start at first_own_seq; earlier processes' ids
+        # still held (after a warm start) are boot id -> (first seq, end seq)
+        self.first_own_seq = 0
+        self.earlier_ids = {}
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.entry(i)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the fixed columns plus compressed payloads"""
+        size = sum(col.itemsize * len(col) for col in self.columns.values())
+        if self.raw is not None:
+            size += 8 * self.capacity + sum(len(blob) for blob in self.raw if blob is not None)
+        return size
+
+    def append(self, signal, confidence, strength, signal_mask, ltp, rsi, vix,
+               technical_data=None, writers_data=None, timestamp_ns=None, context=0):
+        """Record one prediction, overwriting the oldest row when full; returns its sequence number"""
+        blob = None
+        if self.raw is not None:
+            payload = json.dumps([technical_data, writers_data], separators=(',', ':'), default=str)
+            blob = zlib.compress(payload.encode(), self.compress_level)
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
+        with self.lock:
+            slot = self.head
+            cols = self.columns
+            cols['timestamp_ns'][slot] = timestamp_ns
+            cols['signal'][slot] = SIGNAL_CODES.get(signal, 0)
+            cols['confidence'][slot] = confidence
+            cols['strength'][slot] = strength
+            cols['signal_mask'][slot] = signal_mask
+            cols['ltp'][slot] = ltp
+            cols['rsi'][slot] = rsi
+            cols['vix'][slot] = vix
+            cols['context'][slot] = context
+            cols['outcome'][slot] = NO_OUTCOME
+            cols['pnl'][slot] = cols['holding_seconds'][slot] = float('nan')
+            if self.raw is not None:
+                self.raw[slot] = blob
+
+            self.head = (slot + 1) % self.capacity
+            if self.count < self.capacity:
+                self.count += 1
+            self.total_appended += 1
+            return self.total_appended - 1
+
+    def _slot(self, index):
+        """Ring slot of the index-th oldest row (negative indexes count from the newest)"""
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("history index out of range")
+        return (self.head - self.count + index) % self.capacity
+
+    @property
+    def first_seq(self):
+        """Sequence number of the oldest row still held"""
+        return self.total_appended - self.count
+
+    def prediction_id(self, seq):
+        """prediction_id of the row with this sequence number"""
+        return f"{boot_id()}:{seq}"
+
+    def resolve_id(self, prediction_id):
+        """Sequence number of a prediction_id this history handed out
+
+        Raises ValueError for a malformed id, OtherWorkerPrediction for an id
+        of another process and KeyError for an id this history never handed out.
+        """
+        boot, separator, seq = str(prediction_id).partition(':')
+        if not separator:
+            raise ValueError(f"Malformed prediction id: {prediction_id}")
+        seq = int(seq)
+        if boot == boot_id():
+            start, end = self.first_own_seq, self.total_appended
+        elif boot in self.earlier_ids:
+            start, end = self.earlier_ids[boot]
+        else:
+            raise OtherWorkerPrediction(f"Prediction {prediction_id} was made by another worker")
+        if not start <= seq < end:
+            raise KeyError(f"Unknown prediction id: {prediction_id}")
+        return seq
+
+    def id_ranges(self):
+        """Boot id -> [first seq, end seq] of the ids whose rows are still held"""
+        ranges = dict(self.earlier_ids, **{boot_id(): (self.first_own_seq, self.total_appended)})
+        first_seq = self.first_seq
+        return {boot: [max(start, first_seq), end] for boot, (start, end) in ranges.items() if end > first_seq}
+
+    def record_outcome(self, seq, correct, pnl=float('nan'), holding_seconds=float('nan')):
+        """Attach feedback to the row with this sequence number
+
+        Returns the row's (signal code, signal mask, context). Raises KeyError
+        if the row is unknown or already overwritten, DuplicateOutcome if it
+        already has an outcome.
+        """
+        with self.lock:
+            index = seq - self.first_seq
+            if not 0 <= index < self.count:
+                raise KeyError(f"Unknown prediction id: {seq}")
+            slot = self._slot(index)
+            cols = self.columns
+            if cols['outcome'][slot] != NO_OUTCOME:
+                raise DuplicateOutcome(f"Prediction {seq} already has an outcome")
+            cols['outcome'][slot] = 1 if correct else 0
+            cols['pnl'][slot] = pnl
+            cols['holding_seconds'][slot] = holding_seconds
+            return cols['signal'][slot], cols['signal_mask'][slot], cols['context'][slot]
+
+    def entry(self, index, include_raw=True, fields=ENTRY_FIELDS):
+        """Rebuild the history dict for one row, with the given fields"""
+        slot = self._slot(index)
+        cols = self.columns
+        entry = {}
+        for field in fields:
+            if field == 'seq':
+                entry['seq'] = self.first_seq + (index if index >= 0 else index + self.count)
+            else:
+                entry[field] = FIELD_READERS[field](cols, slot)
+        if include_raw and self.raw is not None and self.raw[slot] is not None:
+            technical_data, writers_data = json.loads(zlib.decompress(self.raw[slot]))
+            entry['technical_data'] = technical_data
+            entry['writers_data'] = writers_data
+        return entry
+
+    def recent(self, n=10, include_raw=True):
+        """The last n rows, oldest first"""
+        n = min(n, self.count)
+        return [self.entry(i, include_raw) for i in range(self.count - n, self.count)]
+
+    def index_after(self, timestamp_ns):
+        """Index of the first row recorded after timestamp_ns (rows are in append order)"""
+        timestamps = self.columns['timestamp_ns']
+        start = self.head - self.count
+        return bisect_right(range(self.count), timestamp_ns,
+                            key=lambda i: timestamps[(start + i) % self.capacity])
+
+    def page(self, limit=10, after_seq=None, after_ns=None, include_raw=False, fields=PAGE_FIELDS):
+        """Up to `limit` rows, oldest first, read by index without copying the buffer
+
+        With after_seq or after_ns, the rows following that sequence number or
+        timestamp; otherwise the newest rows. Returns (rows, seq of the last
+        row returned, or None if there are none).
+        """
+        if after_seq is not None:
+            start = min(max(after_seq + 1 - self.first_seq, 0), self.count)
+        elif after_ns is not None:
+            start = self.index_after(after_ns)
+        else:
+            start = max(self.count - limit, 0)
+        end = min(start + limit, self.count)
+        rows = [self.entry(i, include_raw, fields) for i in range(start, end)]
+        return rows, (self.first_seq + end - 1 if end > start else None)
+
+    def rows_bytes(self):
+        """Each column's rows, oldest first, as raw bytes (see snapshot() for a consistent copy)"""
+        start = (self.head - self.count) % self.capacity
+        rows = {}
+        for name, column in self.columns.items():
+            view, size = memoryview(column).cast('B'), column.itemsize
+            if start + self.count <= self.capacity:
+                rows[name] = view[start * size:(start + self.count) * size].tobytes()
+            else:
+                rows[name] = view[start * size:].tobytes() + view[:self.head * size].tobytes()
+            view.release()
+        return rows
+
+    def raw_rows(self):
+        """Compressed payloads of the rows, oldest first (None when not stored)"""
+        if self.raw is None:
+            return None
+        return [self.raw[self._slot(i)] for i in range(self.count)]
+
+    def restore_rows(self, rows, count, total_appended, raw=None, id_ranges=None):
+        """Refill the ring from rows_bytes() output of `count` rows, keeping the newest that fit
+
+        `rows` maps each column to a bytes-like object; sequence numbers
+        continue from total_appended. id_ranges (from id_ranges()) are the
+        earlier processes' ids that stay valid for the restored rows.
+        """
+        keep = min(count, self.capacity)
+        with self.lock:
+            self._clear()
+            for name, code in HISTORY_COLUMNS:
+                column = array(code)
+                column.frombytes(rows[name][(count - keep) * column.itemsize:])
+                self.columns[name][:keep] = column
+            if self.raw is not None and raw is not None:
+                self.raw[:keep] = raw[count - keep:]
+            self.head = keep % self.capacity
+            self.count = keep
+            self.total_appended = total_appended
+            self.first_own_seq = total_appended
+            self.earlier_ids = {boot: (max(start, total_appended - keep), min(end, total_appended))
+                                for boot, (start, end) in (id_ranges or {}).items()
+                                if boot != boot_id() and end > total_appended - keep}
+
+    def snapshot(self):
+        """(rows_bytes(), count, total_appended, raw_rows()) read together under the lock"""
+        with self.lock:
+            return self.rows_bytes(), self.count, self.total_appended, self.raw_rows()
+
+    def copy(self):
+        """A private history holding the same rows, safe to iterate while this one takes appends"""
+        rows, count, total_appended, raw = self.snapshot()
+        history = SignalHistory(max(count, 1), self.store_raw, self.compress_level)
+        history.restore_rows(rows, count, total_appended, raw)
+        return history
+
+    def clear(self):
+        """Drop every row without releasing the preallocated columns"""
+        with self.lock:
+            self._clear()
+
+    def _clear(self):
+        self.head = 0
+        self.count = 0
+        if self.raw is not None:
+            self.raw = [None] * self.capacity
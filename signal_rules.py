@@ -0,0 +1,835 @@
+"""Declarative signal rule table and the compiled engine that evaluates it
+
+The table mirrors the indicator analysis of ProfessionalTradingAI: every input
+is read from the n8n payload once, and every rule group emits at most one
+signal (the first branch whose condition holds) with a signed weight taken
+from pattern_weights. compile_rules() turns the table into generated Python
+functions once at startup, with weights and status lookups bound as
+constants, and the same table drives the vectorized batch scorer.
+"""
+import os
+import threading
+import weakref
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy as np
+except ImportError:  # Only the vectorized helpers need NumPy
+    np = None
+
+FLOAT = 'float'
+STATUS = 'status'
+COUNT = 'count'
+
+# Inputs read from the payload, in the order the original analysis read them.
+# (name, indicator object or None for top-level, field, default, kind)
+TECHNICAL_INPUTS = (
+    ('rsi', 'RSI', 'rsi', 50, FLOAT),
+    ('rsi_status', 'RSI', 'status', 'Neutral', STATUS),
+    ('ema_status', 'EMA20', 'status', 'Neutral', STATUS),
+    ('sma_status', 'SMA50', 'status', 'Neutral', STATUS),
+    ('macd_status', 'MACD', 'status', 'Neutral', STATUS),
+    ('macd_histogram', 'MACD', 'histogram', 0, FLOAT),
+    ('vix', 'VIX', 'vix', 15, FLOAT),
+    ('vix_status', 'VIX', 'status', 'Normal', STATUS),
+    ('bollinger_status', 'BollingerBands', 'status', 'Within Bands', STATUS),
+    ('cci', 'CCI', 'value', 0, FLOAT),
+    ('cci_status', 'CCI', 'status', 'Neutral', STATUS),
+    ('supertrend_status', 'SuperTrend', 'status', 'Neutral', STATUS),
+    ('volume_status', 'VolumeIndicators', 'status', 'Normal', STATUS),
+    ('volume_strength', 'VolumeStrength', 'type', 'Normal', STATUS),
+    ('aroon_status', 'Aroon', 'status', 'Neutral', STATUS),
+    ('psar_status', 'ParabolicSAR', 'status', 'Neutral', STATUS),
+    ('mfi', 'MFI', 'value', 50, FLOAT),
+    ('mfi_status', 'MFI', 'status', 'Neutral', STATUS),
+    ('price_action', 'PriceAction', 'type', 'Normal', STATUS),
+    ('atr', 'ATR', 'value', 20, FLOAT),
+    ('adx', 'ADX', 'value', 20, FLOAT),
+    ('stochastic', 'Stochastic', 'value', 50, FLOAT),
+)
+
+WRITERS_INPUTS = (
+    ('writers_zone', None, 'writersZone', 'NEUTRAL', STATUS),
+    ('writers_confidence', None, 'confidence', 0, FLOAT),
+    ('put_call_ratio', None, 'putCallPremiumRatio', 1, FLOAT),
+    ('market_structure', None, 'marketStructure', 'BALANCED', STATUS),
+    ('max_ce_ltp', None, 'maxCELTP', 0, FLOAT),
+    ('max_pe_ltp', None, 'maxPELTP', 0, FLOAT),
+    ('support_levels', None, 'supportLevels', [], COUNT),
+    ('resistance_levels', None, 'resistanceLevels', [], COUNT),
+)
+
+# Conditions: ('eq', input, (values...)), ('lt' | 'gt' | 'ge', input, threshold),
+# ('gt_input', input, other_input), ('all', cond, cond, ...), or None for "otherwise".
+# Branches: (condition, signal, weight key, sign[, input scaling the weight])
+TECHNICAL_RULES = (
+    (
+        (('lt', 'rsi', 30), 'RSI_OVERSOLD', 'rsi_oversold', 1),
+        (('gt', 'rsi', 70), 'RSI_OVERBOUGHT', 'rsi_overbought', -1),
+        (('eq', 'rsi_status', ('Neutral',)), 'RSI_NEUTRAL', 'rsi_neutral', 1),
+    ),
+    (
+        (('eq', 'ema_status', ('Bearish',)), 'EMA_BEARISH', 'ema_bearish', -1),
+        (('eq', 'ema_status', ('Bullish',)), 'EMA_BULLISH', 'ema_bullish', 1),
+    ),
+    (
+        (('eq', 'sma_status', ('Bearish',)), 'SMA_BEARISH', 'sma_bearish', -1),
+        (('eq', 'sma_status', ('Bullish',)), 'SMA_BULLISH', 'sma_bullish', 1),
+    ),
+    (
+        (('eq', 'macd_status', ('Bullish',)), 'MACD_BULLISH', 'macd_bullish', 1),
+        (('eq', 'macd_status', ('Bearish',)), 'MACD_BEARISH', 'macd_bearish', -1),
+        (None, 'MACD_NEUTRAL', 'macd_neutral', 1),
+    ),
+    (
+        (('eq', 'vix_status', ('Calm Market',)), 'VIX_CALM', 'vix_calm', 1),
+        (('gt', 'vix', 18), 'VIX_HIGH', 'vix_high', 1),
+    ),
+    (
+        (('eq', 'bollinger_status', ('Within Bands',)), 'BOLLINGER_WITHIN', 'bollinger_within', 1),
+        (('eq', 'bollinger_status', ('Above Upper', 'Overbought')), 'BOLLINGER_OVERBOUGHT', 'bollinger_overbought', -1),
+        (('eq', 'bollinger_status', ('Below Lower', 'Oversold')), 'BOLLINGER_OVERSOLD', 'bollinger_oversold', 1),
+    ),
+    (
+        (('eq', 'cci_status', ('Sell',)), 'CCI_SELL', 'cci_sell', 1),
+        (('eq', 'cci_status', ('Buy',)), 'CCI_BUY', 'cci_buy', 1),
+    ),
+    (
+        (('eq', 'supertrend_status', ('Bullish',)), 'SUPERTREND_BULLISH', 'supertrend_bullish', 1),
+        (('eq', 'supertrend_status', ('Bearish',)), 'SUPERTREND_BEARISH', 'supertrend_bearish', -1),
+    ),
+    (
+        (('eq', 'volume_status', ('Weak',)), 'VOLUME_WEAK', 'volume_weak', 1),
+        (('eq', 'volume_status', ('Strong',)), 'VOLUME_STRONG', 'volume_strong', 1),
+    ),
+    (
+        (('eq', 'volume_strength', ('Weak Volume',)), 'VOLUME_STRENGTH_WEAK', 'volume_strength_weak', 1),
+        (('eq', 'volume_strength', ('Strong Volume',)), 'VOLUME_STRENGTH_STRONG', 'volume_strength_strong', 1),
+    ),
+    (
+        (('eq', 'aroon_status', ('Uptrend',)), 'AROON_UPTREND', 'aroon_uptrend', 1),
+        (('eq', 'aroon_status', ('Downtrend',)), 'AROON_DOWNTREND', 'aroon_downtrend', -1),
+    ),
+    (
+        (('eq', 'psar_status', ('Bearish',)), 'PARABOLIC_BEARISH', 'parabolic_bearish', -1),
+        (('eq', 'psar_status', ('Bullish',)), 'PARABOLIC_BULLISH', 'parabolic_bullish', 1),
+    ),
+    (
+        (('eq', 'mfi_status', ('Oversold',)), 'MFI_OVERSOLD', 'mfi_oversold', 1),
+        (('eq', 'mfi_status', ('Overbought',)), 'MFI_OVERBOUGHT', 'mfi_overbought', -1),
+    ),
+    (
+        (('eq', 'price_action', ('Ranging',)), 'PRICE_RANGING', 'price_ranging', 1),
+        (('eq', 'price_action', ('Trending',)), 'PRICE_TRENDING', 'price_trending', 1),
+    ),
+    (
+        (('gt', 'atr', 25), 'ATR_HIGH', 'atr_high', 1),
+        (('lt', 'atr', 15), 'ATR_LOW', 'atr_low', 1),
+    ),
+    (
+        (('gt', 'adx', 25), 'ADX_STRONG_TREND', 'adx_strong_trend', 1),
+    ),
+    (
+        (('lt', 'stochastic', 20), 'STOCHASTIC_OVERSOLD', 'stochastic_oversold', 1),
+        (('gt', 'stochastic', 80), 'STOCHASTIC_OVERBOUGHT', 'stochastic_overbought', -1),
+    ),
+)
+
+WRITERS_RULES = (
+    (
+        (('all', ('eq', 'writers_zone', ('BULLISH',)), ('gt', 'writers_confidence', 0.3)),
+         'WRITERS_BULLISH', 'writers_bullish', 1, 'writers_confidence'),
+        (('all', ('eq', 'writers_zone', ('BEARISH',)), ('gt', 'writers_confidence', 0.3)),
+         'WRITERS_BEARISH', 'writers_bearish', -1, 'writers_confidence'),
+        (None, 'WRITERS_NEUTRAL', 'writers_neutral', 1),
+    ),
+    (
+        (('gt', 'put_call_ratio', 1.2), 'PREMIUM_RATIO_PUT_HEAVY', 'premium_ratio_put_heavy', -1),
+        (('lt', 'put_call_ratio', 0.8), 'PREMIUM_RATIO_CALL_HEAVY', 'premium_ratio_call_heavy', 1),
+        (None, 'PREMIUM_RATIO_BALANCED', 'premium_ratio_balanced', 1),
+    ),
+    (
+        (('eq', 'market_structure', ('CALL_PREMIUM_HIGH',)), 'MARKET_STRUCTURE_BULLISH', 'market_structure_bullish', 1),
+        (('eq', 'market_structure', ('PUT_PREMIUM_HIGH',)), 'MARKET_STRUCTURE_BEARISH', 'market_structure_bearish', -1),
+    ),
+    (
+        (('all', ('gt_input', 'max_ce_ltp', 'max_pe_ltp'), ('gt', 'max_ce_ltp', 10)),
+         'HIGH_CE_PREMIUM', 'high_ce_premium', 1),
+        (('all', ('gt_input', 'max_pe_ltp', 'max_ce_ltp'), ('gt', 'max_pe_ltp', 10)),
+         'HIGH_PE_PREMIUM', 'high_pe_premium', -1),
+    ),
+    (
+        (('ge', 'support_levels', 2), 'STRONG_SUPPORT', 'strong_support', 1),
+    ),
+    (
+        (('ge', 'resistance_levels', 2), 'STRONG_RESISTANCE', 'strong_resistance', -1),
+    ),
+)
+
+# Every signal gets a fixed integer id (its bit in a signal mask) in table order
+SIGNAL_NAMES = tuple(branch[1] for group in TECHNICAL_RULES + WRITERS_RULES for branch in group)
+SIGNAL_IDS = {name: i for i, name in enumerate(SIGNAL_NAMES)}
+
+# Polarity flags
+BULLISH = 1
+BEARISH = 2
+
+# Legacy classification: substring match on the signal name. It counts
+# HIGH_CE_PREMIUM as bearish and STRONG_RESISTANCE as bullish, and treats
+# volatility/volume/trend-strength signals as directional.
+LEGACY_BULLISH_KEYWORDS = ('BULLISH', 'OVERSOLD', 'BUY', 'UPTREND', 'STRONG', 'ABOVE', 'CALM')
+LEGACY_BEARISH_KEYWORDS = ('BEARISH', 'OVERBOUGHT', 'SELL', 'DOWNTREND', 'WEAK', 'BELOW', 'HIGH')
+
+# Corrected classification: the directional view each signal expresses.
+# Signals not listed (VIX, ATR, ADX, volume, price action, neutral states) are non-directional.
+CORRECTED_POLARITY = {
+    'RSI_OVERSOLD': BULLISH,
+    'RSI_OVERBOUGHT': BEARISH,
+    'EMA_BULLISH': BULLISH,
+    'EMA_BEARISH': BEARISH,
+    'SMA_BULLISH': BULLISH,
+    'SMA_BEARISH': BEARISH,
+    'MACD_BULLISH': BULLISH,
+    'MACD_BEARISH': BEARISH,
+    'BOLLINGER_OVERSOLD': BULLISH,
+    'BOLLINGER_OVERBOUGHT': BEARISH,
+    'CCI_BUY': BULLISH,
+    'CCI_SELL': BEARISH,
+    'SUPERTREND_BULLISH': BULLISH,
+    'SUPERTREND_BEARISH': BEARISH,
+    'AROON_UPTREND': BULLISH,
+    'AROON_DOWNTREND': BEARISH,
+    'PARABOLIC_BULLISH': BULLISH,
+    'PARABOLIC_BEARISH': BEARISH,
+    'MFI_OVERSOLD': BULLISH,
+    'MFI_OVERBOUGHT': BEARISH,
+    'STOCHASTIC_OVERSOLD': BULLISH,
+    'STOCHASTIC_OVERBOUGHT': BEARISH,
+    'WRITERS_BULLISH': BULLISH,
+    'WRITERS_BEARISH': BEARISH,
+    'PREMIUM_RATIO_CALL_HEAVY': BULLISH,
+    'PREMIUM_RATIO_PUT_HEAVY': BEARISH,
+    'MARKET_STRUCTURE_BULLISH': BULLISH,
+    'MARKET_STRUCTURE_BEARISH': BEARISH,
+    'HIGH_CE_PREMIUM': BULLISH,
+    'HIGH_PE_PREMIUM': BEARISH,
+    'STRONG_SUPPORT': BULLISH,
+    'STRONG_RESISTANCE': BEARISH,
+}
+
+POLARITY_MODES = ('legacy', 'corrected')
+
+# How make_professional_decision classifies signals as bullish/bearish:
+# 'legacy' keeps the original keyword semantics, 'corrected' uses the
+# per-signal polarities declared in CORRECTED_POLARITY.
+SIGNAL_POLARITY = os.environ.get('SIGNAL_POLARITY', 'legacy')
+
+
+def legacy_polarity(name):
+    """Polarity flags the old keyword scan assigned to a signal name"""
+    flags = 0
+    if any(word in name for word in LEGACY_BULLISH_KEYWORDS):
+        flags |= BULLISH
+    if any(word in name for word in LEGACY_BEARISH_KEYWORDS):
+        flags |= BEARISH
+    return flags
+
+
+def polarity_masks(mode):
+    """Return (bullish_mask, bearish_mask) over signal ids for a polarity mode"""
+    if mode not in POLARITY_MODES:
+        raise ValueError(f"Unknown polarity mode: {mode} (expected one of {POLARITY_MODES})")
+    bullish_mask = bearish_mask = 0
+    for name, signal_id in SIGNAL_IDS.items():
+        flags = legacy_polarity(name) if mode == 'legacy' else CORRECTED_POLARITY.get(name, 0)
+        if flags & BULLISH:
+            bullish_mask |= 1 << signal_id
+        if flags & BEARISH:
+            bearish_mask |= 1 << signal_id
+    return bullish_mask, bearish_mask
+
+
+# Weight of each rule's signal before any tuning (see MODEL_PARAMETERS_PATH)
+DEFAULT_PATTERN_WEIGHTS = {
+    # Technical Indicators
+    'rsi_neutral': 0.5,
+    'rsi_oversold': 0.8,
+    'rsi_overbought': 0.8,
+    'ema_bearish': 0.7,
+    'ema_bullish': 0.7,
+    'sma_bearish': 0.7,
+    'sma_bullish': 0.7,
+    'macd_neutral': 0.4,
+    'macd_bullish': 0.8,
+    'macd_bearish': 0.8,
+    'vix_calm': 0.9,
+    'vix_high': -0.6,
+    'bollinger_within': 0.3,
+    'bollinger_oversold': 0.8,
+    'bollinger_overbought': 0.8,
+    'cci_sell': 0.8,
+    'cci_buy': 0.8,
+    'supertrend_bullish': 0.9,
+    'supertrend_bearish': 0.9,
+    'volume_weak': -0.4,
+    'volume_strong': 0.6,
+    'aroon_uptrend': 0.7,
+    'aroon_downtrend': 0.7,
+    'parabolic_bearish': 0.6,
+    'parabolic_bullish': 0.6,
+    'mfi_oversold': 0.8,
+    'mfi_overbought': 0.8,
+    'price_ranging': -0.3,
+    'price_trending': 0.4,
+    'volume_strength_weak': -0.4,
+    'volume_strength_strong': 0.5,
+    'atr_high': -0.2,
+    'atr_low': 0.2,
+    'adx_strong_trend': 0.6,
+    'stochastic_oversold': 0.7,
+    'stochastic_overbought': 0.7,
+
+    # Writers Zone Analysis
+    'writers_bullish': 0.9,
+    'writers_bearish': 0.9,
+    'writers_neutral': 0.0,
+    'premium_ratio_call_heavy': 0.6,
+    'premium_ratio_put_heavy': 0.6,
+    'premium_ratio_balanced': 0.1,
+    'high_ce_premium': 0.5,
+    'high_pe_premium': 0.5,
+    'strong_support': 0.4,
+    'strong_resistance': 0.4,
+    'market_structure_bullish': 0.3,
+    'market_structure_bearish': 0.3,
+}
+
+# Default cutoffs of make_professional_decision: |strength| and directional
+# signal count for a strong setup, |strength| for a moderate one, and the
+# minimum confidence a moderate setup needs to trade
+DECISION_THRESHOLDS = {
+    'strong_strength': 2.0,
+    'strong_signal_count': 4,
+    'moderate_strength': 1.5,
+    'moderate_min_confidence': 0.75,
+}
+
+# Numeric cutoffs the decision step compares raw inputs against, beyond those in
+# the rule tables (make_professional_decision, determine_market_regime and
+# determine_vix_condition). Response cache keys bucket inputs at these values,
+# so keep them in sync with those methods.
+DECISION_CUTS = {
+    'rsi': (30, 35, 40, 60, 65, 70),
+    'vix': (12, 18, 20, 25),
+    'writers_confidence': (0.5,),
+}
+
+# Top-level technical field carried in the feature matrix but not scored
+CONTEXT_INPUTS = (
+    ('ltp', None, 'LTP', 0, FLOAT),
+)
+
+
+def _eq_conditions(condition):
+    """Yield (input, values) for every status comparison inside a condition"""
+    if condition is None:
+        return
+    if condition[0] == 'eq':
+        yield condition[1], condition[2]
+    elif condition[0] == 'all':
+        for part in condition[1:]:
+            yield from _eq_conditions(part)
+
+
+def _status_codes():
+    """Status vocabulary per input; code 0 means no rule matches the value"""
+    status_codes = {}
+    for group in TECHNICAL_RULES + WRITERS_RULES:
+        for branch in group:
+            for name, values in _eq_conditions(branch[0]):
+                codes = status_codes.setdefault(name, {})
+                for value in values:
+                    codes.setdefault(value, len(codes) + 1)
+    return status_codes
+
+
+# The same for every CompiledRules: it depends on the rule table, not on the weights
+STATUS_CODES = _status_codes()
+
+
+def _read_inputs(data, inputs):
+    """Read every input from the payload, converting like the original analysis did"""
+    values = []
+    for _, node, field, default, kind in inputs:
+        source = data if node is None else data.get(node, {})
+        value = source.get(field, default)
+        if kind == FLOAT:
+            value = float(value)
+        elif kind == COUNT:
+            value = len(value)
+        values.append(value)
+    return values
+
+
+def _status_lookup(table, status, default):
+    """dict.get that treats unhashable payload values as unmatched, like == would"""
+    try:
+        return table.get(status, default)
+    except TypeError:
+        return default
+
+
+class CompiledRules:
+    """Rule table with weights and status lookups resolved for one pattern_weights dict
+
+    The scalar analysers are generated as straight-line Python functions, one
+    per rule table, with every weight and status lookup bound as a constant.
+    The weights are copied at compile time, so changing pattern_weights means
+    compiling a new CompiledRules. The analysers also return a signal mask
+    (bit i set for SIGNAL_NAMES[i]) so the decision step counts bullish and
+    bearish signals with two popcounts. The decision thresholds travel with
+    the weights, so swapping the CompiledRules swaps both at once.
+    """
+
+    def __init__(self, pattern_weights, polarity='legacy', decision_thresholds=None):
+        self.pattern_weights = dict(pattern_weights)
+        self.decision_thresholds = dict(decision_thresholds or {})
+        self.signal_names = list(SIGNAL_NAMES)
+        self.polarity = polarity
+        self.bullish_mask, self.bearish_mask = polarity_masks(polarity)
+
+        self.status_codes = STATUS_CODES
+
+        self.analyze_technical = self._compile('analyze_technical', TECHNICAL_INPUTS, TECHNICAL_RULES)
+        self.analyze_writers = self._compile('analyze_writers', WRITERS_INPUTS, WRITERS_RULES)
+        self.decision_key = self._compile_decision_key()
+
+        # Feature matrix columns for the vectorized path
+        self.columns = (
+            [spec[0] for spec in CONTEXT_INPUTS]
+            + [spec[0] for spec in TECHNICAL_INPUTS]
+            + ['has_writers']
+            + [spec[0] for spec in WRITERS_INPUTS]
+        )
+        self.column_index = {name: i for i, name in enumerate(self.columns)}
+
+    def _condition_source(self, condition):
+        """Python expression for a condition tuple over the generated input variables"""
+        op = condition[0]
+        if op == 'all':
+            return ' and '.join(f"({self._condition_source(part)})" for part in condition[1:])
+        name, arg = condition[1], condition[2]
+        if op == 'eq':
+            return f"{name} == {arg[0]!r}" if len(arg) == 1 else f"{name} in {tuple(arg)!r}"
+        if op == 'gt_input':
+            return f"{name} > {arg}"
+        comparisons = {'lt': '<', 'gt': '>', 'ge': '>='}
+        if op not in comparisons:
+            raise ValueError(f"Unknown rule condition: {op}")
+        return f"{name} {comparisons[op]} {arg!r}"
+
+    def _input_lines(self, inputs, data_var, indent):
+        """Source lines reading every input from a payload variable, in payload order"""
+        lines, nodes = [], {}
+        for name, node, field, default, kind in inputs:
+            source = data_var
+            if node is not None:
+                if node not in nodes:
+                    nodes[node] = f"_{data_var}_node{len(nodes)}"
+                    lines.append(f"{indent}{nodes[node]} = {data_var}.get({node!r}, _EMPTY)")
+                source = nodes[node]
+            read = f"{source}.get({field!r}, {default!r})"
+            if kind == FLOAT:
+                read = f"float({read})"
+            elif kind == COUNT:
+                read = f"len({read})"
+            lines.append(f"{indent}{name} = {read}")
+        return lines
+
+    def _numeric_cuts(self):
+        """Every constant each numeric input is compared against, by the rules or the decision step"""
+        cuts = {name: set(values) for name, values in DECISION_CUTS.items()}
+
+        def collect(condition):
+            if condition is None or condition[0] in ('eq', 'gt_input'):
+                return
+            if condition[0] == 'all':
+                for part in condition[1:]:
+                    collect(part)
+                return
+            cuts.setdefault(condition[1], set()).add(condition[2])
+
+        for group in TECHNICAL_RULES + WRITERS_RULES:
+            for branch in group:
+                collect(branch[0])
+        return {name: tuple(sorted(values)) for name, values in cuts.items()}
+
+    def _compile_decision_key(self):
+        """Generate decision_key(technical_data, writers_data, has_writers)
+
+        Two snapshots with the same key get the same signals, strength, decision,
+        market regime and VIX condition. The key holds status codes, each numeric
+        input's position relative to every cutoff it is compared against (equal
+        to a cutoff counts as its own position), the exact value of inputs that
+        scale a weight, and the outcome of input-to-input comparisons. Every
+        input is still read and converted, so a snapshot the analysis would
+        reject raises here too. Returns None for an unhashable status, which
+        is not worth caching.
+        """
+        namespace = {'_EMPTY': {}, '_bisect_left': bisect_left, '_bisect_right': bisect_right}
+        cuts = self._numeric_cuts()
+        scaled = {branch[4] for group in TECHNICAL_RULES + WRITERS_RULES for branch in group if len(branch) > 4}
+        compared = sorted({
+            (part[1], part[2])
+            for group in TECHNICAL_RULES + WRITERS_RULES for branch in group if branch[0] is not None
+            for part in ((branch[0],) if branch[0][0] != 'all' else branch[0][1:]) if part[0] == 'gt_input'
+        })
+
+        lines = ["def decision_key(technical_data, writers_data, has_writers):"]
+        lines += self._input_lines(CONTEXT_INPUTS + TECHNICAL_INPUTS, 'technical_data', '    ')
+        lines.append("    if has_writers:")
+        lines += self._input_lines(WRITERS_INPUTS, 'writers_data', '        ')
+        lines.append("    else:")
+        for name, _, _, default, kind in WRITERS_INPUTS:
+            if name == 'writers_confidence':
+                lines.append("        writers_confidence = float(writers_data.get('confidence', 0))")
+            else:
+                lines.append(f"        {name} = {len(default) if kind == COUNT else default!r}")
+
+        parts = ['has_writers']
+        for name, _, _, _, kind in TECHNICAL_INPUTS + WRITERS_INPUTS:
+            if kind == STATUS:
+                namespace[f"_codes_{name}"] = self.status_codes.get(name, {})
+                parts.append(f"_codes_{name}.get({name}, 0)")
+            elif name in scaled:
+                parts.append(name)
+            elif name in cuts:
+                namespace[f"_cuts_{name}"] = cuts[name]
+                bucket = f"_bisect_left(_cuts_{name}, {name}) + _bisect_right(_cuts_{name}, {name})"
+                # NaN fails every comparison, so it gets a position of its own
+                parts.append(bucket if kind == COUNT else f"({bucket} if {name} == {name} else -1)")
+        parts += [f"{left} > {right}" for left, right in compared]
+        lines.append("    try:")
+        lines.append(f"        return ({', '.join(parts)})")
+        lines.append("    except TypeError:  # unhashable status")
+        lines.append("        return None")
+
+        source = '\n'.join(lines) + '\n'
+        exec(compile(source, "<signal_rules.decision_key>", 'exec'), namespace)
+        function = namespace['decision_key']
+        function.source = source
+        return function
+
+    def _compile(self, function_name, inputs, rule_groups):
+        """Generate and compile the analyser for one rule table
+
+        Inputs are read up front in payload order, so the first invalid value
+        raises the same exception as the original hand-written analysis. A group
+        made only of status comparisons on one input becomes a dict lookup from
+        status to (signal, signed weight); other groups become an if/elif chain.
+        """
+        namespace = {'_EMPTY': {}}
+        lines = [f"def {function_name}(data):", "    signals = []", "    strength = 0", "    mask = 0"]
+        lines += self._input_lines(inputs, 'data', '    ')
+
+        for g, group in enumerate(rule_groups):
+            conditions = [branch[0] for branch in group]
+            status_inputs = {c[1] for c in conditions if c is not None and c[0] == 'eq'}
+            if len(status_inputs) == 1 and all(c is None or c[0] == 'eq' for c in conditions):
+                table, otherwise = {}, None
+                for branch in group:
+                    hit = (branch[1], branch[3] * self.pattern_weights[branch[2]], 1 << SIGNAL_IDS[branch[1]])
+                    if branch[0] is None:
+                        otherwise = hit
+                        continue
+                    for value in branch[0][2]:
+                        table.setdefault(value, hit)
+                namespace[f"_table{g}"] = table
+                namespace[f"_otherwise{g}"] = otherwise
+                lines += [
+                    "    try:",
+                    f"        hit = _table{g}.get({status_inputs.pop()}, _otherwise{g})",
+                    "    except TypeError:",  # unhashable payload value never matches, like ==
+                    f"        hit = _otherwise{g}",
+                    "    if hit is not None:",
+                    "        signals.append(hit[0])",
+                    "        strength += hit[1]",
+                    "        mask |= hit[2]",
+                ]
+                continue
+
+            for b, branch in enumerate(group):
+                weight = f"_w{g}_{b}"
+                namespace[weight] = branch[3] * self.pattern_weights[branch[2]]
+                if branch[0] is None:
+                    lines.append("    else:" if b else "    if True:")
+                else:
+                    keyword = 'elif' if b else 'if'
+                    lines.append(f"    {keyword} {self._condition_source(branch[0])}:")
+                lines.append(f"        signals.append({branch[1]!r})")
+                scale = f" * {branch[4]}" if len(branch) > 4 else ''
+                lines.append(f"        strength += {weight}{scale}")
+                lines.append(f"        mask |= {1 << SIGNAL_IDS[branch[1]]}")
+
+        lines.append("    return signals, strength, mask")
+        source = '\n'.join(lines) + '\n'
+        exec(compile(source, f"<signal_rules.{function_name}>", 'exec'), namespace)
+        function = namespace[function_name]
+        function.source = source
+        return function
+
+    def signal_mask(self, signals):
+        """Signal mask for a list of signal names (names outside the rule table are ignored)"""
+        mask = 0
+        for name in signals:
+            signal_id = SIGNAL_IDS.get(name)
+            if signal_id is not None:
+                mask |= 1 << signal_id
+        return mask
+
+    def count_directions(self, mask):
+        """Return (bullish_count, bearish_count) for a signal mask"""
+        return (mask & self.bullish_mask).bit_count(), (mask & self.bearish_mask).bit_count()
+
+    # Vectorized path
+
+    def direction_counts(self, fired):
+        """Per-row (bullish_count, bearish_count) of a fired matrix from score_matrix"""
+        counts = []
+        for polarity_mask in (self.bullish_mask, self.bearish_mask):
+            count = np.zeros(len(fired), dtype=np.int64)
+            for i in range(len(SIGNAL_NAMES)):
+                if polarity_mask >> i & 1:
+                    count += fired[:, i]
+            counts.append(count)
+        return counts[0], counts[1]
+
+    def _encode_values(self, values, inputs):
+        """Replace status strings by their integer codes"""
+        for k, spec in enumerate(inputs):
+            if spec[4] == STATUS:
+                values[k] = _status_lookup(self.status_codes.get(spec[0], {}), values[k], 0)
+        return values
+
+    def encode(self, technical_data, writers_data, has_writers):
+        """Encode one snapshot as a feature row (raises on the same inputs as the scalar path)"""
+        row = _read_inputs(technical_data, CONTEXT_INPUTS)
+        row += self._encode_values(_read_inputs(technical_data, TECHNICAL_INPUTS), TECHNICAL_INPUTS)
+        row.append(has_writers)
+        if has_writers:
+            row += self._encode_values(_read_inputs(writers_data, WRITERS_INPUTS), WRITERS_INPUTS)
+        else:
+            row += [0] * len(WRITERS_INPUTS)
+            row[self.column_index['writers_confidence']] = float(writers_data.get('confidence', 0))
+        return row
+
+    def column(self, features, name):
+        """Return one named column of an encoded feature matrix"""
+        return features[:, self.column_index[name]]
+
+    def code(self, name, status):
+        """Integer code a status string is encoded to for the given input"""
+        return self.status_codes[name][status]
+
+    def _condition_mask(self, features, condition):
+        """Evaluate a condition tuple over every row of the feature matrix"""
+        op = condition[0]
+        if op == 'all':
+            mask = self._condition_mask(features, condition[1])
+            for part in condition[2:]:
+                mask &= self._condition_mask(features, part)
+            return mask
+        col = self.column(features, condition[1])
+        arg = condition[2]
+        if op == 'eq':
+            codes = [self.code(condition[1], value) for value in arg]
+            mask = col == codes[0]
+            for code in codes[1:]:
+                mask |= col == code
+            return mask
+        if op == 'lt':
+            return col < arg
+        if op == 'gt':
+            return col > arg
+        if op == 'ge':
+            return col >= arg
+        if op == 'gt_input':
+            return col > self.column(features, arg)
+        raise ValueError(f"Unknown rule condition: {op}")
+
+    def _score_groups(self, features, groups, enabled, fired, first):
+        """Evaluate rule groups column-wise into fired[:, first:], accumulating strength in rule order
+
+        Each row takes at most one branch per group, so a group adds a single
+        contribution gathered from its weights by branch number.
+        """
+        strength = np.zeros(len(features))
+        j = first
+        for group in groups:
+            free = enabled.copy()
+            branch_number = np.zeros(len(features), dtype=np.int8)
+            weights = [0.0]
+            scaled = []
+            for b, branch in enumerate(group):
+                mask = fired[:, j]
+                if branch[0] is None:
+                    mask[:] = free
+                else:
+                    np.logical_and(self._condition_mask(features, branch[0]), free, out=mask)
+                free &= ~mask
+                branch_number += mask.view(np.int8) * np.int8(b + 1)
+                weights.append(branch[3] * self.pattern_weights[branch[2]])
+                if len(branch) > 4:
+                    scaled.append((mask, weights[-1], branch[4]))
+                j += 1
+            contribution = np.array(weights)[branch_number]
+            for mask, weight, scale_input in scaled:
+                contribution = np.where(mask, weight * self.column(features, scale_input), contribution)
+            strength = strength + contribution
+        return strength
+
+    def score_matrix(self, features):
+        """Score an encoded feature matrix in one vectorized pass
+
+        Returns (fired, total_strength): fired is a boolean matrix with one column
+        per entry of signal_names, and totals are bit-identical to the scalar path.
+        """
+        has_writers = self.column(features, 'has_writers') != 0
+        everyone = np.ones(len(features), dtype=bool)
+        fired = np.empty((len(features), len(SIGNAL_NAMES)), dtype=bool, order='F')
+        technical_count = sum(len(group) for group in TECHNICAL_RULES)
+        tech_strength = self._score_groups(features, TECHNICAL_RULES, everyone, fired, 0)
+        writers_strength = self._score_groups(features, WRITERS_RULES, has_writers, fired, technical_count)
+        total_strength = np.where(has_writers, tech_strength + writers_strength, tech_strength)
+        return fired, total_strength
+
+    def decide_matrix(self, features, strength, bullish_count, bearish_count):
+        """Vectorized make_professional_decision; signal codes are 1=BUY_CE, -1=BUY_PE, 0=HOLD"""
+        thresholds = self.decision_thresholds
+        rsi = self.column(features, 'rsi')
+        supertrend = self.column(features, 'supertrend_status')
+        aroon = self.column(features, 'aroon_status')
+        zone = self.column(features, 'writers_zone')
+        writers_conf = self.column(features, 'writers_confidence')
+        supertrend_bullish = supertrend == self.code('supertrend_status', 'Bullish')
+        supertrend_bearish = supertrend == self.code('supertrend_status', 'Bearish')
+        zone_bullish = zone == self.code('writers_zone', 'BULLISH')
+        zone_bearish = zone == self.code('writers_zone', 'BEARISH')
+
+        base_confidence = np.minimum(np.abs(strength) / 4.0, 1.0)
+        writers_boost = np.where((zone_bullish | zone_bearish) & (writers_conf > 0.5), 0.2, 0.0)
+        boosted = base_confidence + writers_boost
+        moderate = np.maximum(boosted, 0.65)
+        moderate = np.where(moderate >= thresholds['moderate_min_confidence'], moderate, 0.0)
+
+        tradable = ~(self.column(features, 'vix') > 18)
+        strong_strength = thresholds['strong_strength']
+        strong_count = thresholds['strong_signal_count']
+        strong_bull = tradable & (strength > strong_strength) & (bullish_count >= strong_count)
+        strong_bear = tradable & ~strong_bull & (strength < -strong_strength) & (bearish_count >= strong_count)
+        moderate_zone = tradable & ~strong_bull & ~strong_bear & (np.abs(strength) > thresholds['moderate_strength'])
+        moderate_bull = moderate_zone & (strength > 0) & (bullish_count > bearish_count)
+        moderate_bear = moderate_zone & ~moderate_bull & (strength < 0) & (bearish_count > bullish_count)
+
+        bull_confidence = np.select(
+            [supertrend_bullish & (rsi < 60) & zone_bullish,
+             (aroon == self.code('aroon_status', 'Uptrend')) & (rsi < 65)],
+            [np.minimum(boosted + 0.2, 0.95), np.minimum(boosted + 0.1, 0.85)],
+            np.minimum(boosted, 0.8)
+        )
+        bear_confidence = np.select(
+            [supertrend_bearish & (rsi > 40) & zone_bearish,
+             (aroon == self.code('aroon_status', 'Downtrend')) & (rsi > 35)],
+            [np.minimum(boosted + 0.2, 0.95), np.minimum(boosted + 0.1, 0.85)],
+            np.minimum(boosted, 0.8)
+        )
+
+        signal_codes = np.select([strong_bull | moderate_bull, strong_bear | moderate_bear], [1, -1], 0)
+        confidence = np.select(
+            [strong_bull, strong_bear, moderate_bull | moderate_bear],
+            [bull_confidence, bear_confidence, moderate],
+            0.0
+        )
+        return signal_codes, confidence
+
+    def score_decisions(self, features):
+        """score_matrix followed by decide_matrix: (fired, total_strength, signal_codes, confidence)"""
+        fired, total_strength = self.score_matrix(features)
+        signal_codes, confidence = self.decide_matrix(features, total_strength, *self.direction_counts(fired))
+        return fired, total_strength, signal_codes, confidence
+
+    def regime_matrix(self, features):
+        """Vectorized determine_market_regime"""
+        vix = self.column(features, 'vix')
+        rsi = self.column(features, 'rsi')
+        supertrend = self.column(features, 'supertrend_status')
+        zone = self.column(features, 'writers_zone')
+        bullish = (supertrend == self.code('supertrend_status', 'Bullish')) & (rsi < 70)
+        bearish = (supertrend == self.code('supertrend_status', 'Bearish')) & (rsi > 30)
+        return np.select(
+            [
+                vix > 20,
+                vix < 12,
+                bullish & (zone == self.code('writers_zone', 'BULLISH')),
+                bearish & (zone == self.code('writers_zone', 'BEARISH')),
+                bullish,
+                bearish,
+                self.column(features, 'price_action') == self.code('price_action', 'Ranging')
+            ],
+            [
+                'HIGH_VOLATILITY', 'LOW_VOLATILITY', 'STRONG_BULLISH_TREND', 'STRONG_BEARISH_TREND',
+                'BULLISH_TREND', 'BEARISH_TREND', 'SIDEWAYS_RANGING'
+            ],
+            'SIDEWAYS_MARKET'
+        )
+
+    def vix_condition_matrix(self, features):
+        """Vectorized determine_vix_condition"""
+        vix = self.column(features, 'vix')
+        return np.select(
+            [vix > 25, vix > 18, vix < 12],
+            ['EXTREME_VOLATILITY', 'HIGH_VOLATILITY', 'LOW_VOLATILITY'],
+            'NORMAL_VOLATILITY'
+        )
+
+
+def merge_parameters(pattern_weights, decision_thresholds, weight_updates=None, threshold_updates=None):
+    """Copies of weights and thresholds with updates applied; ValueError on an unknown key
+
+    Values are converted to float, except the integer strong_signal_count.
+    """
+    weights, thresholds = dict(pattern_weights), dict(decision_thresholds)
+    for current, update, label in ((weights, weight_updates, 'pattern weight'),
+                                   (thresholds, threshold_updates, 'decision threshold')):
+        unknown = set(update or {}) - set(current)
+        if unknown:
+            raise ValueError(f"Unknown {label}: {', '.join(sorted(unknown))}")
+        current.update({key: float(value) for key, value in (update or {}).items()})
+    thresholds['strong_signal_count'] = int(thresholds['strong_signal_count'])
+    return weights, thresholds
+
+
+# Compiled tables still referenced by some model, keyed by their exact parameters
+_compiled = weakref.WeakValueDictionary()
+_compiled_lock = threading.Lock()
+
+
+def compile_rules(pattern_weights, polarity='legacy', decision_thresholds=None):
+    """Compile the rule table against a set of pattern weights and decision thresholds
+
+    Models with identical parameters share one CompiledRules, so a registry of
+    many models only pays for the distinct weight sets. CompiledRules is never
+    mutated after construction, which makes sharing safe.
+    """
+    # repr keeps 1 and 1.0 apart: the generated code embeds the literal
+    key = (
+        polarity,
+        tuple(sorted((name, repr(value)) for name, value in pattern_weights.items())),
+        tuple(sorted((name, repr(value)) for name, value in (decision_thresholds or {}).items())),
+    )
+    with _compiled_lock:
+        rules = _compiled.get(key)
+        if rules is None:
+            rules = CompiledRules(pattern_weights, polarity, decision_thresholds)
+            _compiled[key] = rules
+        return rules
@@ -0,0 +1,528 @@
+"""Server-side, incremental indicators for streamed OHLCV ticks
+
+Ticks are aggregated into fixed-interval bars per symbol, which costs O(1)
+per tick. The indicators advance once per closed bar and keep bounded state
+(fixed-size windows, Wilder/EMA recursions), so a long-running stream costs
+the same per bar as a short one. Each update is O(1), amortised for the
+rolling sums, except CCI: its mean deviation is taken around the current
+mean, so it walks the 20-bar window on every bar. When a bar closes, the
+indicators are rendered in the n8n payload format and scored by
+ProfessionalTradingAI exactly like a /predict request.
+
+Stream messages (one JSON object per line):
+    {"symbol": "NIFTY", "ts": 1718000000.0, "price": 24631.3, "volume": 150}
+    {"symbol": "NIFTY", "ts": ..., "open": ..., "high": ..., "low": ..., "close": ..., "volume": ...}
+    {"symbol": "NIFTY", "vix": 12.4}                  # context, may ride on any message
+    {"symbol": "NIFTY", "writers": {"writersZone": "BULLISH", ...}}
+    {"symbol": "NIFTY", "flush": true}                # close the open bar now
+"""
+import math
+from collections import deque
+
+# VIX below this is reported as 'Calm Market', above VIX_HIGH_ABOVE as 'High'
+VIX_CALM_BELOW = 13.0
+VIX_HIGH_ABOVE = 18.0
+
+
+class RollingWindow:
+    """Sum and sum of squares over the last n values
+
+    Values are offset by the first value seen to limit cancellation, and the
+    sums are recomputed from the window every n pushes so drift cannot build up.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.values = deque(maxlen=n)
+        self.anchor = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.pushes = 0
+
+    def push(self, x):
+        if self.anchor is None:
+            self.anchor = x
+        if len(self.values) == self.n:
+            old = self.values[0] - self.anchor
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(x)
+        d = x - self.anchor
+        self.total += d
+        self.total_sq += d * d
+        self.pushes += 1
+        if self.pushes % self.n == 0:
+            self.total = sum(v - self.anchor for v in self.values)
+            self.total_sq = sum((v - self.anchor) ** 2 for v in self.values)
+
+    @property
+    def full(self):
+        return len(self.values) == self.n
+
+    @property
+    def sum(self):
+        return self.total + self.anchor * len(self.values)
+
+    @property
+    def mean(self):
+        return self.anchor + self.total / len(self.values)
+
+    @property
+    def variance(self):
+        """Population variance of the window"""
+        k = len(self.values)
+        mean_d = self.total / k
+        return max(self.total_sq / k - mean_d * mean_d, 0.0)
+
+
+class RollingExtremum:
+    """Max (or min) of the last n values and its age in bars, via a monotonic deque"""
+
+    def __init__(self, n, largest=True):
+        self.n = n
+        self.largest = largest
+        self.items = deque()  # (index, value), values monotonic
+        self.index = -1
+
+    def push(self, x):
+        self.index += 1
+        items = self.items
+        if self.largest:
+            while items and items[-1][1] <= x:
+                items.pop()
+        else:
+            while items and items[-1][1] >= x:
+                items.pop()
+        items.append((self.index, x))
+        while items[0][0] <= self.index - self.n:
+            items.popleft()
+
+    @property
+    def full(self):
+        return self.index + 1 >= self.n
+
+    @property
+    def value(self):
+        return self.items[0][1]
+
+    @property
+    def age(self):
+        """Bars since the extremum (the most recent one on ties)"""
+        return self.index - self.items[0][0]
+
+
+class EMA:
+    """Exponential moving average seeded with the SMA of the first n values"""
+
+    def __init__(self, n):
+        self.n = n
+        self.alpha = 2.0 / (n + 1)
+        self.seed = []
+        self.value = None
+
+    def push(self, x):
+        if self.value is None:
+            self.seed.append(x)
+            if len(self.seed) == self.n:
+                self.value = sum(self.seed) / self.n
+                self.seed = None
+        else:
+            self.value = self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+
+class WilderAverage:
+    """Wilder's smoothed average seeded with the mean of the first n values"""
+
+    def __init__(self, n):
+        self.n = n
+        self.seed = []
+        self.value = None
+
+    def push(self, x):
+        if self.value is None:
+            self.seed.append(x)
+            if len(self.seed) == self.n:
+                self.value = sum(self.seed) / self.n
+                self.seed = None
+        else:
+            self.value = (self.value * (self.n - 1) + x) / self.n
+        return self.value
+
+
+class IndicatorSet:
+    """All indicators the n8n workflow used to compute, updated once per closed bar"""
+
+    def __init__(self):
+        self.bars = 0
+        self.prev_close = None
+        self.prev_high = None
+        self.prev_low = None
+        self.prev_prev_low = None
+        self.prev_prev_high = None
+        self.prev_tp = None
+
+        # RSI(14)
+        self.rsi_gain = WilderAverage(14)
+        self.rsi_loss = WilderAverage(14)
+        self.rsi = None
+        # EMA20 / SMA50 / MACD(12, 26, 9)
+        self.ema20 = EMA(20)
+        self.sma50 = RollingWindow(50)
+        self.ema12 = EMA(12)
+        self.ema26 = EMA(26)
+        self.macd_signal = EMA(9)
+        self.macd = None
+        # Bollinger(20, 2)
+        self.bollinger = RollingWindow(20)
+        # CCI(20) on typical price
+        self.cci_window = RollingWindow(20)
+        self.cci = None
+        # ATR(14), ADX(14)
+        self.atr = WilderAverage(14)
+        self.plus_dm = WilderAverage(14)
+        self.minus_dm = WilderAverage(14)
+        self.adx_tr = WilderAverage(14)
+        self.adx_avg = WilderAverage(14)
+        # Stochastic %K(14)
+        self.stoch_high = RollingExtremum(14, largest=True)
+        self.stoch_low = RollingExtremum(14, largest=False)
+        self.stochastic = None
+        # Aroon(25) looks back 25 bars, i.e. a 26-bar window
+        self.aroon_high = RollingExtremum(26, largest=True)
+        self.aroon_low = RollingExtremum(26, largest=False)
+        # MFI(14)
+        self.mfi_positive = RollingWindow(14)
+        self.mfi_negative = RollingWindow(14)
+        self.mfi = None
+        # SuperTrend(10, 3)
+        self.supertrend_atr = WilderAverage(10)
+        self.supertrend_upper = None
+        self.supertrend_lower = None
+        self.supertrend_up = True
+        # Parabolic SAR(0.02, 0.2)
+        self.psar = None
+        self.psar_up = True
+        self.psar_ep = None
+        self.psar_af = 0.02
+        # Volume
+        self.volume_avg = RollingWindow(20)
+        self.obv = 0.0
+        self.volume_ratio = None
+
+    def update(self, high, low, close, volume):
+        """Advance every indicator by one closed bar"""
+        prev_close = self.prev_close
+        tp = (high + low + close) / 3.0
+
+        # True range and directional movement
+        if prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
+        self.atr.push(tr)
+
+        if prev_close is not None:
+            change = close - prev_close
+            gain = self.rsi_gain.push(max(change, 0.0))
+            loss = self.rsi_loss.push(max(-change, 0.0))
+            if gain is not None:
+                self.rsi = 100.0 if loss == 0 else 100.0 - 100.0 / (1.0 + gain / loss)
+
+            up_move = high - self.prev_high
+            down_move = self.prev_low - low
+            plus = self.plus_dm.push(up_move if up_move > down_move and up_move > 0 else 0.0)
+            minus = self.minus_dm.push(down_move if down_move > up_move and down_move > 0 else 0.0)
+            smoothed_tr = self.adx_tr.push(tr)
+            if smoothed_tr is not None:
+                # DI+ and DI- share the 100 / smoothed TR factor, which cancels in DX
+                di_sum = plus + minus
+                self.adx_avg.push(0.0 if di_sum == 0 else 100.0 * abs(plus - minus) / di_sum)
+
+            self.obv += volume if change > 0 else -volume if change < 0 else 0.0
+
+        # Moving averages and MACD
+        self.ema20.push(close)
+        self.sma50.push(close)
+        fast, slow = self.ema12.push(close), self.ema26.push(close)
+        if fast is not None and slow is not None:
+            self.macd = fast - slow
+            self.macd_signal.push(self.macd)
+
+        self.bollinger.push(close)
+
+        self.cci_window.push(tp)
+        if self.cci_window.full:
+            # The deviations change with the mean, so there is no running sum: O(window) per bar
+            mean = self.cci_window.mean
+            mean_dev = sum(abs(v - mean) for v in self.cci_window.values) / self.cci_window.n
+            self.cci = 0.0 if mean_dev == 0 else (tp - mean) / (0.015 * mean_dev)
+
+        self.stoch_high.push(high)
+        self.stoch_low.push(low)
+        if self.stoch_high.full:
+            span = self.stoch_high.value - self.stoch_low.value
+            self.stochastic = 50.0 if span == 0 else 100.0 * (close - self.stoch_low.value) / span
+
+        self.aroon_high.push(high)
+        self.aroon_low.push(low)
+
+        if self.prev_tp is not None:
+            flow = tp * volume
+            self.mfi_positive.push(flow if tp > self.prev_tp else 0.0)
+            self.mfi_negative.push(flow if tp < self.prev_tp else 0.0)
+            if self.mfi_positive.full:
+                positive, negative = self.mfi_positive.sum, self.mfi_negative.sum
+                if negative <= 0:
+                    self.mfi = 50.0 if positive <= 0 else 100.0
+                else:
+                    self.mfi = 100.0 - 100.0 / (1.0 + positive / negative)
+
+        self._update_supertrend(high, low, close, tr)
+        self._update_psar(high, low, close)
+
+        self.volume_avg.push(volume)
+        mean_volume = self.volume_avg.mean
+        self.volume_ratio = volume / mean_volume if mean_volume > 0 else None
+
+        self.prev_prev_high, self.prev_prev_low = self.prev_high, self.prev_low
+        self.prev_close, self.prev_high, self.prev_low, self.prev_tp = close, high, low, tp
+        self.bars += 1
+
+    def _update_supertrend(self, high, low, close, tr):
+        atr = self.supertrend_atr.push(tr)
+        if atr is None:
+            return
+        mid = (high + low) / 2.0
+        basic_upper = mid + 3.0 * atr
+        basic_lower = mid - 3.0 * atr
+        prev_close = self.prev_close
+        if self.supertrend_upper is None:
+            upper, lower = basic_upper, basic_lower
+        else:
+            upper = basic_upper if basic_upper < self.supertrend_upper or prev_close > self.supertrend_upper else self.supertrend_upper
+            lower = basic_lower if basic_lower > self.supertrend_lower or prev_close < self.supertrend_lower else self.supertrend_lower
+        if self.supertrend_up and close < lower:
+            self.supertrend_up = False
+        elif not self.supertrend_up and close > upper:
+            self.supertrend_up = True
+        self.supertrend_upper, self.supertrend_lower = upper, lower
+
+    def _update_psar(self, high, low, close):
+        if self.prev_close is None:
+            return
+        if self.psar is None:
+            self.psar_up = close >= self.prev_close
+            if self.psar_up:
+                self.psar, self.psar_ep = self.prev_low, max(high, self.prev_high)
+            else:
+                self.psar, self.psar_ep = self.prev_high, min(low, self.prev_low)
+            return
+
+        sar = self.psar + self.psar_af * (self.psar_ep - self.psar)
+        if self.psar_up:
+            sar = min(sar, self.prev_low, self.prev_prev_low if self.prev_prev_low is not None else self.prev_low)
+            if low < sar:
+                self.psar_up, sar, self.psar_ep, self.psar_af = False, self.psar_ep, low, 0.02
+            elif high > self.psar_ep:
+                self.psar_ep, self.psar_af = high, min(self.psar_af + 0.02, 0.2)
+        else:
+            sar = max(sar, self.prev_high, self.prev_prev_high if self.prev_prev_high is not None else self.prev_high)
+            if high > sar:
+                self.psar_up, sar, self.psar_ep, self.psar_af = True, self.psar_ep, high, 0.02
+            elif low < self.psar_ep:
+                self.psar_ep, self.psar_af = low, min(self.psar_af + 0.02, 0.2)
+        self.psar = sar
+
+    def values(self):
+        """Current numeric indicator values (None until warmed up)"""
+        aroon_ready = self.aroon_high.full
+        middle = self.bollinger.mean if self.bollinger.full else None
+        std = math.sqrt(self.bollinger.variance) if self.bollinger.full else None
+        return {
+            'rsi': self.rsi,
+            'ema20': self.ema20.value,
+            'sma50': self.sma50.mean if self.sma50.full else None,
+            'macd': self.macd,
+            'macd_signal': self.macd_signal.value,
+            'bollinger_middle': middle,
+            'bollinger_upper': None if middle is None else middle + 2.0 * std,
+            'bollinger_lower': None if middle is None else middle - 2.0 * std,
+            'cci': self.cci,
+            'atr': self.atr.value,
+            'adx': self.adx_avg.value,
+            'stochastic': self.stochastic,
+            'aroon_up': 100.0 * (25 - self.aroon_high.age) / 25 if aroon_ready else None,
+            'aroon_down': 100.0 * (25 - self.aroon_low.age) / 25 if aroon_ready else None,
+            'mfi': self.mfi,
+            'supertrend': None if self.supertrend_upper is None else
+                (self.supertrend_lower if self.supertrend_up else self.supertrend_upper),
+            'psar': self.psar,
+            'obv': self.obv,
+            'volume_ratio': self.volume_ratio,
+        }
+
+    def payload(self, close, vix=None):
+        """Render the indicators in the n8n payload format (indicators still warming up are omitted)"""
+        v = self.values()
+        data = {'LTP': close}
+
+        def direction(level):
+            return 'Bullish' if close > level else 'Bearish' if close < level else 'Neutral'
+
+        if v['rsi'] is not None:
+            status = 'Oversold' if v['rsi'] < 30 else 'Overbought' if v['rsi'] > 70 else 'Neutral'
+            data['RSI'] = {'rsi': v['rsi'], 'status': status}
+        if v['ema20'] is not None:
+            data['EMA20'] = {'ema': v['ema20'], 'status': direction(v['ema20'])}
+        if v['sma50'] is not None:
+            data['SMA50'] = {'sma': v['sma50'], 'status': direction(v['sma50'])}
+        if v['macd'] is not None and v['macd_signal'] is not None:
+            histogram = v['macd'] - v['macd_signal']
+            status = 'Bullish' if histogram > 0 else 'Bearish' if histogram < 0 else 'Neutral'
+            data['MACD'] = {'macd': v['macd'], 'signal': v['macd_signal'], 'histogram': histogram, 'status': status}
+        if vix is not None:
+            status = 'Calm Market' if vix < VIX_CALM_BELOW else 'High' if vix > VIX_HIGH_ABOVE else 'Normal'
+            data['VIX'] = {'vix': vix, 'status': status}
+        if v['bollinger_middle'] is not None:
+            upper, lower = v['bollinger_upper'], v['bollinger_lower']
+            status = 'Above Upper' if close > upper else 'Below Lower' if close < lower else 'Within Bands'
+            data['BollingerBands'] = {'upper': upper, 'middle': v['bollinger_middle'], 'lower': lower, 'status': status}
+        if v['cci'] is not None:
+            status = 'Sell' if v['cci'] < -100 else 'Buy' if v['cci'] > 100 else 'Neutral'
+            data['CCI'] = {'value': v['cci'], 'status': status}
+        if v['supertrend'] is not None:
+            data['SuperTrend'] = {'value': v['supertrend'], 'status': 'Bullish' if self.supertrend_up else 'Bearish'}
+        if v['volume_ratio'] is not None and self.volume_avg.full:
+            ratio = v['volume_ratio']
+            data['VolumeIndicators'] = {
+                'obv': v['obv'],
+                'status': 'Strong' if ratio > 1.5 else 'Weak' if ratio < 0.5 else 'Normal'
+            }
+            data['VolumeStrength'] = {
+                'ratio': ratio,
+                'type': 'Strong Volume' if ratio > 1.5 else 'Weak Volume' if ratio < 0.5 else 'Normal'
+            }
+        if v['aroon_up'] is not None:
+            up, down = v['aroon_up'], v['aroon_down']
+            data['Aroon'] = {'up': up, 'down': down, 'status': 'Uptrend' if up > down else 'Downtrend' if down > up else 'Neutral'}
+        if v['psar'] is not None:
+            data['ParabolicSAR'] = {'value': v['psar'], 'status': 'Bullish' if self.psar_up else 'Bearish'}
+        if v['mfi'] is not None:
+            status = 'Oversold' if v['mfi'] < 20 else 'Overbought' if v['mfi'] > 80 else 'Neutral'
+            data['MFI'] = {'value': v['mfi'], 'status': status}
+        if v['adx'] is not None:
+            data['ADX'] = {'value': v['adx']}
+            data['PriceAction'] = {'type': 'Trending' if v['adx'] > 25 else 'Ranging' if v['adx'] < 20 else 'Normal'}
+        if v['atr'] is not None:
+            data['ATR'] = {'value': v['atr']}
+        if v['stochastic'] is not None:
+            data['Stochastic'] = {'value': v['stochastic'], 'status': 'Neutral'}
+        return data
+
+
+class SymbolStream:
+    """Bar aggregation, indicators and context for one symbol"""
+
+    def __init__(self, symbol, bar_seconds):
+        self.symbol = symbol
+        self.bar_seconds = bar_seconds
+        self.indicators = IndicatorSet()
+        self.bar = None  # [bucket, open, high, low, close, volume]
+        self.vix = None
+        self.writers = None
+        self.late_ticks = 0
+
+    def add(self, ts, open_, high, low, close, volume):
+        """Merge a tick or partial bar; returns the bar it closed, if any"""
+        bucket = int(ts // self.bar_seconds)
+        closed = None
+        if self.bar is not None and bucket < self.bar[0]:
+            self.late_ticks += 1
+            return None
+        if self.bar is not None and bucket > self.bar[0]:
+            closed = self.close_bar()
+        if self.bar is None:
+            self.bar = [bucket, open_, high, low, close, volume]
+        else:
+            bar = self.bar
+            bar[2] = max(bar[2], high)
+            bar[3] = min(bar[3], low)
+            bar[4] = close
+            bar[5] += volume
+        return closed
+
+    def close_bar(self):
+        """Close the open bar, update indicators and return it"""
+        if self.bar is None:
+            return None
+        bucket, open_, high, low, close, volume = self.bar
+        self.bar = None
+        self.indicators.update(high, low, close, volume)
+        return {
+            'start': bucket * self.bar_seconds,
+            'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume
+        }
+
+    def payload(self, close):
+        """n8n-format snapshot for the last closed bar, with writers zone context merged in"""
+        data = self.indicators.payload(close, self.vix)
+        if self.writers:
+            data.update(self.writers)
+        return data
+
+
+class StreamingEngine:
+    """Routes stream messages to per-symbol state and scores every closed bar"""
+
+    def __init__(self, model, bar_seconds=60, resolve_model=None):
+        self.model = model
+        self.bar_seconds = bar_seconds
+        # Optional symbol -> model lookup (the app's model registry); self.model otherwise
+        self.resolve_model = resolve_model
+        self.symbols = {}
+
+    def stream(self, symbol):
+        if symbol not in self.symbols:
+            self.symbols[symbol] = SymbolStream(symbol, self.bar_seconds)
+        return self.symbols[symbol]
+
+    def _emit(self, state, bar):
+        snapshot = state.payload(bar['close'])
+        model = self.model if self.resolve_model is None else self.resolve_model(state.symbol)
+        return {
+            'symbol': state.symbol,
+            'bar': bar,
+            'bars_seen': state.indicators.bars,
+            'prediction': model.professional_signal_generation(snapshot, 'stream_ticks')
+        }
+
+    def process(self, message):
+        """Handle one stream message; returns the events for any bars it closed"""
+        symbol = message.get('symbol')
+        if not symbol:
+            raise ValueError("Stream message needs a 'symbol'")
+        state = self.stream(symbol)
+        if 'vix' in message:
+            state.vix = float(message['vix'])
+        if 'writers' in message:
+            state.writers = dict(message['writers'])
+
+        events = []
+        if 'price' in message or 'close' in message:
+            close = float(message.get('close', message.get('price')))
+            bar = state.add(
+                float(message['ts']),
+                float(message.get('open', close)),
+                float(message.get('high', close)),
+                float(message.get('low', close)),
+                close,
+                float(message.get('volume', 0))
+            )
+            if bar is not None:
+                events.append(self._emit(state, bar))
+        if message.get('flush'):
+            bar = state.close_bar()
+            if bar is not None:
+                events.append(self._emit(state, bar))
+        return events
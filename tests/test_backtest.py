@@ -0,0 +1,107 @@
+"""The vectorized backtest: decisions, forward moves and the per-regime report"""
+import logging
+import os
+import random
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import backtest
+from ai_model_api_fixed import ProfessionalTradingAI
+from backtest import Backtest, forward_move, table_from_history, table_from_snapshots
+from benchmark_predict_batch import make_snapshot
+from signal_history import SignalHistory
+
+logging.disable(logging.INFO)
+
+CODES = {'BUY_CE': 1, 'BUY_PE': -1, 'HOLD': 0}
+
+
+def snapshots(seed, count):
+    rng = random.Random(seed)
+    return [make_snapshot(rng) for _ in range(count)]
+
+
+def test_backtest_decides_like_the_model():
+    payloads = snapshots(1, 400)
+    backtest = Backtest(table_from_snapshots([(payload, payload) for payload in payloads]))
+    model = ProfessionalTradingAI()
+    signal_codes, confidence = backtest.signals({'vix_calm': 1.4}, {'moderate_strength': 1.0})
+    model.update_parameters({'vix_calm': 1.4}, {'moderate_strength': 1.0})
+    for k, payload in enumerate(payloads):
+        result = model.professional_signal_generation(payload)
+        assert (signal_codes[k], round(float(confidence[k]), 3)) == (CODES[result['signal']], result['confidence']), payload
+        assert backtest.regime_names[backtest.regime_index[k]] == result['analysis']['market_regime']
+
+
+def test_unknown_parameters_are_rejected():
+    backtest = Backtest(table_from_snapshots([(payload, payload) for payload in snapshots(2, 4)]))
+    with pytest.raises(ValueError):
+        backtest.run({'not_a_weight': 1.0})
+
+
+def test_forward_move_stays_within_a_symbol():
+    table = {
+        'symbol': np.array(['NIFTY', 'BANKNIFTY', 'NIFTY', 'BANKNIFTY', 'NIFTY'], dtype=object),
+        'ltp': np.array([100.0, 500.0, 103.0, 490.0, 101.0]),
+    }
+    np.testing.assert_array_equal(forward_move(table, table['ltp'], 1), [3.0, -10.0, -2.0, np.nan, np.nan])
+    np.testing.assert_array_equal(forward_move(table, table['ltp'], 2), [1.0, np.nan, np.nan, np.nan, np.nan])
+    # Without a symbol column every row is one series
+    del table['symbol']
+    np.testing.assert_array_equal(forward_move(table, table['ltp'], 1), [400.0, -397.0, 387.0, -389.0, np.nan])
+
+
+def test_forward_move_uses_recorded_feedback():
+    table = {
+        'signal': np.array(['BUY_CE', 'BUY_PE', 'BUY_CE', 'BUY_PE', 'HOLD', 'BUY_CE'], dtype=object),
+        'outcome': np.array(['correct', 'correct', 'incorrect', 'incorrect', 'correct', ''], dtype=object),
+        'pnl': np.array([12.0, 8.0, np.nan, np.nan, 5.0, np.nan]),
+    }
+    # pnl is signed along the recorded signal; HOLD and rows without feedback are not traded
+    np.testing.assert_array_equal(forward_move(table, np.zeros(6), 1), [12.0, -8.0, -1.0, 1.0, np.nan, np.nan])
+
+
+def test_run_values_trades_at_the_recorded_pnl():
+    payloads = snapshots(3, 200)
+    table = table_from_snapshots([(payload, payload) for payload in payloads])
+    backtest = Backtest(table)
+    signal_codes, _ = backtest.signals()
+    traded = [k for k in range(len(payloads)) if signal_codes[k] != 0]
+    assert traded
+    # Feedback that every recorded BUY_CE made 10 points and every BUY_PE lost 4
+    table['signal'] = np.array(['BUY_CE' if k % 2 else 'BUY_PE' for k in range(len(payloads))], dtype=object)
+    table['outcome'] = np.array(['correct' if k % 2 else 'incorrect' for k in range(len(payloads))], dtype=object)
+    table['pnl'] = np.array([10.0 if k % 2 else -4.0 for k in range(len(payloads))])
+    report = Backtest(table).run()
+    expected = sum(signal_codes[k] * (10.0 if k % 2 else 4.0) for k in traded)
+    assert report['overall']['trades'] == len(traded)
+    assert report['overall']['pnl'] == round(expected, 2)
+    assert sum(regime['trades'] for regime in report['regimes'].values()) == len(traded)
+
+
+def test_table_from_history_keeps_rows_with_feedback():
+    model = ProfessionalTradingAI()
+    history = model.model_data['signals'] = SignalHistory(50, store_raw=True)
+    payloads = snapshots(4, 10)
+    for k, payload in enumerate(payloads):
+        payload['symbol'] = 'NIFTY' if k % 2 else 'BANKNIFTY'
+        model.professional_signal_generation(payload)
+    table = table_from_history(history)
+    assert len(table['ltp']) == 10 and 'outcome' not in table
+    assert table['symbol'].tolist() == [payload['symbol'] for payload in payloads]
+
+    history.record_outcome(3, True, pnl=7.5)
+    history.record_outcome(6, False)
+    table = table_from_history(history)
+    assert table['ltp'].tolist() == [payloads[3]['LTP'], payloads[6]['LTP']]
+    assert table['outcome'].tolist() == ['correct', 'incorrect']
+    assert table['pnl'][0] == 7.5 and np.isnan(table['pnl'][1])
+    assert table['signal'].tolist() == [history.entry(i, False, ('signal',))['signal'] for i in (3, 6)]
+
+
+def test_backtest_does_not_import_the_app():
+    code = "import sys, backtest, weight_optimizer; sys.exit('ai_model_api_fixed' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(backtest.__file__)).returncode == 0
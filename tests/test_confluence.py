@@ -0,0 +1,221 @@
+"""Multi-timeframe confluence: candle-long caching, weighted strengths and the /predict integration"""
+import copy
+import logging
+import random
+import time
+from datetime import datetime
+
+import pytest
+
+from ai_model_api_fixed import ProfessionalTradingAI
+from benchmark_predict_batch import make_snapshot
+from confluence import ConfluenceCache, parse_weights
+from response_cache import ResponseCache
+from signal_history import SignalHistory
+from signal_rules import compile_rules
+
+logging.disable(logging.INFO)
+
+WEIGHTS = {'1m': 1.0, '5m': 0.6, '15m': 0.4}
+# On a boundary of every timeframe (a whole number of days)
+T0 = 1_718_064_000.0
+
+
+class CountingRules:
+    """A rule table whose technical analyses are counted"""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.analyzed = 0
+
+    def analyze_technical(self, snapshot):
+        self.analyzed += 1
+        return self.rules.analyze_technical(snapshot)
+
+
+@pytest.fixture
+def rules():
+    return CountingRules(ProfessionalTradingAI().rules)
+
+
+def snapshots(seed, count):
+    rng = random.Random(seed)
+    return [make_snapshot(rng) for _ in range(count)]
+
+
+def strength_of(snapshot):
+    return ProfessionalTradingAI().rules.analyze_technical(snapshot)[1]
+
+
+def combine(cache, rules, payload, now, writers_strength=0.0):
+    signals, strength, _ = rules.rules.analyze_technical(payload)
+    return cache.combine(payload, signals, strength, writers_strength, rules, now)
+
+
+def test_parse_weights():
+    assert parse_weights('1m:1, 5m:0.6,15m:0') == {'1m': 1.0, '5m': 0.6, '15m': 0.0}
+    for spec in ('', '1m:0,5m:0', '1m:-1', '1m:nan', '1m', '7x:1'):
+        with pytest.raises(ValueError):
+            parse_weights(spec)
+
+
+def test_a_higher_timeframe_is_analyzed_once_per_candle(rules):
+    cache = ConfluenceCache(WEIGHTS)
+    primary, five, later_five = snapshots(1, 3)
+    payload = dict(primary, timeframes={'5m': five})
+    _, report = combine(cache, rules, payload, T0 + 10)
+    assert rules.analyzed == 1 and report['timeframes']['5m']['source'] == 'request'
+
+    # Later 1m polls in the same 5m candle reuse its analysis, even when they send a newer snapshot
+    for now in (T0 + 70, T0 + 299):
+        _, report = combine(cache, rules, dict(primary, timeframes={'5m': later_five}), now)
+        assert report['timeframes']['5m']['source'] == 'cache'
+    assert rules.analyzed == 1
+    assert report['timeframes']['5m']['strength'] == round(strength_of(five), 2)
+
+    # Once the candle has closed, the snapshot sent is analyzed again
+    _, report = combine(cache, rules, dict(primary, timeframes={'5m': later_five}), T0 + 300)
+    assert rules.analyzed == 2 and report['timeframes']['5m']['source'] == 'request'
+    assert report['timeframes']['5m']['strength'] == round(strength_of(later_five), 2)
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 2
+
+
+def test_a_different_candle_close_replaces_the_cached_analysis(rules):
+    cache = ConfluenceCache(WEIGHTS)
+    primary, first, second = snapshots(2, 3)
+    combine(cache, rules, dict(primary, timeframes={'15m': dict(first, candleClose=T0 + 900)}), T0)
+    _, report = combine(cache, rules, dict(primary, timeframes={'15m': dict(first, candleClose=T0 + 900)}), T0 + 60)
+    assert report['timeframes']['15m']['source'] == 'cache'
+    _, report = combine(cache, rules, dict(primary, timeframes={'15m': dict(second, candleClose=T0 + 1800)}), T0 + 120)
+    assert rules.analyzed == 2 and report['timeframes']['15m']['source'] == 'request'
+    assert report['timeframes']['15m']['candle_close'] == datetime.fromtimestamp(T0 + 1800).isoformat()
+
+
+def test_references_come_from_the_cache_only(rules):
+    cache = ConfluenceCache(WEIGHTS)
+    one, five = snapshots(3, 2)
+    # A 5m request caches the primary analysis for the 1m requests that reference it
+    combine(cache, rules, dict(five, symbol='NIFTY', timeframe='5m', timeframes=[]), T0)
+    for timeframes in (['5m', '15m'], {'5m': None, '15m': None}):
+        _, report = combine(cache, rules, dict(one, symbol='NIFTY', timeframes=timeframes), T0 + 30)
+        assert report['primary'] == '1m' and list(report['timeframes']) == ['1m', '5m']
+        assert report['timeframes']['5m']['source'] == 'cache' and report['missing'] == ['15m']
+
+    # Another symbol's analyses are not shared
+    _, report = combine(cache, rules, dict(one, symbol='BANKNIFTY', timeframes=['5m']), T0 + 30)
+    assert report['missing'] == ['5m']
+    assert cache.stats()['missing'] == 3
+
+
+def test_the_strength_is_the_weighted_mean_plus_the_writers_strength(rules):
+    cache = ConfluenceCache(WEIGHTS)
+    one, five, fifteen = snapshots(4, 3)
+    strength, report = combine(cache, rules, dict(one, timeframes={'5m': five, '15m': fifteen}), T0, 1.5)
+    technical = (strength_of(one) + 0.6 * strength_of(five) + 0.4 * strength_of(fifteen)) / 2.0
+    assert strength == pytest.approx(technical + 1.5)
+    assert report['technical_strength'] == round(technical, 2) and report['strength'] == round(technical + 1.5, 2)
+    assert [frame['weight'] for frame in report['timeframes'].values()] == [1.0, 0.6, 0.4]
+
+    # A missing timeframe is left out of the mean, not counted as zero
+    strength, report = combine(cache, rules, dict(one, symbol='OTHER', timeframes={'5m': five, '15m': None}), T0)
+    assert strength == pytest.approx((strength_of(one) + 0.6 * strength_of(five)) / 1.6)
+
+
+def test_disagreeing_timeframes_pull_the_strength_towards_zero(rules):
+    cache = ConfluenceCache(WEIGHTS)
+    candidates = snapshots(5, 200)
+    bullish = max(candidates, key=strength_of)
+    bearish = min(candidates, key=strength_of)
+    strength, report = combine(cache, rules, dict(bullish, timeframes={'5m': bearish, '15m': bearish}), T0)
+    assert abs(strength) < strength_of(bullish) and not report['aligned']
+    _, report = combine(cache, rules, dict(bullish, symbol='OTHER', timeframes={'5m': bullish}), T0)
+    assert report['aligned'] and report['timeframes']['5m']['direction'] == 'BULLISH'
+
+
+def test_swapped_rules_reanalyze_every_timeframe(rules):
+    cache = ConfluenceCache(WEIGHTS)
+    one, five = snapshots(6, 2)
+    combine(cache, rules, dict(one, timeframes={'5m': five}), T0)
+    base = rules.rules
+    weights = {name: weight * 2 for name, weight in base.pattern_weights.items()}
+    swapped = CountingRules(compile_rules(weights, base.polarity, base.decision_thresholds))
+    _, report = combine(cache, swapped, dict(one, timeframes={'5m': five}), T0 + 10)
+    assert swapped.analyzed == 1 and report['timeframes']['5m']['source'] == 'request'
+    assert report['timeframes']['5m']['strength'] == round(swapped.rules.analyze_technical(five)[1], 2)
+
+
+def test_invalid_timeframes_are_rejected(rules):
+    cache = ConfluenceCache(WEIGHTS)
+    one, five = snapshots(7, 2)
+    for payload in (dict(one, timeframes={'2m': five}), dict(one, timeframe='4h', timeframes=[]),
+                    dict(one, timeframes={'5m': [five]}), dict(one, timeframes='5m'),
+                    dict(one, timeframes={'5m': dict(five, candleClose='nan')})):
+        with pytest.raises(ValueError):
+            combine(cache, rules, payload, T0)
+
+
+def test_least_recently_used_entries_are_dropped():
+    cache = ConfluenceCache(WEIGHTS, max_entries=2)
+    rules = CountingRules(ProfessionalTradingAI().rules)
+    one, five = snapshots(8, 2)
+    for symbol in ('A', 'B', 'C'):
+        combine(cache, rules, dict(one, symbol=symbol, timeframes={'5m': five}), T0)
+    assert len(cache) == 2 and list(cache.entries) == [('C', '1m'), ('C', '5m')]
+
+
+@pytest.fixture
+def model():
+    model = ProfessionalTradingAI()
+    model.model_data['signals'] = SignalHistory(1000)
+    return model
+
+
+def confluence_payloads(count, seed):
+    """1m snapshots that reference or bring 5m and 15m snapshots of the same candle"""
+    closes = {'5m': time.time() + 3600, '15m': time.time() + 7200}
+    higher = {timeframe: dict(snapshot, candleClose=closes[timeframe])
+              for timeframe, snapshot in zip(('5m', '15m'), snapshots(seed + 1, 2))}
+    payloads = []
+    for i, snapshot in enumerate(snapshots(seed, count)):
+        snapshot['symbol'] = 'NIFTY'
+        snapshot['timeframes'] = dict(higher) if i % 3 == 0 else ['5m', '15m']
+        payloads.append(snapshot)
+    return payloads
+
+
+def comparable(result):
+    return {key: value for key, value in result.items() if key not in ('timestamp', 'prediction_id')}
+
+
+def test_predictions_carry_the_confluence_report(model):
+    payload = confluence_payloads(1, seed=9)[0]
+    result = model.professional_signal_generation(copy.deepcopy(payload))
+    report = result['confluence']
+    assert report['primary'] == '1m' and list(report['timeframes']) == ['1m', '5m', '15m']
+    assert result['analysis']['total_strength'] == report['strength']
+    assert 'confluence' not in model.professional_signal_generation(make_snapshot(random.Random(9)))
+    assert model.confluence.stats()['entries'] == 3
+
+    # A confluence payload is never served from the response cache
+    model.response_cache = ResponseCache(16, 60)
+    first = model.professional_signal_generation(copy.deepcopy(payload))
+    second = model.professional_signal_generation(copy.deepcopy(payload))
+    assert len(model.response_cache) == 0 and first['prediction_id'] != second['prediction_id']
+
+
+def test_an_invalid_confluence_payload_is_an_error_response(model):
+    payload = dict(make_snapshot(random.Random(10)), timeframes={'2m': None})
+    result = model.professional_signal_generation(payload)
+    assert result['signal'] == 'HOLD' and 'Unknown timeframe: 2m' in result['error']
+
+
+def test_batches_score_confluence_payloads_like_single_predictions():
+    payloads = confluence_payloads(40, seed=11)
+    rng = random.Random(12)
+    mixed = [payload if i % 2 else make_snapshot(rng) for i, payload in enumerate(payloads)]
+    single, batch = ProfessionalTradingAI(), ProfessionalTradingAI()
+    single.response_cache = batch.response_cache = None
+    expected = [single.professional_signal_generation(copy.deepcopy(payload)) for payload in mixed]
+    results = batch.professional_signal_generation_batch(copy.deepcopy(mixed))
+    assert [comparable(result) for result in results] == [comparable(result) for result in expected]
+    assert sum('confluence' in result for result in results) == 20
@@ -0,0 +1,88 @@
+"""Paging the signal history through /get_stats"""
+import logging
+
+import pytest
+
+import ai_model_api_fixed as api
+from signal_history import SignalHistory
+
+logging.disable(logging.INFO)
+
+NS = 1_718_000_000 * 10**9
+
+
+@pytest.fixture
+def history(monkeypatch):
+    history = SignalHistory(capacity=50, store_raw=True)
+    monkeypatch.setitem(api.trading_ai.model_data, 'signals', history)
+    return history
+
+
+def fill(history, count):
+    """Rows whose ltp is their sequence number, one second apart"""
+    for i in range(history.total_appended, history.total_appended + count):
+        history.append('BUY_CE', 0.5, 1.0, 0, float(i), 50.0, 14.0, {'LTP': i}, {}, timestamp_ns=NS + i * 10**9)
+
+
+def get_stats(**params):
+    response = api.app.test_client().get('/get_stats', query_string=params)
+    return response.status_code, response.get_json()
+
+
+def test_next_since_walks_every_row_once(history):
+    fill(history, 12)
+    seen, since = [], -1
+    while True:
+        status, body = get_stats(limit=5, since=since, fields='seq,ltp')
+        assert status == 200 and len(body['recent_signals']) <= 5
+        if not body['recent_signals']:
+            assert body['next_since'] == since
+            break
+        seen += [row['seq'] for row in body['recent_signals']]
+        assert all(row['ltp'] == row['seq'] for row in body['recent_signals'])
+        since = body['next_since']
+    assert seen == list(range(12))
+
+    # New rows show up after the last cursor
+    fill(history, 2)
+    assert [row['seq'] for row in get_stats(since=since, fields='seq')[1]['recent_signals']] == [12, 13]
+
+
+def test_without_since_the_newest_rows(history):
+    fill(history, 12)
+    status, body = get_stats(limit=3)
+    assert status == 200 and [row['seq'] for row in body['recent_signals']] == [9, 10, 11]
+    assert set(body['recent_signals'][0]) == {'seq', 'timestamp', 'signal', 'confidence', 'all_signals', 'strength'}
+    assert body['next_since'] == 11 and body['history_rows'] == 12 and body['first_seq'] == 0
+
+
+def test_since_a_returned_timestamp(history):
+    fill(history, 8)
+    rows = get_stats(limit=8, since=-1, fields='seq,timestamp')[1]['recent_signals']
+    status, body = get_stats(since=rows[3]['timestamp'], fields='seq')
+    assert status == 200 and [row['seq'] for row in body['recent_signals']] == [4, 5, 6, 7]
+
+
+def test_a_cursor_older_than_the_ring_resumes_at_the_oldest_row(monkeypatch):
+    history = SignalHistory(capacity=5)
+    monkeypatch.setitem(api.trading_ai.model_data, 'signals', history)
+    fill(history, 12)
+    status, body = get_stats(since=2, fields='seq')
+    assert [row['seq'] for row in body['recent_signals']] == [7, 8, 9, 10, 11]
+    assert body['first_seq'] == 7 and body['history_rows'] == 5
+
+
+def test_raw_payloads(history):
+    fill(history, 2)
+    rows = get_stats(since=-1, raw=1, fields='seq')[1]['recent_signals']
+    assert [row['technical_data'] for row in rows] == [{'LTP': 0}, {'LTP': 1}]
+    assert 'technical_data' not in get_stats(since=-1, fields='seq')[1]['recent_signals'][0]
+
+
+@pytest.mark.parametrize('params', [
+    {'limit': 0}, {'limit': api.STATS_MAX_LIMIT + 1}, {'limit': 'ten'},
+    {'since': 'yesterday'}, {'fields': 'seq,price'}, {'model': 'no-such-model'},
+])
+def test_invalid_queries_are_rejected(history, params):
+    status, body = get_stats(**params)
+    assert status in (400, 404) and 'error' in body
@@ -0,0 +1,84 @@
+"""Metrics aggregation across worker files, and the cost of recording a request"""
+import os
+import time
+
+from metrics import ENDPOINT_SLOTS, SLOTS, STAGE_SLOTS, MetricsRegistry
+
+PREDICTIONS = SLOTS[('predictions_total', 'BUY_CE')]
+HISTORY_ROWS = SLOTS[('history_rows', None)]
+WORKERS = SLOTS[('workers', None)]
+
+# Per-request overhead the metrics may add (the /metrics requirement)
+OVERHEAD_BUDGET_SECONDS = 5e-6
+
+
+def test_exited_workers_keep_their_counters_but_not_their_gauges(tmp_path):
+    registry = MetricsRegistry(str(tmp_path), flush_seconds=3600)
+    pid = os.fork()
+    if pid == 0:
+        registry.start()
+        registry.inc(PREDICTIONS, 3)
+        registry.set(HISTORY_ROWS, 40)
+        registry.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    registry.start()
+    registry.inc(PREDICTIONS, 2)
+    registry.set(HISTORY_ROWS, 7)
+    totals = registry.collect()
+    assert totals[PREDICTIONS] == 5
+    assert totals[HISTORY_ROWS] == 7 and totals[WORKERS] == 1
+
+
+def test_a_reused_pid_does_not_truncate_the_old_file(tmp_path):
+    exited = MetricsRegistry(str(tmp_path), flush_seconds=3600)
+    exited.start()
+    exited.inc(PREDICTIONS, 4)
+    exited.set(HISTORY_ROWS, 40)
+    exited.flush()
+    exited.pid = None  # exited: it never writes its file again
+    time.sleep(0.01)
+
+    # A new worker with the same pid (this process) gets a file of its own
+    worker = MetricsRegistry(str(tmp_path), flush_seconds=3600)
+    worker.start()
+    worker.inc(PREDICTIONS)
+    worker.set(HISTORY_ROWS, 7)
+    assert len(os.listdir(tmp_path)) == 2
+    totals = worker.collect()
+    assert totals[PREDICTIONS] == 5
+    assert totals[HISTORY_ROWS] == 7 and totals[WORKERS] == 1
+
+
+def record_predict(registry):
+    """The metric calls of one /predict: request count, five stage timings and the signal count"""
+    started = time.perf_counter_ns()
+    registry.observe(STAGE_SLOTS['parse'], time.perf_counter_ns() - started)
+    started = time.perf_counter_ns()
+    technical_done = time.perf_counter_ns()
+    writers_done = time.perf_counter_ns()
+    registry.observe(STAGE_SLOTS['analyze_technical'], technical_done - started)
+    registry.observe(STAGE_SLOTS['analyze_writers'], writers_done - technical_done)
+    registry.observe(STAGE_SLOTS['decision'], time.perf_counter_ns() - writers_done)
+    registry.inc(PREDICTIONS)
+    started = time.perf_counter_ns()
+    registry.observe(STAGE_SLOTS['serialization'], time.perf_counter_ns() - started)
+    if not registry.started:
+        registry.start()
+    slots = ENDPOINT_SLOTS.get('predict')
+    registry.inc(slots[0])
+
+
+def test_recording_a_request_costs_under_5_microseconds(tmp_path):
+    registry = MetricsRegistry(str(tmp_path), flush_seconds=3600)
+    registry.start()
+    requests = 20000
+    best = float('inf')
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(requests):
+            record_predict(registry)
+        best = min(best, (time.perf_counter() - started) / requests)
+    assert best < OVERHEAD_BUDGET_SECONDS, f"{best * 1e6:.2f} µs per request"
+    assert registry.collect()[PREDICTIONS] == 5 * requests
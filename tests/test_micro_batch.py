@@ -0,0 +1,144 @@
+"""Micro-batching: window and size flushes, coalescing, and results equal to one-by-one scoring"""
+import asyncio
+import json
+import logging
+import random
+
+import pytest
+
+import ai_model_api_fixed as api
+import ai_model_asgi
+from ai_model_api_fixed import ProfessionalTradingAI
+from benchmark_predict_batch import make_snapshot
+from micro_batch import MicroBatcher
+from signal_history import SignalHistory
+
+logging.disable(logging.INFO)
+
+
+class Scorer:
+    """A score() that records the batches it was given"""
+
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if self.fail:
+            raise RuntimeError('scoring failed')
+        return [{'item': item} for item in items]
+
+
+def run(*coroutines):
+    async def gather():
+        return await asyncio.gather(*coroutines, return_exceptions=True)
+    return asyncio.run(gather())
+
+
+def test_one_window_is_one_batch_and_identical_keys_share_an_entry():
+    scorer = Scorer()
+    batcher = MicroBatcher(scorer, window_seconds=0.01)
+    results = run(*(batcher.submit(key, key) for key in ('a', 'b', 'a', 'c', 'a')))
+    assert scorer.batches == [['a', 'b', 'c']]
+    assert [result['item'] for result in results] == ['a', 'b', 'a', 'c', 'a']
+    assert results[0] is results[2] is results[4]
+    stats = batcher.stats()
+    assert (stats['batches'], stats['requests'], stats['coalesced'], stats['mean_batch']) == (1, 5, 2, 3.0)
+
+
+def test_a_full_batch_is_scored_without_waiting_for_the_window():
+    scorer = Scorer()
+    batcher = MicroBatcher(scorer, window_seconds=60, max_batch=2)
+
+    async def submit_all():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(k, k) for k in range(4))), timeout=5)
+    assert [result['item'] for result in asyncio.run(submit_all())] == [0, 1, 2, 3]
+    assert scorer.batches == [[0, 1], [2, 3]] and batcher.largest_batch == 2
+
+
+def test_later_submissions_start_a_new_window():
+    scorer = Scorer()
+    batcher = MicroBatcher(scorer, window_seconds=0.005)
+
+    async def two_windows():
+        first = await batcher.submit('a', 'a')
+        second = await batcher.submit('a', 'a')
+        return first, second
+    first, second = asyncio.run(two_windows())
+    assert scorer.batches == [['a'], ['a']] and first is not second and batcher.coalesced == 0
+
+
+def test_a_scoring_error_reaches_every_waiting_request():
+    batcher = MicroBatcher(Scorer(fail=True), window_seconds=0.005)
+    results = run(batcher.submit('a', 'a'), batcher.submit('b', 'b'), batcher.submit('a', 'a'))
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_a_cancelled_request_does_not_cancel_the_shared_result():
+    batcher = MicroBatcher(Scorer(), window_seconds=0.01)
+
+    async def cancel_one():
+        leaving = asyncio.ensure_future(batcher.submit('a', 'a'))
+        staying = asyncio.ensure_future(batcher.submit('a', 'a'))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        return await staying
+    assert asyncio.run(cancel_one()) == {'item': 'a'}
+
+
+def test_invalid_settings_are_rejected():
+    for window_seconds, max_batch in ((0, 10), (0.002, 0)):
+        with pytest.raises(ValueError):
+            MicroBatcher(Scorer(), window_seconds, max_batch)
+
+
+def comparable(result):
+    return {key: value for key, value in result.items() if key not in ('timestamp', 'prediction_id')}
+
+
+async def post(raw, query_string=b''):
+    """(status, body) of one /predict through the ASGI app"""
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': raw, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+    scope = {'type': 'http', 'method': 'POST', 'path': '/predict', 'query_string': query_string,
+             'headers': [(b'content-type', b'application/json')]}
+    await ai_model_asgi.app(scope, receive, send)
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+
+def test_batched_predictions_match_one_by_one_predictions(monkeypatch):
+    history = SignalHistory(100)
+    monkeypatch.setitem(api.trading_ai.model_data, 'signals', history)
+    monkeypatch.setattr(api.trading_ai, 'response_cache', None)
+    batcher = MicroBatcher(api.predict_many, window_seconds=0.05)
+    monkeypatch.setattr(ai_model_asgi, 'predict_batcher', batcher)
+
+    rng = random.Random(1)
+    payloads = [make_snapshot(rng) for _ in range(12)]
+    bodies = [json.dumps(payload).encode() for payload in payloads]
+    # Two polls repeat an earlier body, and two requests never reach the model
+    requests = [(raw, b'') for raw in bodies] + [(bodies[3], b''), (bodies[7], b'')] + \
+               [(b'{}', b''), (bodies[0], b'model=no-such-model')]
+
+    async def burst():
+        return await asyncio.gather(*(post(raw, query_string) for raw, query_string in requests))
+    responses = asyncio.run(burst())
+
+    assert batcher.batches == 1 and batcher.coalesced == 2
+    reference = ProfessionalTradingAI()
+    reference.response_cache = None
+    for payload, (status, body) in zip(payloads, responses):
+        assert status == 200 and comparable(body) == comparable(reference.professional_signal_generation(payload))
+    assert responses[12] == responses[3] and responses[13] == responses[7]
+    assert [status for status, _ in responses[14:]] == [400, 404]
+    assert responses[14][1] == api.predict_response(lambda: {}, {})[0]
+
+    # One history row per distinct prediction, with distinct ids
+    assert len(history) == 12
+    assert len({body['prediction_id'] for _, body in responses[:12]}) == 12
@@ -0,0 +1,125 @@
+"""Named models: alias resolution, versioned hot reload and shared rule tables"""
+import json
+import logging
+import os
+import random
+
+import pytest
+
+from ai_model_api_fixed import ProfessionalTradingAI
+from benchmark_predict_batch import make_snapshot
+from model_registry import ModelRegistry
+
+logging.disable(logging.INFO)
+
+
+class Directory:
+    """A registry directory whose files get strictly increasing mtimes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.clock = 1_700_000_000 * 10**9
+
+    def file(self, name):
+        return os.path.join(self.path, f"{name}.json")
+
+    def write(self, name, **document):
+        with open(self.file(name), 'w') as f:
+            json.dump(document, f)
+        self.touch(name)
+
+    def touch(self, name):
+        self.clock += 10**9
+        os.utime(self.file(name), ns=(self.clock, self.clock))
+
+    def remove(self, name):
+        os.remove(self.file(name))
+
+
+@pytest.fixture
+def directory(tmp_path):
+    return Directory(str(tmp_path))
+
+
+@pytest.fixture
+def registry(directory):
+    return ModelRegistry(ProfessionalTradingAI(), directory.path, lambda name: ProfessionalTradingAI(), poll_seconds=0)
+
+
+def test_names_and_aliases_select_one_model(directory, registry):
+    directory.write('NIFTY', version=1, aliases=['nifty-scalper', 'NIFTY50'])
+    directory.write('BANKNIFTY', version=1)
+    name, model = registry.select('nifty-scalper')
+    assert name == 'NIFTY' and model is not registry.default_model
+    assert registry.select('NIFTY') == ('NIFTY', model) and registry.select('NIFTY50') == ('NIFTY', model)
+    assert registry.select('BANKNIFTY')[1] not in (model, registry.default_model)
+    for key in ('FINNIFTY', '', None, 42, ['NIFTY']):
+        assert registry.select(key) == (None, registry.default_model)
+
+
+def test_an_alias_claimed_twice_goes_to_the_first_model_by_name(directory, registry):
+    directory.write('A', aliases=['shared'])
+    directory.write('B', aliases=['shared'])
+    assert registry.select('shared')[0] == 'A'
+
+
+def test_config_overrides_keep_the_other_defaults(directory, registry):
+    directory.write('NIFTY', version=1, pattern_weights={'vix_high': -0.8},
+                    decision_thresholds={'strong_strength': 2.5}, polarity='corrected')
+    model = registry.resolve('NIFTY')
+    defaults = registry.default_model.rules
+    assert model.rules.pattern_weights == dict(defaults.pattern_weights, vix_high=-0.8)
+    assert model.rules.decision_thresholds == dict(defaults.decision_thresholds, strong_strength=2.5)
+    assert model.polarity == 'corrected'
+
+
+def test_a_new_version_is_hot_swapped_and_keeps_the_history(directory, registry):
+    directory.write('NIFTY', version=1, pattern_weights={'vix_high': -0.8})
+    model = registry.resolve('NIFTY')
+    model.professional_signal_generation(make_snapshot(random.Random(1)))
+
+    # Edits that keep the version are not applied
+    directory.write('NIFTY', version=1, pattern_weights={'vix_high': -1.0})
+    assert registry.resolve('NIFTY').rules.pattern_weights['vix_high'] == -0.8
+
+    directory.write('NIFTY', version=2, pattern_weights={'vix_high': -1.0})
+    assert registry.resolve('NIFTY') is model
+    assert model.rules.pattern_weights['vix_high'] == -1.0 and registry.versions['NIFTY'] == 2
+    assert len(model.model_data['signals']) == 1
+
+    directory.remove('NIFTY')
+    assert registry.select('NIFTY') == (None, registry.default_model) and 'NIFTY' not in registry.models
+
+
+def test_a_broken_config_keeps_the_last_good_one(directory, registry):
+    directory.write('NIFTY', version=1, pattern_weights={'vix_high': -0.8})
+    model = registry.resolve('NIFTY')
+    with open(directory.file('NIFTY'), 'w') as f:
+        f.write('{"version": 2, ')
+    directory.touch('NIFTY')
+    assert registry.resolve('NIFTY') is model and model.rules.pattern_weights['vix_high'] == -0.8
+
+
+def test_saved_parameters_reach_other_workers(directory, registry):
+    directory.write('NIFTY', version=3, aliases=['nifty-scalper'])
+    other_worker = ModelRegistry(ProfessionalTradingAI(), directory.path, lambda name: ProfessionalTradingAI(),
+                                 poll_seconds=0)
+    model = other_worker.resolve('NIFTY')
+    weights = dict(model.rules.pattern_weights, vix_calm=1.2)
+    registry.refresh()
+    assert registry.save_parameters('NIFTY', weights, model.rules.decision_thresholds) == 4
+    directory.touch('NIFTY')
+    assert other_worker.resolve('nifty-scalper').rules.pattern_weights['vix_calm'] == 1.2
+    with open(directory.file('NIFTY')) as f:
+        assert json.load(f)['aliases'] == ['nifty-scalper']
+
+
+def test_identical_parameters_share_one_rule_table(directory, registry):
+    for name in ('NIFTY', 'BANKNIFTY'):
+        directory.write(name, pattern_weights={'vix_high': -0.8})
+    directory.write('FINNIFTY', pattern_weights={'vix_high': -0.9})
+    directory.write('SENSEX')
+    nifty, banknifty, finnifty, sensex = (registry.resolve(name) for name in ('NIFTY', 'BANKNIFTY', 'FINNIFTY', 'SENSEX'))
+    assert nifty.rules is banknifty.rules
+    assert finnifty.rules is not nifty.rules
+    assert sensex.rules is registry.default_model.rules
@@ -0,0 +1,78 @@
+"""Support and resistance levels of the option chain summary on realistic chains
+
+The chains are seeded NIFTY-like expiries: 50-point strikes, open interest
+peaking a few strikes out of the money, heavier on round 100 and 500
+strikes, with log-normal noise. On such chains STRONG_SUPPORT and
+STRONG_RESISTANCE must stay rare; they are for chains where open interest
+piles up on two strikes.
+"""
+import random
+
+import numpy as np
+
+from ai_model_api_fixed import ProfessionalTradingAI
+from option_chain import OptionChain
+
+CHAINS = 300
+
+
+def make_chain(rng, spot):
+    """A full /option_chain snapshot around spot"""
+    atm = round(spot / 50) * 50
+    strikes = [atm + 50 * k for k in range(-30, 31)]
+    snapshot = {'symbol': 'NIFTY', 'expiry': '2024-01-25', 'spot': spot, 'strikes': strikes}
+    for side, sign in (('pe', -1), ('ce', 1)):
+        oi, ltp = [], []
+        for strike in strikes:
+            distance = sign * (strike - spot) / 50  # strikes out of the money
+            weight = 2.5 if strike % 500 == 0 else 1.8 if strike % 100 == 0 else 1.0
+            profile = np.exp(-((distance - 3) / 5) ** 2) * (np.exp(distance / 2) if distance < 0 else 1.0)
+            oi.append(float(profile * weight * rng.lognormvariate(0, 0.35) * 1e6))
+            ltp.append(max(-sign * (strike - spot), 0) + 80 * np.exp(-abs(distance) / 6))
+        snapshot[f'{side}_oi'], snapshot[f'{side}_ltp'] = oi, ltp
+    return snapshot
+
+
+def summarize(snapshot):
+    chain = OptionChain()
+    chain.apply(snapshot)
+    return chain.summary()
+
+
+def test_strong_levels_are_rare_on_realistic_chains():
+    rng = random.Random(7)
+    model = ProfessionalTradingAI()
+    strong = {'STRONG_SUPPORT': 0, 'STRONG_RESISTANCE': 0}
+    for _ in range(CHAINS):
+        summary = summarize(make_chain(rng, rng.uniform(21000, 25000)))
+        signals, _ = model.analyze_writers_zone(summary)
+        for name in strong:
+            strong[name] += name in signals
+    assert all(count < CHAINS * 0.25 for count in strong.values()), strong
+
+
+def test_levels_are_the_strikes_holding_concentrated_open_interest():
+    spot = 24610.0
+    snapshot = make_chain(random.Random(1), spot)
+    strikes = snapshot['strikes']
+    # Flat open interest on every strike, then two put walls and one call wall
+    for side in ('pe', 'ce'):
+        snapshot[f'{side}_oi'] = [1e5] * len(strikes)
+    snapshot['pe_oi'][strikes.index(24500)] = 1e6
+    snapshot['pe_oi'][strikes.index(24200)] = 1.5e6
+    snapshot['ce_oi'][strikes.index(25000)] = 2e6
+    summary = summarize(snapshot)
+    assert summary['supportLevels'] == [24200.0, 24500.0]
+    assert summary['resistanceLevels'] == [25000.0]
+
+    signals, _ = ProfessionalTradingAI().analyze_writers_zone(summary)
+    assert 'STRONG_SUPPORT' in signals
+    assert 'STRONG_RESISTANCE' not in signals
+
+
+def test_evenly_spread_open_interest_has_no_levels():
+    snapshot = make_chain(random.Random(2), 24610.0)
+    for side in ('pe', 'ce'):
+        snapshot[f'{side}_oi'] = [1e5] * len(snapshot['strikes'])
+    summary = summarize(snapshot)
+    assert summary['supportLevels'] == [] and summary['resistanceLevels'] == []
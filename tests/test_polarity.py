@@ -0,0 +1,86 @@
+"""Signal direction counting with precomputed polarity masks
+
+The legacy masks must count exactly like the keyword scan they replaced,
+in the scalar popcount and in the batch column sums; the corrected mode
+must follow CORRECTED_POLARITY.
+"""
+import logging
+import random
+
+import pytest
+
+import signal_rules
+from ai_model_api_fixed import ProfessionalTradingAI
+from signal_rules import BEARISH, BULLISH, CORRECTED_POLARITY, SIGNAL_NAMES, CompiledRules, polarity_masks
+
+logging.disable(logging.INFO)
+
+WEIGHTS = ProfessionalTradingAI().model_data['pattern_weights']
+
+
+def keyword_counts(signals):
+    """The direction count of make_professional_decision before the masks (do not edit)"""
+    bullish_signals = [s for s in signals if any(word in s for word in
+                      ['BULLISH', 'OVERSOLD', 'BUY', 'UPTREND', 'STRONG', 'ABOVE', 'CALM'])]
+    bearish_signals = [s for s in signals if any(word in s for word in
+                      ['BEARISH', 'OVERBOUGHT', 'SELL', 'DOWNTREND', 'WEAK', 'BELOW', 'HIGH'])]
+    return len(bullish_signals), len(bearish_signals)
+
+
+def signal_sets(seed, count):
+    rng = random.Random(seed)
+    return [rng.sample(SIGNAL_NAMES, rng.randint(0, len(SIGNAL_NAMES))) for _ in range(count)]
+
+
+def test_legacy_masks_count_like_the_keyword_scan():
+    rules = CompiledRules(WEIGHTS, 'legacy')
+    for signals in signal_sets(1, 2000):
+        assert rules.count_directions(rules.signal_mask(signals)) == keyword_counts(signals), signals
+
+
+@pytest.mark.parametrize('polarity', signal_rules.POLARITY_MODES)
+def test_batch_counts_match_scalar_counts(polarity):
+    np = pytest.importorskip('numpy')
+    rules = CompiledRules(WEIGHTS, polarity)
+    sets = signal_sets(2, 500)
+    fired = np.array([[name in signals for name in SIGNAL_NAMES] for signals in sets], dtype=np.int64)
+    bullish, bearish = rules.direction_counts(fired)
+    for k, signals in enumerate(sets):
+        assert (bullish[k], bearish[k]) == rules.count_directions(rules.signal_mask(signals)), signals
+
+
+def test_corrected_masks_follow_the_polarity_table():
+    assert set(CORRECTED_POLARITY) <= set(SIGNAL_NAMES)
+    bullish_mask, bearish_mask = polarity_masks('corrected')
+    for signal_id, name in enumerate(SIGNAL_NAMES):
+        flags = CORRECTED_POLARITY.get(name, 0)
+        assert bool(bullish_mask >> signal_id & 1) == bool(flags & BULLISH), name
+        assert bool(bearish_mask >> signal_id & 1) == bool(flags & BEARISH), name
+    assert bullish_mask & bearish_mask == 0
+
+
+def test_corrected_mode_reclassifies_the_legacy_mistakes():
+    legacy, corrected = CompiledRules(WEIGHTS, 'legacy'), CompiledRules(WEIGHTS, 'corrected')
+    for name, legacy_counts, corrected_counts in (
+        ('HIGH_CE_PREMIUM', (0, 1), (1, 0)),
+        ('STRONG_RESISTANCE', (1, 0), (0, 1)),
+        ('VIX_CALM', (1, 0), (0, 0)),
+        ('VOLUME_WEAK', (0, 1), (0, 0)),
+        ('ADX_STRONG_TREND', (1, 0), (0, 0)),
+    ):
+        assert legacy.count_directions(legacy.signal_mask([name])) == legacy_counts, name
+        assert corrected.count_directions(corrected.signal_mask([name])) == corrected_counts, name
+
+
+def test_polarity_changes_the_decision():
+    """Five legacy-bullish signals make a strong BUY_CE; corrected, only one of them is bullish"""
+    signals = ['VIX_CALM', 'VOLUME_STRONG', 'ADX_STRONG_TREND', 'STRONG_RESISTANCE', 'EMA_BULLISH']
+    decisions = {polarity: ProfessionalTradingAI(polarity).make_professional_decision(signals, 3.0, {'VIX': {'vix': 14}}, {})
+                 for polarity in signal_rules.POLARITY_MODES}
+    assert decisions['legacy'][0] == 'BUY_CE'
+    assert decisions['corrected'] == ('HOLD', 0.0)
+
+
+def test_unknown_polarity_mode_is_rejected():
+    with pytest.raises(ValueError):
+        polarity_masks('inverted')
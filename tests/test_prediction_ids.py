@@ -0,0 +1,119 @@
+"""Prediction ids: one string type, owned by one worker, honoured after a warm start"""
+import logging
+import os
+import random
+
+import pytest
+
+import ai_model_api_fixed as api
+import signal_history
+from ai_model_api_fixed import ProfessionalTradingAI
+from benchmark_predict_batch import make_snapshot
+from prediction_log import PredictionLog
+from signal_history import DuplicateOutcome, OtherWorkerPrediction, SignalHistory, boot_id
+from warm_start import DEFAULT_MODEL, WarmStart, write_snapshot
+
+logging.disable(logging.INFO)
+
+
+def predict(model, count, seed):
+    rng = random.Random(seed)
+    return [model.professional_signal_generation(make_snapshot(rng))['prediction_id'] for _ in range(count)]
+
+
+def update_accuracy(**body):
+    response = api.app.test_client().post('/update_accuracy', json=dict(body, actual_outcome='correct'))
+    return response.status_code
+
+
+def test_ids_are_strings_with_and_without_the_shared_log(tmp_path):
+    model = ProfessionalTradingAI()
+    assert predict(model, 2, seed=1) == [f"{boot_id()}:0", f"{boot_id()}:1"]
+    batch = model.professional_signal_generation_batch([make_snapshot(random.Random(2))])
+    assert batch[0]['prediction_id'] == f"{boot_id()}:2"
+
+    logged = ProfessionalTradingAI()
+    logged.prediction_log = PredictionLog(str(tmp_path / 'predictions.log'))
+    assert predict(logged, 2, seed=1) == ['0', '1']
+    assert logged.professional_signal_generation_batch([make_snapshot(random.Random(2))])[0]['prediction_id'] == '2'
+    logged.record_outcome(None, 'correct', '1')
+    with pytest.raises(DuplicateOutcome):
+        logged.record_outcome(None, 'correct', '1')
+
+
+def test_feedback_for_another_workers_prediction_is_misdirected(monkeypatch):
+    monkeypatch.setitem(api.trading_ai.model_data, 'signals', SignalHistory(10))
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # a second gunicorn worker, forked from the same master
+        os.write(write_fd, predict(api.trading_ai, 1, seed=3)[0].encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    other_id = os.read(read_fd, 64).decode()
+    os.close(read_fd), os.close(write_fd)
+
+    own_id = predict(api.trading_ai, 1, seed=3)[0]
+    assert other_id.split(':')[1] == own_id.split(':')[1] == '0' and other_id != own_id
+    assert update_accuracy(prediction_id=other_id) == 421
+    assert update_accuracy(prediction_id=own_id) == 200
+    assert update_accuracy(prediction_id=own_id) == 409
+    assert update_accuracy(prediction_id=f"{boot_id()}:1") == 404
+    assert update_accuracy(prediction_id='12') == 400
+
+
+def restart(monkeypatch, path, boot):
+    """A model restored from the snapshot at path by a new process with this boot id"""
+    monkeypatch.setattr(signal_history, '_boot_id', boot)
+    model = ProfessionalTradingAI()
+    warm_start = WarmStart(path)
+    assert warm_start.open() and warm_start.restore(DEFAULT_MODEL, model)
+    return model
+
+
+def test_feedback_for_a_prediction_made_before_a_restart(tmp_path, monkeypatch):
+    path = str(tmp_path / 'warm_start.snapshot')
+    monkeypatch.setattr(signal_history, '_boot_id', 'first')
+    first = ProfessionalTradingAI()
+    ids = predict(first, 4, seed=4)
+    first.record_outcome(None, 'correct', ids[0])
+    write_snapshot(path, {DEFAULT_MODEL: first})
+
+    second = restart(monkeypatch, path, 'second')
+    new_id = predict(second, 1, seed=5)[0]
+    assert new_id == 'second:4'
+    second.record_outcome(None, 'incorrect', ids[1], pnl=-5.0)
+    second.record_outcome(None, 'correct', new_id)
+    with pytest.raises(DuplicateOutcome):
+        second.record_outcome(None, 'correct', ids[0])
+    with pytest.raises(KeyError):  # the first process never handed it out
+        second.record_outcome(None, 'correct', 'first:4')
+    with pytest.raises(OtherWorkerPrediction):
+        second.record_outcome(None, 'correct', 'elsewhere:4')
+    write_snapshot(path, {DEFAULT_MODEL: second})
+
+    # Ids survive more than one restart, as long as the rows are held
+    third = restart(monkeypatch, path, 'third')
+    third.record_outcome(None, 'correct', ids[2])
+    third.record_outcome(None, 'correct', ids[3])
+    with pytest.raises(DuplicateOutcome):
+        third.record_outcome(None, 'correct', new_id)
+    assert third.model_data['accuracy_tracker'] == {'total': 5, 'correct': 4}
+
+
+def test_ids_of_overwritten_rows_are_not_restored(monkeypatch):
+    monkeypatch.setattr(signal_history, '_boot_id', 'first')
+    history = SignalHistory(capacity=3)
+    for seq in range(5):
+        history.append('HOLD', 0.5, 0.0, 0, 100.0 + seq, 50.0, 14.0, {}, {})
+    ranges = history.id_ranges()
+    assert ranges == {'first': [2, 5]}
+
+    monkeypatch.setattr(signal_history, '_boot_id', 'second')
+    restored = SignalHistory(capacity=2)
+    restored.restore_rows(*history.snapshot()[:3], id_ranges=ranges)
+    assert restored.resolve_id('first:4') == 4
+    with pytest.raises(KeyError):
+        restored.resolve_id('first:2')  # overwritten: the restored ring holds 3 and 4
+    restored.append('HOLD', 0.5, 0.0, 0, 105.0, 50.0, 14.0, {}, {})
+    restored.append('HOLD', 0.5, 0.0, 0, 106.0, 50.0, 14.0, {}, {})
+    assert restored.id_ranges() == {'second': [5, 7]}
@@ -0,0 +1,72 @@
+"""The shared prediction log across processes: one outcome per prediction"""
+import multiprocessing
+import os
+
+import pytest
+
+from prediction_log import HEADER, RECORD, PredictionLog
+from signal_history import DuplicateOutcome
+
+PREDICTIONS = 200
+WORKERS = 4
+
+
+def record_all(path, start, results):
+    """A worker sending feedback for every prediction; reports how many it attached"""
+    log = PredictionLog(path)
+    start.wait()
+    attached = 0
+    for prediction_id in range(PREDICTIONS):
+        try:
+            log.append_outcome(None, prediction_id % 3 == 0, prediction_id=prediction_id, pnl=1.0)
+            attached += 1
+        except DuplicateOutcome:
+            pass
+    log.close()
+    results.put(attached)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_concurrent_feedback_attaches_once(tmp_path):
+    path = str(tmp_path / 'predictions.log')
+    log = PredictionLog(path)
+    first = log.append_predictions([('BUY_CE', 0.8, 2.5, 1, 24500.0, 55.0, 14.0, 0)] * PREDICTIONS)
+    assert first == 0
+
+    context = multiprocessing.get_context('fork')
+    start, results = context.Event(), context.Queue()
+    workers = [context.Process(target=record_all, args=(path, start, results)) for _ in range(WORKERS)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    attached = [results.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=60)
+
+    assert sum(attached) == PREDICTIONS
+    assert log.record_count() == 2 * PREDICTIONS
+    stats = log.stats()
+    assert stats['outcomes'] == PREDICTIONS
+    assert stats['correct'] == len(range(0, PREDICTIONS, 3))
+    log.close()
+
+
+def test_readers_count_the_first_outcome_only(tmp_path):
+    """A duplicate written past the check (an old or lock-less writer) does not count twice"""
+    path = str(tmp_path / 'predictions.log')
+    log = PredictionLog(path)
+    prediction_id = log.append_prediction('BUY_PE', 0.7, -2.0, 2, 24500.0, 45.0, 14.0)
+    log.append_outcome(None, True, prediction_id=prediction_id)
+    log.append_outcome(None, False)  # feedback without an id always counts
+    with open(path, 'rb') as f:
+        f.seek(HEADER.size + RECORD.size)
+        log._append(f.read(RECORD.size))  # the first outcome record again
+
+    reader = PredictionLog(path)
+    assert reader.record_count() == 4
+    assert reader.stats() == dict(predictions=1, outcomes=2, correct=1,
+                                  signals={'HOLD': 0, 'BUY_CE': 0, 'BUY_PE': 1})
+    with pytest.raises(DuplicateOutcome):
+        reader.append_outcome(None, True, prediction_id=prediction_id)
+    log.close()
+    reader.close()
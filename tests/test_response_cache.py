@@ -0,0 +1,130 @@
+"""Response cache: decision keys, cached /predict results and the LRU/TTL bookkeeping
+
+Two payloads with the same decision key must get the same signals,
+strength, decision, regime and VIX condition. A cache hit must still
+report the request's own ltp and history row.
+"""
+import copy
+import logging
+import random
+
+from ai_model_api_fixed import ProfessionalTradingAI
+from benchmark_predict_batch import make_snapshot
+from response_cache import ResponseCache
+
+logging.disable(logging.INFO)
+
+# Numeric inputs nudged between polls: (indicator, field), None for top-level fields
+NUMERIC_FIELDS = (
+    (None, 'LTP'), ('RSI', 'rsi'), ('MACD', 'histogram'), ('VIX', 'vix'), ('CCI', 'value'), ('MFI', 'value'),
+    ('ATR', 'value'), ('ADX', 'value'), ('Stochastic', 'value'), (None, 'confidence'),
+    (None, 'putCallPremiumRatio'), (None, 'maxCELTP'), (None, 'maxPELTP'),
+)
+# Result fields read from the request rather than from the cached analysis
+PER_REQUEST = ('ltp',)
+
+
+def poll(rng, payload, spread):
+    """The payload a later poll in the same candle might send: every number moved by up to `spread`"""
+    payload = copy.deepcopy(payload)
+    for node, field in NUMERIC_FIELDS:
+        source = payload if node is None else payload[node]
+        source[field] = round(float(source[field]) + rng.uniform(-spread, spread), 2)
+    return payload
+
+
+def uncached_model():
+    model = ProfessionalTradingAI()
+    model.response_cache = None
+    return model
+
+
+def analysis(result):
+    """The cacheable part of a result"""
+    fields = {key: value for key, value in result['analysis'].items() if key not in PER_REQUEST}
+    return result['signal'], result['confidence'], fields
+
+
+def test_equal_keys_mean_equal_analyses():
+    rng = random.Random(1)
+    model = uncached_model()
+    rules = model.rules
+    by_key, shared = {}, 0
+    for _ in range(300):
+        base = make_snapshot(rng)
+        for payload in [base] + [poll(rng, base, spread) for spread in (0.05, 0.5, 3.0) for _ in range(3)]:
+            key = rules.decision_key(payload, payload, True)
+            result = analysis(model.professional_signal_generation(payload))
+            if key in by_key:
+                shared += 1
+                assert result == by_key[key], payload
+            else:
+                by_key[key] = result
+    # Most close polls fall in the same buckets, so the check above is not vacuous
+    assert shared > 100
+
+
+def test_cache_hit_reports_the_requests_own_inputs():
+    rng = random.Random(2)
+    model, reference = ProfessionalTradingAI(), uncached_model()
+    first = make_snapshot(rng)
+    second = copy.deepcopy(first)
+    second['LTP'] = first['LTP'] + 7.5
+    second['RSI']['rsi'] = f"{float(first['RSI']['rsi']) + 0.01:.2f}"
+    assert model.rules.decision_key(first, first, True) == model.rules.decision_key(second, second, True)
+
+    model.professional_signal_generation(first)
+    result = model.professional_signal_generation(second)
+    assert model.response_cache.hits == 1
+    expected = reference.professional_signal_generation(second)
+    for response in (result, expected):
+        response.pop('timestamp'), response.pop('prediction_id')
+    assert result == expected
+    assert result['analysis']['ltp'] == second['LTP']
+
+    # Each poll keeps its own history row, with its own ltp and rsi
+    rows = model.model_data['signals'].page(2, fields=('ltp', 'rsi'))[0]
+    assert [(row['ltp'], row['rsi']) for row in rows] == \
+        [(payload['LTP'], float(payload['RSI']['rsi'])) for payload in (first, second)]
+
+
+def test_parameter_swap_empties_the_cache():
+    model = ProfessionalTradingAI()
+    payload = make_snapshot(random.Random(3))
+    model.professional_signal_generation(payload)
+    model.update_parameters({'rsi_neutral': 0.9})
+    result = model.professional_signal_generation(payload)
+    cache = model.response_cache
+    assert cache.hits == 0 and cache.invalidations == 1 and len(cache) == 1
+    expected = uncached_model()
+    expected.update_parameters({'rsi_neutral': 0.9})
+    assert analysis(result) == analysis(expected.professional_signal_generation(payload))
+
+
+def test_confluence_and_unhashable_payloads_are_not_cached():
+    model = ProfessionalTradingAI()
+    payload = make_snapshot(random.Random(4))
+    payload['EMA20']['status'] = ['Bullish']
+    assert model.rules.decision_key(payload, payload, True) is None
+    model.professional_signal_generation(payload)
+    payload = make_snapshot(random.Random(4))
+    payload['timeframes'] = {}
+    model.professional_signal_generation(payload)
+    assert len(model.response_cache) == 0
+
+
+def test_lru_eviction_and_expiry():
+    rules, other = object(), object()
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.put('a', rules, 1)
+    cache.put('b', rules, 2)
+    assert cache.get('a', rules) == 1
+    cache.put('c', rules, 3)  # evicts b, the least recently used
+    assert cache.get('b', rules) is None and cache.get('c', rules) == 3 and cache.evictions == 1
+
+    cache.put('d', other, 4)  # computed under rules already swapped out: dropped
+    assert cache.get('d', rules) is None
+
+    expired = ResponseCache(ttl_seconds=-1)
+    expired.put('a', rules, 1)
+    assert expired.get('a', rules) is None and expired.expirations == 1 and len(expired) == 0
@@ -0,0 +1,114 @@
+"""The signal history ring buffer: wrap-around, paging, feedback and restore"""
+import threading
+
+import pytest
+
+from signal_history import DuplicateOutcome, SignalHistory, encode_context
+
+NS = 1_718_000_000 * 10**9
+
+
+def fill(history, count, start=0):
+    """Append rows whose ltp is their append index and whose timestamps are 1s apart"""
+    for i in range(start, start + count):
+        history.append('BUY_CE' if i % 2 else 'HOLD', 0.5, float(i), 1 << (i % 8), float(i), 50.0, 14.0,
+                       {'LTP': i}, {'writersZone': 'BULLISH'}, timestamp_ns=NS + i * 10**9,
+                       context=encode_context('BULLISH_TREND', 'LOW_VOLATILITY'))
+
+
+def ltps(history):
+    return [entry['ltp'] for entry in history.page(history.count, after_seq=-1, fields=('ltp',))[0]]
+
+
+def test_ring_keeps_the_newest_rows_in_order():
+    history = SignalHistory(capacity=5)
+    fill(history, 12)
+    assert len(history) == 5 and history.total_appended == 12 and history.first_seq == 7
+    assert ltps(history) == [7.0, 8.0, 9.0, 10.0, 11.0]
+    assert [entry['strength'] for entry in history.recent(2)] == [10.0, 11.0]
+    assert history.entry(-1, fields=('seq', 'signal', 'regime'))['seq'] == 11
+    assert history.nbytes == SignalHistory(capacity=5).nbytes
+
+
+def test_feedback_attaches_to_held_rows_only():
+    history = SignalHistory(capacity=5)
+    fill(history, 12)
+    with pytest.raises(KeyError):
+        history.record_outcome(6, True)
+    with pytest.raises(KeyError):
+        history.record_outcome(12, True)
+    assert history.record_outcome(9, True, pnl=12.5) == (1, 1 << 1, encode_context('BULLISH_TREND', 'LOW_VOLATILITY'))
+    with pytest.raises(DuplicateOutcome):
+        history.record_outcome(9, False)
+    entry = history.entry(2, fields=('seq', 'outcome', 'pnl', 'holding_seconds'))
+    assert entry == {'seq': 9, 'outcome': 'correct', 'pnl': 12.5, 'holding_seconds': None}
+
+
+def test_page_after_seq():
+    history = SignalHistory(capacity=5)
+    fill(history, 12)
+    rows, last = history.page(2, after_seq=7)
+    assert [row['seq'] for row in rows] == [8, 9] and last == 9
+    # A cursor older than the ring resumes at the oldest row held
+    rows, last = history.page(10, after_seq=2)
+    assert [row['seq'] for row in rows] == [7, 8, 9, 10, 11] and last == 11
+    assert history.page(10, after_seq=11) == ([], None)
+    # Without a cursor, the newest rows
+    assert [row['seq'] for row in history.page(3)[0]] == [9, 10, 11]
+
+
+def test_page_after_timestamp():
+    history = SignalHistory(capacity=5)
+    fill(history, 12)
+    rows, last = history.page(10, after_ns=NS + 8 * 10**9)
+    assert [row['seq'] for row in rows] == [9, 10, 11] and last == 11
+    rows, last = history.page(10, after_ns=NS + 8 * 10**9 + 1)
+    assert [row['seq'] for row in rows] == [9, 10, 11]
+    assert [row['seq'] for row in history.page(2, after_ns=0)[0]] == [7, 8]
+    assert history.page(10, after_ns=NS + 11 * 10**9) == ([], None)
+
+
+@pytest.mark.parametrize('capacity', [8, 3])
+def test_restore_rows_round_trip(capacity):
+    source = SignalHistory(capacity=5, store_raw=True)
+    fill(source, 12)
+    source.record_outcome(10, False, pnl=-3.0, holding_seconds=60.0)
+    restored = SignalHistory(capacity=capacity, store_raw=True)
+    restored.restore_rows(source.rows_bytes(), len(source), source.total_appended, source.raw_rows())
+
+    keep = min(capacity, 5)
+    assert len(restored) == keep and restored.first_seq == 12 - keep
+    fields = ('seq', 'timestamp', 'signal', 'confidence', 'all_signals', 'strength', 'ltp', 'regime', 'outcome', 'pnl')
+    assert [restored.entry(i, True, fields) for i in range(keep)] == \
+        [source.entry(i, True, fields) for i in range(5 - keep, 5)]
+    # New rows continue the sequence and wrap over the restored ones
+    fill(restored, capacity, start=12)
+    assert restored.first_seq == 12 and ltps(restored) == [float(i) for i in range(12, 12 + capacity)]
+
+
+def test_restore_into_a_wrapped_ring():
+    history = SignalHistory(capacity=4)
+    fill(history, 6)
+    rows = history.rows_bytes()
+    history.restore_rows(rows, 4, 6)
+    assert ltps(history) == [2.0, 3.0, 4.0, 5.0] and history.first_seq == 2
+
+
+def test_copy_is_consistent_while_rows_are_appended():
+    history = SignalHistory(capacity=64, store_raw=True)
+    done = threading.Event()
+
+    def writer():
+        fill(history, 20000)
+        done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        while not done.is_set():
+            copy = history.copy()
+            rows = copy.page(copy.count, after_seq=-1, include_raw=True, fields=('seq', 'ltp'))[0]
+            assert [row['ltp'] for row in rows] == [float(row['seq']) for row in rows]
+            assert all(row['technical_data'] == {'LTP': row['seq']} for row in rows)
+    finally:
+        thread.join()
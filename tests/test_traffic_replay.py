@@ -0,0 +1,114 @@
+"""Traffic capture and replay: round trips, divergence reports and the HTTP concurrency models"""
+import json
+import logging
+import random
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+import ai_model_api_fixed as api
+import wire_format
+from benchmark_predict_batch import make_snapshot
+from signal_history import SignalHistory
+from traffic_replay import TrafficRecorder, compare, export_history, load_capture, replay
+
+logging.disable(logging.INFO)
+
+
+@pytest.fixture(autouse=True)
+def fresh_model(monkeypatch):
+    monkeypatch.setitem(api.trading_ai.model_data, 'signals', SignalHistory(1000, store_raw=True))
+
+
+@pytest.fixture
+def capture(tmp_path, monkeypatch):
+    """Path of a capture of 40 JSON, 5 binary and 2 rejected /predict requests"""
+    path = str(tmp_path / 'capture.ndjson')
+    recorder = TrafficRecorder(path)
+    monkeypatch.setattr(api, 'traffic_recorder', recorder)
+    client = api.app.test_client()
+    rng = random.Random(1)
+    for i in range(45):
+        snapshot = make_snapshot(rng)
+        if i % 9 == 8:
+            client.post('/predict', data=wire_format.encode([snapshot]), content_type=wire_format.CONTENT_TYPE)
+        else:
+            client.post('/predict', json=snapshot)
+    client.post('/predict', json={})
+    client.post('/predict', json=make_snapshot(rng), query_string={'model': 'no-such-model'})
+    monkeypatch.setattr(api, 'traffic_recorder', None)
+    recorder.close()
+    return path
+
+
+@pytest.fixture
+def server():
+    """URL of the Flask app served from a thread"""
+    http = make_server('127.0.0.1', 0, api.app, threaded=True)
+    thread = threading.Thread(target=http.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{http.server_port}"
+    http.shutdown()
+    thread.join()
+
+
+def test_a_capture_replays_without_divergence(capture):
+    entries = load_capture(capture)
+    assert len(entries) == 47
+    assert sum(isinstance(entry['body'], bytes) and entry['body'].startswith(wire_format.MAGIC)
+               for entry in entries) == 5
+    assert [entry['status'] for entry in entries[-2:]] == [400, 404]
+    assert [entry['ts'] for entry in entries] == sorted(entry['ts'] for entry in entries)
+
+    report = replay(entries)
+    assert report['requests'] == 47 and report['divergent'] == 0 and report['connection_errors'] == 0
+    assert report['p50_ms'] <= report['p99_ms'] <= report['max_ms']
+    assert len(load_capture(capture, limit=10)) == 10
+
+
+def test_divergences_are_reported_by_field(capture):
+    entries = load_capture(capture)
+    entries[0]['signal'] = 'BUY_PE' if entries[0]['signal'] != 'BUY_PE' else 'BUY_CE'
+    entries[1]['confidence'] += 0.001
+    entries[2]['status'] = 500
+    report = replay(entries)
+    assert report['divergent'] == 3
+    assert report['divergent_by_field'] == {'status': 1, 'signal': 1, 'confidence': 1}
+    assert [item['line'] for item in report['divergences']] == [entries[i]['line'] for i in range(3)]
+    assert replay(entries[1:2], tolerance=0.002)['divergent'] == 0
+
+
+def test_compare():
+    entry = {'status': 200, 'signal': 'HOLD', 'confidence': 0.5}
+    assert compare(entry, 200, b'{"signal": "HOLD", "confidence": 0.5}', 0) == []
+    assert compare(entry, 502, b'Bad gateway', 0) == [
+        ('status', 200, 502), ('signal', 'HOLD', None), ('confidence', 0.5, None)]
+    rejected = {'status': 400, 'signal': None, 'confidence': None}
+    assert compare(rejected, 400, b'{"error": "No data provided"}', 0) == []
+
+
+@pytest.mark.parametrize('model, speed', [('open', 10.0), ('open', 0.0), ('closed', 1.0)])
+def test_http_replay(capture, server, model, speed):
+    entries = load_capture(capture)
+    for i, entry in enumerate(entries):  # 47 arrivals 20 ms apart: 0.92 s recorded
+        entry['ts'] = 1_718_000_000 + i * 0.02
+    report = replay(entries, url=server, speed=speed, model=model, connections=4)
+    assert report['divergent'] == 0 and report['connection_errors'] == 0 and report['requests'] == 47
+    assert report['model'] == model and report['connections'] == 4
+    if model == 'open' and speed:
+        assert report['speed'] == speed and report['elapsed_seconds'] >= 0.92 / speed
+    else:
+        assert report['speed'] == 'max'
+
+
+def test_exported_history_replays_without_divergence(tmp_path, server):
+    client = api.app.test_client()
+    rng = random.Random(2)
+    for _ in range(30):
+        client.post('/predict', json=make_snapshot(rng))
+    path = str(tmp_path / 'export.ndjson')
+    assert export_history(server, path, page_size=7) == 30
+    with open(path) as f:
+        assert json.loads(f.readline())['status'] == 200
+    assert replay(load_capture(path))['divergent'] == 0
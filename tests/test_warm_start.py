@@ -0,0 +1,144 @@
+"""Warm start: one snapshot per worker, claimed once by the next generation, and --preload forks"""
+import json
+import logging
+import os
+import random
+import sys
+
+import pytest
+
+import signal_history
+from ai_model_api_fixed import ProfessionalTradingAI
+from benchmark_predict_batch import make_snapshot
+from signal_history import OtherWorkerPrediction
+from warm_start import DEFAULT_MODEL, WarmStart, main, snapshot_files
+
+logging.disable(logging.INFO)
+
+WORKERS = []
+
+
+class Worker:
+    """A model and its WarmStart as one worker process with this boot id would have them"""
+
+    def __init__(self, monkeypatch, path, boot):
+        monkeypatch.setattr(signal_history, '_boot_id', boot)
+        self.model = ProfessionalTradingAI()
+        self.warm_start = WarmStart(path, collect=lambda: {DEFAULT_MODEL: self.model})
+        WORKERS.append(self)
+
+    def boot(self):
+        """Claim and restore a snapshot; True if there was one"""
+        return self.warm_start.open() and self.warm_start.restore(DEFAULT_MODEL, self.model)
+
+    def serve(self, predictions, seed, mtime):
+        """Predict, take feedback for the first prediction and save; returns the prediction ids"""
+        rng = random.Random(seed)
+        ids = [self.model.professional_signal_generation(make_snapshot(rng))['prediction_id']
+               for _ in range(predictions)]
+        self.model.record_outcome(None, 'correct', ids[0])
+        self.warm_start.save()
+        os.utime(self.warm_start.own_path, ns=(mtime, mtime))
+        return ids
+
+    def exit(self):
+        """Exit as the process would: release its lock, never save again"""
+        if self.warm_start.lock_fd is not None:
+            os.close(self.warm_start.lock_fd)
+            self.warm_start.lock_fd = None
+        self.warm_start.snapshot = None  # no takeover in the forks of later tests
+
+    def rows(self):
+        return len(self.model.model_data['signals'])
+
+
+@pytest.fixture
+def path(tmp_path):
+    yield str(tmp_path / 'warm_start.snapshot')
+    while WORKERS:
+        WORKERS.pop().exit()
+
+
+def old_generation(monkeypatch, path):
+    """Two exited workers that served 3 and 5 predictions; the second saved last"""
+    ids = {}
+    for boot, predictions, mtime in (('first', 3, 10**18), ('second', 5, 2 * 10**18)):
+        worker = Worker(monkeypatch, path, boot)
+        ids[boot] = worker.serve(predictions, seed=predictions, mtime=mtime)
+        worker.exit()
+    return ids
+
+
+def test_every_worker_saves_its_own_snapshot(monkeypatch, path):
+    old_generation(monkeypatch, path)
+    assert [os.path.basename(file) for file in snapshot_files(path)] == \
+        ['warm_start.snapshot.second', 'warm_start.snapshot.first']
+
+
+def test_each_snapshot_is_restored_by_one_worker(monkeypatch, path):
+    ids = old_generation(monkeypatch, path)
+    new = [Worker(monkeypatch, path, boot) for boot in ('third', 'fourth', 'fifth')]
+    assert [worker.boot() for worker in new] == [True, True, False]
+    third, fourth, fifth = new
+    assert (third.rows(), fourth.rows(), fifth.rows()) == (5, 3, 0)  # the newest first
+    assert third.model.model_data['accuracy_tracker'] == fourth.model.model_data['accuracy_tracker'] == \
+        {'correct': 1, 'total': 1}
+    assert third.warm_start.claimed.endswith('.second') and fifth.warm_start.claimed is None
+
+    # Feedback for a prediction made before the restart attaches on the worker that restored it
+    fourth.model.record_outcome(None, 'correct', ids['first'][2])
+    with pytest.raises(OtherWorkerPrediction):
+        third.model.record_outcome(None, 'correct', ids['first'][2])
+    assert sorted(os.path.basename(file) for file in snapshot_files(path)) == \
+        ['warm_start.snapshot.fourth', 'warm_start.snapshot.third']
+
+
+def test_a_running_workers_snapshot_is_not_claimed(monkeypatch, path):
+    running = Worker(monkeypatch, path, 'running')
+    running.serve(3, seed=1, mtime=10**18)
+    assert not Worker(monkeypatch, path, 'booting').boot()
+    running.exit()
+    assert Worker(monkeypatch, path, 'replacement').boot()
+
+
+def report(write_fd, worker):
+    """Send this forked worker's restored rows, feedback count and own path to the test"""
+    line = json.dumps([worker.rows(), worker.model.model_data['accuracy_tracker']['total'],
+                       os.path.exists(worker.warm_start.own_path)])
+    os.write(write_fd, line.encode() + b'\n')
+
+
+def test_preload_the_first_forked_worker_keeps_the_masters_state(monkeypatch, path):
+    old_generation(monkeypatch, path)
+    master = Worker(monkeypatch, path, 'master')
+    assert master.boot() and master.rows() == 5
+    results, release = os.pipe(), os.pipe()
+    children = []
+    for _ in range(2):
+        pid = os.fork()
+        if pid == 0:
+            report(results[1], master)
+            if not children:  # the first worker stays up while the second boots
+                os.read(release[0], 1)
+            os._exit(0)
+        children.append(pid)
+        if len(children) == 1:
+            first = json.loads(os.read(results[0], 1024))
+    second = json.loads(os.read(results[0], 1024))
+    os.write(release[1], b'x')
+    for pid in children:
+        os.waitpid(pid, 0)
+
+    assert first == [5, 1, True] and second == [3, 1, True]
+    assert master.rows() == 5 and not os.path.exists(master.warm_start.own_path)
+    assert len(snapshot_files(path)) == 2
+
+
+def test_describe_lists_every_snapshot(monkeypatch, path, capsys):
+    old_generation(monkeypatch, path)
+    monkeypatch.setattr(sys, 'argv', ['warm_start.py', path])
+    main()
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith(f"{path}.second: saved") and 'boot id second' in lines[0]
+    assert lines[1].startswith('default: 5 signals (next id 5), feedback 1/1')
+    assert lines[2].startswith(f"{path}.first: saved")
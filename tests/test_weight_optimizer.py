@@ -0,0 +1,80 @@
+"""The weight optimizer: request options, the search, and fitting a live model to its feedback"""
+import json
+import logging
+import random
+
+import pytest
+
+from ai_model_api_fixed import ProfessionalTradingAI
+from backtest import table_from_snapshots
+from benchmark_predict_batch import make_snapshot
+from signal_history import SignalHistory
+from weight_optimizer import optimize, optimize_model, request_options
+
+logging.disable(logging.INFO)
+
+SEARCH = {'candidates': 8, 'max_rounds': 4, 'patience': 2, 'min_trades': 1}
+
+
+def test_request_options_are_clamped_and_validated():
+    horizon, options = request_options({'horizon': 500, 'candidates': 0, 'train_fraction': 0.5, 'objective': 'hit_rate'})
+    assert horizon == 100 and options == {'candidates': 1, 'train_fraction': 0.5, 'objective': 'hit_rate'}
+    assert request_options({}) == (1, {})
+    for body in ({'rounds': 3}, {'max_rounds': 2.5}, {'seed': True}, {'objective': 'sharpe'}, {'model': 3}, []):
+        with pytest.raises(ValueError):
+            request_options(body)
+
+
+def test_optimize_is_reproducible():
+    rng = random.Random(1)
+    payloads = [make_snapshot(rng) for _ in range(300)]
+    table = table_from_snapshots([(payload, payload) for payload in payloads])
+    first, second = (optimize(table, seed=3, **SEARCH) for _ in range(2))
+    for report in (first, second):
+        report.pop('elapsed_seconds')
+    assert first == second
+    assert first['train']['best'] >= first['train']['baseline']
+    assert first['evaluations'] == first['rounds'] * SEARCH['candidates']
+
+
+def live_model(count, seed=2):
+    model = ProfessionalTradingAI()
+    model.model_data['signals'] = SignalHistory(count, store_raw=True)
+    rng = random.Random(seed)
+    results = [model.professional_signal_generation(make_snapshot(rng)) for _ in range(count)]
+    return model, results
+
+
+def test_optimize_model_needs_raw_history():
+    with pytest.raises(ValueError):
+        optimize_model(ProfessionalTradingAI())
+
+
+def test_optimize_model_fits_recorded_losses(tmp_path):
+    """Every trade the model took lost 10 points, so trading less must win on train and holdout"""
+    model, results = live_model(400)
+    history = model.model_data['signals']
+    for seq, result in enumerate(results):
+        if result['signal'] != 'HOLD':
+            history.record_outcome(seq, False, pnl=-10.0)
+    rules = model.rules
+    path = tmp_path / 'parameters.json'
+    report = optimize_model(model, parameters_path=str(path), seed=1, **SEARCH)
+
+    assert report['train']['baseline'] < 0 and report['improved']
+    assert report['holdout']['best'] > report['holdout']['baseline']
+    assert model.rules is not rules and model.rules.pattern_weights == report['pattern_weights']
+    assert json.loads(path.read_text())['pattern_weights'] == report['pattern_weights']
+
+
+def test_optimize_model_keeps_parameters_without_an_improvement():
+    """Every trade made 10 points: no parameters can beat taking all of them"""
+    model, results = live_model(400)
+    history = model.model_data['signals']
+    for seq, result in enumerate(results):
+        if result['signal'] != 'HOLD':
+            history.record_outcome(seq, True, pnl=10.0)
+    rules = model.rules
+    report = optimize_model(model, seed=1, **SEARCH)
+    assert report['train']['best'] == report['train']['baseline'] > 0
+    assert not report['improved'] and model.rules is rules
@@ -0,0 +1,112 @@
+"""Rolling window statistics: bucket boundaries, expiry, late records and a brute-force check"""
+import random
+
+import pytest
+
+from signal_history import SIGNAL_CODES, encode_context
+from window_stats import WINDOW_BUCKETS, WindowStats, parse_window
+
+# A start time on a bucket boundary of every window (a whole number of days)
+T0 = 1_718_064_000.0
+CALM = encode_context('BULLISH_TREND', 'LOW_VOLATILITY')
+VOLATILE = encode_context('HIGH_VOLATILITY', 'HIGH_VOLATILITY')
+
+
+def predictions(stats, spec, now):
+    return stats.report(spec, now)['predictions']
+
+
+def test_parse_window():
+    assert [parse_window(spec) for spec in ('90s', '5m', ' 1h', '1d')] == [90, 300, 3600, 86400]
+    for spec in ('', '5', 'm', '0m', '-5m', '1.5h', '5w', '5 m'):
+        with pytest.raises(ValueError):
+            parse_window(spec)
+
+
+@pytest.mark.parametrize('spec, bucket_seconds', [('5m', 1), ('1h', 12), ('1d', 288)])
+def test_a_prediction_leaves_the_window_with_its_bucket(spec, bucket_seconds):
+    stats = WindowStats((spec,))
+    seconds = WINDOW_BUCKETS * bucket_seconds
+    stats.record_prediction(SIGNAL_CODES['BUY_CE'], 0.8, CALM, T0)
+    assert predictions(stats, spec, T0) == 1
+    assert predictions(stats, spec, T0 + seconds - 0.001) == 1
+    assert predictions(stats, spec, T0 + seconds) == 0
+
+    # Late in its bucket, a prediction expires with the bucket's start, not a full window after it
+    stats.record_prediction(SIGNAL_CODES['BUY_CE'], 0.8, CALM, T0 + seconds + bucket_seconds - 0.5)
+    assert predictions(stats, spec, T0 + 2 * seconds - 0.001) == 1
+    assert predictions(stats, spec, T0 + 2 * seconds) == 0
+
+
+def test_the_current_second_is_counted_before_it_ends():
+    stats = WindowStats(('5m',))
+    stats.record_prediction(SIGNAL_CODES['BUY_PE'], 0.6, CALM, T0 + 0.1)
+    stats.record_prediction(SIGNAL_CODES['HOLD'], 0.4, VOLATILE, T0 + 0.9)
+    report = stats.report('5m', T0 + 0.95)
+    assert report['predictions'] == 2 and report['signals'] == {'HOLD': 1, 'BUY_CE': 0, 'BUY_PE': 1}
+    assert report['avg_confidence'] == 0.5 and report['vix_blocked'] == 1 and report['vix_blocked_rate'] == 0.5
+    assert report['regimes'] == {'BULLISH_TREND': {'predictions': 1, 'avg_confidence': 0.6},
+                                 'HIGH_VOLATILITY': {'predictions': 1, 'avg_confidence': 0.4}}
+
+
+def test_a_late_record_counts_in_the_newest_second():
+    stats = WindowStats(('5m',))
+    stats.record_prediction(SIGNAL_CODES['HOLD'], 0.5, CALM, T0 + 100)
+    stats.record_outcome(True, 10.0, T0 + 50)  # feedback whose clock is behind
+    assert stats.report('5m', T0 + 399)['outcomes'] == 1
+    assert stats.report('5m', T0 + 400)['outcomes'] == 0
+
+
+def test_a_gap_longer_than_the_window_empties_it():
+    stats = WindowStats(('5m', '1h'))
+    for second in range(10):
+        stats.record_prediction(SIGNAL_CODES['BUY_CE'], 0.7, CALM, T0 + second)
+    stats.record_prediction(SIGNAL_CODES['BUY_CE'], 0.7, CALM, T0 + 1000)
+    assert predictions(stats, '5m', T0 + 1000) == 1
+    assert predictions(stats, '1h', T0 + 1000) == 11
+    assert predictions(stats, '1h', T0 + 10 * 3600) == 0
+
+
+def test_outcomes_hit_rate_and_pnl():
+    stats = WindowStats(('5m',))
+    assert stats.report('5m', T0)['total_pnl'] is None
+    stats.record_outcome(True, 12.5, T0)
+    stats.record_outcome(False, float('nan'), T0 + 1)
+    stats.record_outcome(True, -2.25, T0 + 2)
+    report = stats.report('5m', T0 + 2)
+    assert (report['outcomes'], report['correct'], report['hit_rate'], report['total_pnl']) == (3, 2, 0.667, 10.25)
+
+
+def test_counts_match_a_brute_force_count():
+    rng = random.Random(1)
+    stats = WindowStats(('5m', '1h', '1d'))
+    records, now = [], T0
+    for _ in range(3000):
+        now += rng.expovariate(1 / 90)
+        if rng.random() < 0.8:
+            correct, pnl = rng.random() < 0.5, round(rng.uniform(-50, 50), 2)
+            records.append((now, correct, pnl))
+            stats.record_outcome(correct, pnl, now)
+            continue
+        for spec in ('5m', '1h', '1d'):
+            window = stats.windows[spec]
+            oldest = int(now // window.bucket_seconds) - WINDOW_BUCKETS + 1
+            held = [record for record in records if int(record[0] // window.bucket_seconds) >= oldest]
+            report = stats.report(spec, now)
+            assert report['outcomes'] == len(held)
+            assert report['correct'] == sum(correct for _, correct, _ in held)
+            assert report['total_pnl'] == (round(sum(pnl for _, _, pnl in held), 2) if held else None)
+
+
+def test_state_round_trip():
+    stats = WindowStats(('5m', '1h'))
+    for second in range(0, 600, 7):
+        stats.record_prediction(SIGNAL_CODES['BUY_CE'], 0.75, CALM, T0 + second)
+        stats.record_outcome(second % 2 == 0, 1.5, T0 + second)
+    stats.report('5m', T0 + 600)  # folds the pending second, which every window would take
+    state, rings = stats.state()
+    restored = WindowStats(('5m', '1h', '1d'))
+    restored.load_state(state, rings)
+    for spec in ('5m', '1h'):
+        assert restored.report(spec, T0 + 700) == stats.report(spec, T0 + 700)
+    assert predictions(restored, '1d', T0 + 700) == 0  # not in the snapshot: starts empty
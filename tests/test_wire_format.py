@@ -0,0 +1,103 @@
+"""Binary snapshots: the same results as the JSON payloads, on the Flask and ASGI apps"""
+import asyncio
+import copy
+import json
+import logging
+import random
+
+import pytest
+
+import ai_model_api_fixed as api
+import ai_model_asgi
+import wire_format
+from benchmark_predict_batch import make_snapshot
+from signal_history import SignalHistory
+
+logging.disable(logging.INFO)
+
+WIRE_HEADERS = {'Content-Type': wire_format.CONTENT_TYPE}
+
+
+@pytest.fixture(autouse=True)
+def fresh_model(monkeypatch):
+    monkeypatch.setitem(api.trading_ai.model_data, 'signals', SignalHistory(1000))
+    monkeypatch.setattr(api.trading_ai, 'response_cache', None)
+
+
+def payloads(count, seed):
+    """Snapshots with and without writers data, some with the confidence as a string"""
+    rng = random.Random(seed)
+    snapshots = []
+    for i in range(count):
+        snapshot = make_snapshot(rng)
+        if i % 5 == 1:
+            snapshot['confidence'] = str(snapshot['confidence'])
+        elif i % 5 == 2:
+            del snapshot['writersZone']
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def comparable(result):
+    """A result without its per-call fields, and writers_confidence as a number (the documented difference)"""
+    result = {key: value for key, value in result.items() if key not in ('timestamp', 'prediction_id')}
+    result['analysis'] = dict(result['analysis'], writers_confidence=float(result['analysis']['writers_confidence']))
+    return result
+
+
+def test_binary_and_json_batches_give_the_same_results():
+    snapshots = payloads(300, seed=1)
+    client = api.app.test_client()
+    from_json = client.post('/predict_batch', json=copy.deepcopy(snapshots)).get_json()['results']
+    from_binary = client.post('/predict_batch', data=wire_format.encode(snapshots), headers=WIRE_HEADERS)
+    assert from_binary.status_code == 200
+    from_binary = from_binary.get_json()['results']
+    assert [comparable(result) for result in from_binary] == [comparable(result) for result in from_json]
+    assert all(isinstance(result['analysis']['writers_confidence'], (int, float)) for result in from_binary)
+    assert from_json[1]['analysis']['writers_confidence'] == snapshots[1]['confidence']  # echoed as sent
+
+
+def test_binary_and_json_predict_give_the_same_result():
+    client = api.app.test_client()
+    for snapshot in payloads(10, seed=2):
+        from_json = client.post('/predict', json=snapshot).get_json()
+        from_binary = client.post('/predict', data=wire_format.encode([snapshot]), headers=WIRE_HEADERS).get_json()
+        assert comparable(from_binary) == comparable(from_json)
+
+
+def test_malformed_binary_bodies_are_rejected():
+    client = api.app.test_client()
+    body = wire_format.encode(payloads(2, seed=3))
+    for path, data in (('/predict', body), ('/predict', body[:-1]), ('/predict_batch', b'NTW0' + body[4:]),
+                       ('/predict_batch', body[:wire_format.HEADER.size])):
+        response = client.post(path, data=data, headers=WIRE_HEADERS)
+        assert response.status_code == 400 and 'error' in response.get_json()
+
+
+def post_asgi(path, raw, content_type):
+    """(status, body) of one POST through the ASGI app"""
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': raw, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+    scope = {'type': 'http', 'method': 'POST', 'path': path, 'query_string': b'',
+             'headers': [(b'content-type', content_type.encode())]}
+    asyncio.run(ai_model_asgi.app(scope, receive, send))
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+
+def test_the_asgi_app_serves_both_encodings_on_both_routes():
+    snapshots = payloads(50, seed=4)
+    status, from_json = post_asgi('/predict_batch', json.dumps(snapshots).encode(), 'application/json')
+    assert status == 200 and from_json['count'] == 50
+    status, from_binary = post_asgi('/predict_batch', wire_format.encode(snapshots), wire_format.CONTENT_TYPE)
+    assert status == 200
+    assert [comparable(result) for result in from_binary['results']] == \
+        [comparable(result) for result in from_json['results']]
+
+    status, single = post_asgi('/predict', wire_format.encode(snapshots[:1]), wire_format.CONTENT_TYPE)
+    assert status == 200 and comparable(single) == comparable(from_json['results'][0])
+    assert post_asgi('/predict_batch', b'[]', 'application/json')[0] == 400
@@ -0,0 +1,315 @@
+"""Capture /predict traffic and replay it against a local instance
+
+Capture: with TRAFFIC_CAPTURE_PATH set, every /predict request is appended
+to that file as one JSON line: its arrival time, query string, content type
+and body, with the status, signal and confidence the server answered. Every
+worker appends whole lines with O_APPEND writes, like the prediction log.
+Capture costs a few microseconds and about 1 KB of disk per request, so
+turn it on for the period you want to reproduce. A server started with
+SIGNAL_HISTORY_RAW=1 can also export its signal history as a capture
+(`export`). Those lines carry prediction times instead of arrival times.
+
+Replay sends the captured requests to a server and checks every response
+against the recorded one:
+- open model (default): each request is released at its recorded arrival
+  time divided by --speed (1, 10, ... or max for all at once) and sent on
+  the next free one of --connections keep-alive connections. Latency is
+  measured from the release time, so time spent waiting for a connection
+  counts, as it would for a real client.
+- closed model: --connections clients send the requests back to back in
+  recorded order. Arrival times are ignored and latency runs from the send.
+Without --url the requests go through the Flask test client in this
+process, one at a time. The report has throughput, latency percentiles and
+every response whose status, signal or confidence differs from the
+recording. With --gate the exit status is 1 if any does, so a capture
+doubles as a correctness check for changes to ProfessionalTradingAI.
+
+Usage:
+    python traffic_replay.py replay capture.ndjson [--url http://127.0.0.1:5000] [--speed 1|10|max]
+                                                   [--model open|closed] [--connections 64]
+                                                   [--tolerance 0] [--limit N] [--gate] [--json]
+    python traffic_replay.py export --url http://host:port --output capture.ndjson [--model-name NAME]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+import json_codec
+
+
+class TrafficRecorder:
+    """Appends one JSON line per /predict request to a capture file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def close(self):
+        os.close(self.fd)
+
+    def record(self, arrival, query_string, content_type, body, status, response):
+        """Append one request (body as bytes) and the response dict it got"""
+        line = {
+            'ts': arrival,
+            'query': query_string,
+            'content_type': content_type,
+            'status': status,
+            'signal': response.get('signal'),
+            'confidence': response.get('confidence'),
+        }
+        try:
+            line['body'] = body.decode('utf-8')
+        except UnicodeDecodeError:  # binary snapshots (see wire_format.py)
+            line['body_base64'] = base64.b64encode(body).decode('ascii')
+        os.write(self.fd, json_codec.dumps(line).rstrip(b'\n') + b'\n')
+
+
+def load_capture(path, limit=None):
+    """Captured requests in arrival order"""
+    entries = []
+    with open(path, 'rb') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json_codec.loads(line)
+            entry['line'] = number
+            if 'body_base64' in entry:
+                entry['body'] = base64.b64decode(entry.pop('body_base64'))
+            else:
+                entry['body'] = entry['body'].encode('utf-8')
+            entries.append(entry)
+    entries.sort(key=lambda entry: entry['ts'])
+    return entries[:limit]
+
+
+def compare(entry, status, body, tolerance):
+    """Ways the replayed response differs from the recorded one (empty if it matches)"""
+    differences = []
+    if status != entry.get('status', 200):
+        differences.append(('status', entry.get('status', 200), status))
+    try:
+        response = json_codec.loads(body)
+    except ValueError:
+        response = {}
+    if response.get('signal') != entry.get('signal'):
+        differences.append(('signal', entry.get('signal'), response.get('signal')))
+    recorded, replayed = entry.get('confidence'), response.get('confidence')
+    if recorded is None or replayed is None:
+        if recorded != replayed:
+            differences.append(('confidence', recorded, replayed))
+    elif abs(recorded - replayed) > tolerance:
+        differences.append(('confidence', recorded, replayed))
+    return differences
+
+
+def _request_bytes(host, entry):
+    target = '/predict' + (f"?{entry['query']}" if entry.get('query') else '')
+    head = (f"POST {target} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: {entry.get('content_type') or 'application/json'}\r\n"
+            f"Content-Length: {len(entry['body'])}\r\n\r\n").encode('latin-1')
+    return head + entry['body']
+
+
+async def _replay_http(entries, url, speed, model, connections):
+    """(latency seconds, status, body) per entry, sent over keep-alive connections"""
+    from load_test import raise_file_limit, read_response
+
+    raise_file_limit()
+    parsed = urllib.parse.urlsplit(url)
+    host, port = parsed.hostname, parsed.port or 80
+    requests = [_request_bytes(f"{host}:{port}", entry) for entry in entries]
+    outcomes = [None] * len(entries)
+    queue = asyncio.Queue()
+
+    async def connection():
+        reader = writer = None
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            index, released = item
+            sent = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                writer.write(requests[index])
+                status, keep_alive, body = await read_response(reader)
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                outcomes[index] = (time.perf_counter() - sent, 0, str(e).encode())
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                continue
+            start = sent if released is None else released
+            outcomes[index] = (time.perf_counter() - start, status, body)
+            if not keep_alive:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    workers = [asyncio.create_task(connection()) for _ in range(connections)]
+    if model == 'closed':
+        for index in range(len(entries)):
+            queue.put_nowait((index, None))
+    else:
+        first, started = entries[0]['ts'], time.perf_counter()
+        for index, entry in enumerate(entries):
+            release = started + (entry['ts'] - first) / speed if speed else started
+            delay = release - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            queue.put_nowait((index, release))
+    for _ in workers:
+        queue.put_nowait(None)
+    await asyncio.gather(*workers)
+    return outcomes
+
+
+def _replay_in_process(entries):
+    """(latency seconds, status, body) per entry, through the Flask test client"""
+    from ai_model_api_fixed import app
+
+    client = app.test_client()
+    outcomes = []
+    for entry in entries:
+        started = time.perf_counter()
+        response = client.post('/predict', query_string=entry.get('query') or None, data=entry['body'],
+                               content_type=entry.get('content_type') or 'application/json')
+        outcomes.append((time.perf_counter() - started, response.status_code, response.get_data()))
+    return outcomes
+
+
+def replay(entries, url=None, speed=1.0, model='open', connections=64, tolerance=0.0):
+    """Replay captured requests; returns the report"""
+    from load_test import percentile
+
+    started = time.perf_counter()
+    if url:
+        outcomes = asyncio.run(_replay_http(entries, url, speed, model, connections))
+    else:
+        outcomes = _replay_in_process(entries)
+    elapsed = time.perf_counter() - started
+
+    divergences, errors = [], 0
+    for entry, (_, status, body) in zip(entries, outcomes):
+        if status == 0:
+            errors += 1
+        differences = compare(entry, status, body, tolerance)
+        if differences:
+            divergences.append({'line': entry['line'], 'differences': differences})
+    latencies = sorted(outcome[0] for outcome in outcomes)
+    by_field = {field: sum(any(d[0] == field for d in item['differences']) for item in divergences)
+                for field in ('status', 'signal', 'confidence')}
+    if not url:
+        model, connections = 'closed', 1
+    return {
+        'target': url or 'in-process',
+        'model': model,
+        'speed': speed if model == 'open' and speed else 'max',
+        'connections': connections,
+        'requests': len(entries),
+        'connection_errors': errors,
+        'recorded_seconds': round(entries[-1]['ts'] - entries[0]['ts'], 3) if entries else 0.0,
+        'elapsed_seconds': round(elapsed, 3),
+        'rps': round(len(entries) / elapsed, 1) if elapsed > 0 else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3) if latencies else float('nan'),
+        'divergent': len(divergences),
+        'divergent_by_field': by_field,
+        'divergences': divergences,
+    }
+
+
+def export_history(url, output, model_name=None, page_size=1000):
+    """Write a capture from a server's signal history (needs SIGNAL_HISTORY_RAW=1); returns the line count"""
+    count, since = 0, -1  # -1: from the oldest row held
+    with open(output, 'w') as f:
+        while True:
+            params = {'raw': '1', 'limit': str(page_size), 'since': str(since),
+                      'fields': 'seq,timestamp,signal,confidence'}
+            if model_name:
+                params['model'] = model_name
+            with urllib.request.urlopen(f"{url.rstrip('/')}/get_stats?{urllib.parse.urlencode(params)}") as response:
+                page = json.load(response)
+            rows = page.get('recent_signals', [])
+            if not rows:
+                return count
+            for row in rows:
+                if 'technical_data' not in row:
+                    raise SystemExit("The history has no request payloads; start the server with SIGNAL_HISTORY_RAW=1")
+                f.write(json.dumps({
+                    'ts': datetime.fromisoformat(row['timestamp']).timestamp(),
+                    'query': urllib.parse.urlencode({'model': model_name}) if model_name else '',
+                    'content_type': 'application/json',
+                    'status': 200,
+                    'signal': row['signal'],
+                    'confidence': round(row['confidence'], 3),
+                    'body': json.dumps(row['technical_data'], separators=(',', ':')),
+                }) + '\n')
+                count += 1
+            since = page['next_since']
+
+
+def format_report(report):
+    lines = [
+        f"target {report['target']}  model {report['model']}  speed {report['speed']}  "
+        f"connections {report['connections']}",
+        f"requests {report['requests']}  recorded {report['recorded_seconds']}s  "
+        f"replayed {report['elapsed_seconds']}s  {report['rps']:,.1f} req/s",
+        f"latency ms  p50 {report['p50_ms']}  p90 {report['p90_ms']}  p99 {report['p99_ms']}  max {report['max_ms']}",
+        f"connection errors {report['connection_errors']}  divergent responses {report['divergent']} "
+        f"{report['divergent_by_field']}",
+    ]
+    for item in report['divergences'][:10]:
+        details = ', '.join(f"{field} {recorded!r} -> {replayed!r}" for field, recorded, replayed in item['differences'])
+        lines.append(f"  line {item['line']}: {details}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    replay_parser = commands.add_parser('replay', help="replay a capture and compare the responses")
+    replay_parser.add_argument('capture')
+    replay_parser.add_argument('--url', help="server to replay against (default: in-process Flask test client)")
+    replay_parser.add_argument('--speed', default='1', help="multiple of the recorded rate, or max")
+    replay_parser.add_argument('--model', choices=('open', 'closed'), default='open', help="concurrency model")
+    replay_parser.add_argument('--connections', type=int, default=64)
+    replay_parser.add_argument('--tolerance', type=float, default=0.0, help="allowed confidence difference")
+    replay_parser.add_argument('--limit', type=int, help="replay only the first N requests")
+    replay_parser.add_argument('--gate', action='store_true', help="exit with status 1 on any divergence")
+    replay_parser.add_argument('--json', action='store_true')
+
+    export_parser = commands.add_parser('export', help="write a capture from a server's signal history")
+    export_parser.add_argument('--url', required=True)
+    export_parser.add_argument('--output', required=True)
+    export_parser.add_argument('--model-name', help="export a registered model's history")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(f"wrote {export_history(args.url, args.output, args.model_name)} requests to {args.output}")
+        return
+
+    entries = load_capture(args.capture, args.limit)
+    if not entries:
+        raise SystemExit(f"{args.capture} has no requests")
+    speed = 0.0 if args.speed == 'max' else float(args.speed)
+    report = replay(entries, args.url, speed, args.model, args.connections, args.tolerance)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    if args.gate and (report['divergent'] or report['connection_errors']):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
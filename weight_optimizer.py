@@ -0,0 +1,305 @@
+"""Fit pattern_weights and decision thresholds to recorded outcomes
+
+The optimizer runs a shrinking random search around the current parameters.
+Each round perturbs the best parameters so far into a batch of candidates,
+scores the batch with the vectorized backtest in a process pool, and keeps
+the best. It stops early after `patience` rounds without improvement. The
+history is split in time: candidates are fitted on the first part, and the
+winner is only reported as an improvement if it also beats the starting
+parameters on the later, held-out part.
+
+Only the offline command uses the process pool. Its workers are forked, and
+forking is only safe from a single-threaded process. A web server's worker
+holds locks in other threads, so POST /optimize scores candidates serially
+in its own background thread instead.
+
+Offline, from a history file (see backtest.py for the format):
+    python weight_optimizer.py history.csv [--horizon 5] [--workers 8]
+                                           [--start params.json] [--output params.json]
+
+Online, POST /optimize fits the running model to its own raw signal history
+(SIGNAL_HISTORY_RAW=1), or to OPTIMIZER_HISTORY_PATH, and hot-swaps the
+winner in. From the signal history it fits the rows that have
+/update_accuracy feedback, on their recorded outcome and pnl; until there
+is feedback it falls back to later prices of the same symbol. If MODEL_PARAMETERS_PATH is set, it also writes the winner there
+so every worker reloads it. The request body may only set REQUEST_OPTIONS.
+"""
+import argparse
+import json
+import logging
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from backtest import Backtest, load_table, table_from_history
+from signal_rules import DECISION_THRESHOLDS, SIGNAL_POLARITY
+
+logger = logging.getLogger(__name__)
+
+OBJECTIVES = ('pnl', 'hit_rate')
+
+# Weights are searched in [-WEIGHT_LIMIT, WEIGHT_LIMIT]; thresholds within their bounds
+WEIGHT_LIMIT = 2.0
+THRESHOLD_BOUNDS = {
+    'strong_strength': (0.5, 6.0),
+    'strong_signal_count': (1, 10),
+    'moderate_strength': (0.25, 5.0),
+    'moderate_min_confidence': (0.5, 0.95),
+}
+
+# Options a POST /optimize body may set: (type, lowest, highest); values are clamped
+REQUEST_OPTIONS = {
+    'horizon': (int, 1, 100),
+    'min_trades': (int, 1, 100000),
+    'candidates': (int, 1, 256),
+    'max_rounds': (int, 1, 200),
+    'patience': (int, 1, 50),
+    'train_fraction': (float, 0.1, 0.95),
+    'seed': (int, 0, 2 ** 31 - 1),
+}
+
+# Backtest over the training rows, in pool workers only (see _init_worker)
+_TRAIN = None
+
+
+def _objective(overall, objective, min_trades):
+    """Score a backtest summary; too few trades scores -inf"""
+    if overall['trades'] < min_trades:
+        return -math.inf
+    return overall[objective]
+
+
+def _score(train, job):
+    """Score one (pattern_weights, decision_thresholds, objective, min_trades) candidate"""
+    pattern_weights, decision_thresholds, objective, min_trades = job
+    return _objective(train.run(pattern_weights, decision_thresholds)['overall'], objective, min_trades)
+
+
+def _init_worker(train):
+    global _TRAIN
+    _TRAIN = train
+
+
+def _evaluate(job):
+    """Pool task: score one candidate on the training rows the worker was started with"""
+    return _score(_TRAIN, job)
+
+
+def request_options(body):
+    """(horizon, optimize() options) from a POST /optimize body; ValueError if it is invalid
+
+    Numbers outside REQUEST_OPTIONS are clamped to the nearest bound.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("The request body must be a JSON object")
+    unknown = sorted(set(body) - set(REQUEST_OPTIONS) - {'objective', 'model'})
+    if unknown:
+        raise ValueError(f"Unknown options: {', '.join(unknown)} "
+                         f"(expected {', '.join(sorted(set(REQUEST_OPTIONS) | {'objective', 'model'}))})")
+    options = {}
+    for name, (kind, low, high) in REQUEST_OPTIONS.items():
+        if name not in body:
+            continue
+        value = body[name]
+        try:
+            number = math.nan if isinstance(value, bool) else float(value)
+        except (TypeError, ValueError):
+            number = math.nan
+        if not math.isfinite(number) or (kind is int and not number.is_integer()):
+            raise ValueError(f"{name} must be {'an integer' if kind is int else 'a number'}, got {value!r}")
+        options[name] = kind(min(max(number, low), high))
+    if not isinstance(body.get('model') or '', str):
+        raise ValueError("model must be the name of a registered model")
+    if 'objective' in body:
+        if body['objective'] not in OBJECTIVES:
+            raise ValueError(f"Unknown objective: {body['objective']} (expected one of {OBJECTIVES})")
+        options['objective'] = body['objective']
+    return options.pop('horizon', 1), options
+
+
+def _perturb(pattern_weights, decision_thresholds, step, rng, fraction=0.25):
+    """Random neighbour of a parameter set: each value moves with probability `fraction`"""
+    weights = dict(pattern_weights)
+    for key, value in weights.items():
+        if rng.random() < fraction:
+            weights[key] = round(min(max(value + rng.gauss(0, step), -WEIGHT_LIMIT), WEIGHT_LIMIT), 4)
+
+    thresholds = dict(decision_thresholds)
+    for key, (low, high) in THRESHOLD_BOUNDS.items():
+        if rng.random() < fraction:
+            value = thresholds[key] + rng.gauss(0, step * (high - low) / 4)
+            value = min(max(value, low), high)
+            thresholds[key] = int(round(value)) if key == 'strong_signal_count' else round(value, 4)
+    return weights, thresholds
+
+
+def _json_safe(value):
+    """Replace -inf scores (too few trades) with None so reports are valid JSON"""
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, float) and math.isinf(value):
+        return None
+    return value
+
+
+def _split(table, train_fraction):
+    """Split a column table in time order into (train, holdout); holdout is None if empty"""
+    rows = len(next(iter(table.values())))
+    cut = int(rows * train_fraction)
+    if cut >= rows:
+        return table, None
+    return {k: v[:cut] for k, v in table.items()}, {k: v[cut:] for k, v in table.items()}
+
+
+def optimize(table, horizon=1, polarity=SIGNAL_POLARITY, pattern_weights=None, decision_thresholds=None,
+             objective='pnl', min_trades=20, candidates=None, max_rounds=50, patience=5, step=0.25,
+             min_step=0.01, train_fraction=0.7, workers=1, seed=0):
+    """Search for weights and thresholds that maximise the objective on a history table
+
+    pattern_weights / decision_thresholds are the starting point (default: the
+    model defaults). Returns a report with the best parameters, the train and
+    holdout scores before and after, and whether the result is an improvement.
+    workers > 1 forks a process pool, so only pass it from a single-threaded
+    process such as the command line.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective: {objective} (expected one of {OBJECTIVES})")
+    start = time.perf_counter()
+    candidates = candidates or max(4 * workers, 16)
+    rng = random.Random(seed)
+
+    train_table, holdout_table = _split(table, train_fraction)
+    train = Backtest(train_table, horizon, polarity)
+    holdout = Backtest(holdout_table, horizon, polarity) if holdout_table is not None else None
+    best = (
+        dict(train.base_weights, **(pattern_weights or {})),
+        dict(DECISION_THRESHOLDS, **(decision_thresholds or {}))
+    )
+    baseline_score = best_score = _score(train, best + (objective, min_trades))
+
+    pool = None
+    if workers > 1:
+        # Forked workers inherit the encoded training rows instead of re-reading them
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'),
+                                   initializer=_init_worker, initargs=(train,))
+    rounds = evaluations = stale = 0
+    try:
+        while rounds < max_rounds and stale < patience and step >= min_step:
+            rounds += 1
+            batch = [_perturb(*best, step, rng) for _ in range(candidates)]
+            jobs = [candidate + (objective, min_trades) for candidate in batch]
+            scores = list(pool.map(_evaluate, jobs, chunksize=max(1, len(jobs) // (4 * workers)))) if pool \
+                else [_score(train, job) for job in jobs]
+            evaluations += len(jobs)
+
+            round_best = max(range(len(batch)), key=scores.__getitem__)
+            if scores[round_best] > best_score:
+                best, best_score, stale = batch[round_best], scores[round_best], 0
+            else:
+                stale += 1
+                step /= 2
+            logger.info(f"Optimizer round {rounds}: best {objective} {best_score} (step {step:g})")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    report = {
+        'objective': objective,
+        'pattern_weights': best[0],
+        'decision_thresholds': best[1],
+        'train': {'baseline': baseline_score, 'best': best_score},
+        'rounds': rounds,
+        'evaluations': evaluations,
+        'stopped_early': rounds < max_rounds,
+        'elapsed_seconds': round(time.perf_counter() - start, 2),
+    }
+    improved = best_score > baseline_score
+    if holdout is not None:
+        baseline_holdout = _objective(
+            holdout.run(pattern_weights, decision_thresholds)['overall'], objective, min_trades
+        )
+        best_holdout = _objective(holdout.run(*best)['overall'], objective, min_trades)
+        report['holdout'] = {'baseline': baseline_holdout, 'best': best_holdout}
+        improved = improved and best_holdout > baseline_holdout
+    report['improved'] = improved
+    return _json_safe(report)
+
+
+def optimize_model(model, horizon=1, table=None, parameters_path=None, **options):
+    """Fit a live model's parameters and hot-swap them in if they improve on the current ones
+
+    Without a table, the model's own raw signal history is the training data
+    (see backtest.table_from_history). The candidates are scored in the
+    calling thread, without a process pool.
+    The winner is also written to parameters_path, if given, so other workers
+    pick it up.
+    """
+    if table is None:
+        history = model.model_data['signals']
+        if not history.store_raw:
+            raise ValueError("Optimizing from the signal history needs SIGNAL_HISTORY_RAW=1")
+        table = table_from_history(history)
+        if not len(table['ltp']):
+            raise ValueError("The signal history has no recorded payloads yet")
+
+    rules = model.rules
+    report = optimize(
+        table, horizon, model.polarity, rules.pattern_weights, rules.decision_thresholds, **options
+    )
+    if report['improved']:
+        model.update_parameters(report['pattern_weights'], report['decision_thresholds'])
+        logger.info(f"Optimized parameters swapped in: holdout {report.get('holdout')}")
+        if parameters_path:
+            model.save_parameters(parameters_path, objective=report['objective'], holdout=report.get('holdout'))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit pattern_weights and decision thresholds to a history file")
+    parser.add_argument('path', help="CSV or Parquet history (see backtest.py)")
+    parser.add_argument('--horizon', type=int, default=1)
+    parser.add_argument('--polarity', default=SIGNAL_POLARITY)
+    parser.add_argument('--objective', choices=OBJECTIVES, default='pnl')
+    parser.add_argument('--min-trades', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=None, help="pool size (default: all cores)")
+    parser.add_argument('--candidates', type=int, default=None,
+                        help="candidates per round (default: 4 per worker, at least 16)")
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--patience', type=int, default=5)
+    parser.add_argument('--train-fraction', type=float, default=0.7)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', help="parameters JSON to start from (default: model defaults)")
+    parser.add_argument('--output', help="write the winning parameters here (MODEL_PARAMETERS_PATH format)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    start = {}
+    if args.start:
+        with open(args.start) as f:
+            start = json.load(f)
+    report = optimize(
+        load_table(args.path), args.horizon, args.polarity,
+        start.get('pattern_weights'), start.get('decision_thresholds'),
+        objective=args.objective, min_trades=args.min_trades, candidates=args.candidates,
+        max_rounds=args.rounds, patience=args.patience, train_fraction=args.train_fraction,
+        workers=args.workers or os.cpu_count() or 1, seed=args.seed
+    )
+    print(json.dumps(report, indent=2))
+
+    if args.output and report['improved']:
+        document = {key: report[key] for key in ('objective', 'pattern_weights', 'decision_thresholds')}
+        document['holdout'] = report.get('holdout')
+        tmp_path = f"{args.output}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(document, f, indent=2)
+        os.replace(tmp_path, args.output)
+        print(f"wrote {args.output}")
+    elif args.output:
+        print("no improvement on the holdout; parameters not written")
+
+
+if __name__ == '__main__':
+    main()
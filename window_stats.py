@@ -0,0 +1,199 @@
+"""Rolling statistics over time windows, kept incrementally as predictions arrive
+
+Each window (say 5m, 1h and 1d) is a ring of WINDOW_BUCKETS time buckets
+plus running totals over the ring. A prediction or outcome adds a few
+integer counters to a pending one-second bucket. When the second changes,
+the pending bucket is folded into every window's current bucket and its
+totals. Buckets that slide out of a window are subtracted from its totals
+as time moves on. Recording is O(1). A query is O(1) in the number of
+predictions: it folds the pending second, expires old buckets and reads
+the totals. The counters are integers (confidence and P&L in millionths),
+so subtracting expired buckets never drifts, however long the process runs.
+
+A window covers its last WINDOW_BUCKETS buckets, the current one included,
+so its start is exact to one bucket: 1 s for 5m, 12 s for 1h and 288 s for 1d.
+"""
+from array import array
+from itertools import chain
+
+from signal_history import (
+    REGIME_LABELS, SIGNAL_CODES, SIGNAL_LABELS, VIX_CONDITION_CODES, VIX_CONDITION_LABELS
+)
+
+WINDOW_BUCKETS = 300
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+MICRO = 1000000
+
+# Counter slots of a bucket
+PREDICTIONS, CONFIDENCE, VIX_BLOCKED, OUTCOMES, CORRECT, PNL_COUNT, PNL = range(7)
+SIGNAL_BASE = 7
+REGIME_BASE = SIGNAL_BASE + len(SIGNAL_CODES)
+REGIME_CONFIDENCE_BASE = REGIME_BASE + len(REGIME_LABELS)
+VIX_BASE = REGIME_CONFIDENCE_BASE + len(REGIME_LABELS)
+SLOT_COUNT = VIX_BASE + len(VIX_CONDITION_LABELS)
+
+# Signal codes are -1..1; slot offsets must not be negative
+SIGNAL_OFFSETS = {code: i for i, code in enumerate(sorted(SIGNAL_LABELS))}
+
+# VIX conditions in which make_professional_decision's VIX filter forces HOLD (VIX > 18)
+BLOCKING_VIX_CODES = frozenset((VIX_CONDITION_CODES['HIGH_VOLATILITY'], VIX_CONDITION_CODES['EXTREME_VOLATILITY']))
+
+
+def parse_window(spec):
+    """Seconds in a window spec such as '90s', '5m', '1h' or '1d'"""
+    spec = spec.strip()
+    if len(spec) < 2 or spec[-1] not in UNITS or not spec[:-1].isdigit() or int(spec[:-1]) == 0:
+        raise ValueError(f"Invalid window: {spec!r} (expected a positive number with s, m, h or d)")
+    return int(spec[:-1]) * UNITS[spec[-1]]
+
+
+class RollingWindow:
+    """Bucket ring and running totals for one window length"""
+
+    def __init__(self, seconds, buckets=WINDOW_BUCKETS):
+        self.seconds = seconds
+        self.buckets = buckets
+        self.bucket_seconds = seconds / buckets
+        self.ring = [[0] * SLOT_COUNT for _ in range(buckets)]
+        self.totals = [0] * SLOT_COUNT
+        self.current = None  # absolute number of the newest bucket
+
+    def advance(self, bucket):
+        """Make `bucket` the newest, subtracting the buckets that leave the window"""
+        if self.current is not None and bucket <= self.current:
+            return
+        if self.current is None or bucket - self.current >= self.buckets:
+            for counts in self.ring:
+                counts[:] = [0] * SLOT_COUNT
+            self.totals = [0] * SLOT_COUNT
+        else:
+            totals = self.totals
+            for expired in range(self.current + 1, bucket + 1):
+                counts = self.ring[expired % self.buckets]
+                for i, value in enumerate(counts):
+                    if value:
+                        totals[i] -= value
+                        counts[i] = 0
+        self.current = bucket
+
+    def add(self, second, counts):
+        """Add a one-second bucket of counters"""
+        bucket = int(second // self.bucket_seconds)
+        self.advance(bucket)
+        if self.current - bucket >= self.buckets:
+            return  # older than the whole window
+        target = self.ring[bucket % self.buckets]
+        totals = self.totals
+        for i, value in enumerate(counts):
+            if value:
+                target[i] += value
+                totals[i] += value
+
+
+class WindowStats:
+    """Rolling counters over several windows, fed by predictions and outcomes"""
+
+    def __init__(self, windows=('5m', '1h', '1d')):
+        self.windows = {spec: RollingWindow(parse_window(spec)) for spec in windows}
+        self.pending = [0] * SLOT_COUNT
+        self.pending_second = None
+
+    def _fold(self):
+        """Move the pending second into every window"""
+        if self.pending_second is not None:
+            for window in self.windows.values():
+                window.add(self.pending_second, self.pending)
+        self.pending = [0] * SLOT_COUNT
+
+    def _counts(self, timestamp):
+        second = int(timestamp)
+        if second != self.pending_second:
+            if self.pending_second is None or second > self.pending_second:
+                self._fold()
+                self.pending_second = second
+        return self.pending  # a late record counts in the pending second
+
+    def record_prediction(self, signal_code, confidence, context, timestamp):
+        """Count one prediction (context packs regime and VIX condition, see signal_history)"""
+        counts = self._counts(timestamp)
+        micro_confidence = int(round(confidence * MICRO))
+        regime, vix_code = context & 15, context >> 4
+        counts[PREDICTIONS] += 1
+        counts[CONFIDENCE] += micro_confidence
+        counts[SIGNAL_BASE + SIGNAL_OFFSETS.get(signal_code, SIGNAL_OFFSETS[0])] += 1
+        if regime < len(REGIME_LABELS):
+            counts[REGIME_BASE + regime] += 1
+            counts[REGIME_CONFIDENCE_BASE + regime] += micro_confidence
+        if vix_code < len(VIX_CONDITION_LABELS):
+            counts[VIX_BASE + vix_code] += 1
+            if vix_code in BLOCKING_VIX_CODES:
+                counts[VIX_BLOCKED] += 1
+
+    def record_outcome(self, correct, pnl, timestamp):
+        """Count one piece of trade feedback at the time it arrived (pnl NaN: not reported)"""
+        counts = self._counts(timestamp)
+        counts[OUTCOMES] += 1
+        counts[CORRECT] += bool(correct)
+        if pnl == pnl:
+            counts[PNL_COUNT] += 1
+            counts[PNL] += int(round(pnl * MICRO))
+
+    def state(self):
+        """(JSON-serialisable state, {window: bucket ring as int64 bytes}) (see warm_start.py)"""
+        state = {
+            'current': {spec: window.current for spec, window in self.windows.items()},
+            'pending': list(self.pending),
+            'pending_second': self.pending_second,
+        }
+        return state, {spec: array('q', chain.from_iterable(window.ring)).tobytes()
+                       for spec, window in self.windows.items()}
+
+    def load_state(self, state, rings):
+        """Restore a state(); windows it does not cover start empty"""
+        for spec, window in self.windows.items():
+            current = state['current'].get(spec)
+            if current is None or spec not in rings:
+                continue
+            counts = array('q')
+            counts.frombytes(rings[spec])
+            if len(counts) != window.buckets * SLOT_COUNT:
+                continue
+            window.ring = [counts[i:i + SLOT_COUNT].tolist() for i in range(0, len(counts), SLOT_COUNT)]
+            window.totals = [sum(column) for column in zip(*window.ring)]
+            window.current = current
+        self.pending = list(state['pending'])
+        self.pending_second = state['pending_second']
+
+    def report(self, spec, now):
+        """Statistics of one window ending at `now` (seconds since the epoch)"""
+        window = self.windows[spec]
+        self._fold()
+        self.pending_second = max(self.pending_second or 0, int(now))
+        window.advance(int(now // window.bucket_seconds))
+        totals = window.totals
+        predictions = totals[PREDICTIONS]
+        regimes = {}
+        for code, label in enumerate(REGIME_LABELS):
+            count = totals[REGIME_BASE + code]
+            if count:
+                regimes[label] = {
+                    'predictions': count,
+                    'avg_confidence': round(totals[REGIME_CONFIDENCE_BASE + code] / count / MICRO, 3),
+                }
+        return {
+            'window': spec,
+            'seconds': window.seconds,
+            'resolution_seconds': window.bucket_seconds,
+            'predictions': predictions,
+            'signals': {SIGNAL_LABELS[code]: totals[SIGNAL_BASE + offset] for code, offset in SIGNAL_OFFSETS.items()},
+            'avg_confidence': round(totals[CONFIDENCE] / predictions / MICRO, 3) if predictions else 0.0,
+            'regimes': regimes,
+            'vix_conditions': {label: totals[VIX_BASE + code]
+                               for code, label in enumerate(VIX_CONDITION_LABELS) if totals[VIX_BASE + code]},
+            'vix_blocked': totals[VIX_BLOCKED],
+            'vix_blocked_rate': round(totals[VIX_BLOCKED] / predictions, 3) if predictions else 0.0,
+            'outcomes': totals[OUTCOMES],
+            'correct': totals[CORRECT],
+            'hit_rate': round(totals[CORRECT] / totals[OUTCOMES], 3) if totals[OUTCOMES] else 0.0,
+            'total_pnl': round(totals[PNL] / MICRO, 2) if totals[PNL_COUNT] else None,
+        }
@@ -0,0 +1,214 @@
+"""Fixed-layout binary request encoding for high-frequency /predict clients
+
+A JSON snapshot is mostly repeated keys and status strings, and the rule
+engine reduces it to the few dozen inputs declared in signal_rules.py. A
+binary body carries exactly those inputs: one packed little-endian record
+per snapshot, with floats as float64 and status strings as one-byte codes.
+A record is 125 bytes, against about 900 for the JSON payload.
+
+Body: an 8-byte header (magic b'NTW1' and the layout fingerprint as uint32)
+followed by any number of records. Send it with
+Content-Type: application/x-ntai-snapshot to /predict (one record) or
+/predict_batch (any number); responses are JSON as usual. The server views
+the records in place with numpy.frombuffer.
+
+The layout follows the rule inputs in table order (see `python wire_format.py
+--schema`). The status codes of an input are the values the rules test for,
+numbered from 1 in table order, then the input's default when the rules do
+not test for it; 0 means any other value. The fingerprint changes whenever
+the rule table, and with it the layout, does, and the server rejects records
+with a different fingerprint. Results are the same as for the JSON payload,
+except that a writers zone outside the code table is reported as '' and
+writers_confidence always comes back as a number. Python clients can use
+encode() to build bodies from the usual payloads:
+
+    body = wire_format.encode([snapshot, ...])
+    requests.post(url + '/predict_batch', data=body, headers={'Content-Type': wire_format.CONTENT_TYPE})
+"""
+import argparse
+import json
+import struct
+import zlib
+
+from signal_rules import (
+    CONTEXT_INPUTS, COUNT, FLOAT, STATUS, STATUS_CODES, TECHNICAL_INPUTS, WRITERS_INPUTS, _read_inputs,
+    _status_lookup
+)
+
+try:
+    import numpy as np
+except ImportError:  # Decoding needs NumPy; the JSON API does not
+    np = None
+
+CONTENT_TYPE = 'application/x-ntai-snapshot'
+MAGIC = b'NTW1'
+HEADER = struct.Struct('<4sI')
+
+TECHNICAL_SPECS = CONTEXT_INPUTS + TECHNICAL_INPUTS
+KIND_FORMATS = {FLOAT: 'd', STATUS: 'B', COUNT: 'H'}
+
+# Wire vocabulary per status input: index = code, '' = any other value
+STATUS_VALUES = {}
+for _name, _, _, _default, _kind in TECHNICAL_SPECS + WRITERS_INPUTS:
+    if _kind == STATUS:
+        _rule_codes = STATUS_CODES.get(_name, {})
+        _values = [''] + sorted(_rule_codes, key=_rule_codes.get)
+        if _default not in _rule_codes:
+            _values.append(_default)
+        STATUS_VALUES[_name] = tuple(_values)
+WIRE_CODES = {
+    name: {value: code for code, value in enumerate(values) if code} for name, values in STATUS_VALUES.items()
+}
+
+# (name, struct format) per field, and the packed record
+FIELDS = (
+    [(spec[0], KIND_FORMATS[spec[4]]) for spec in TECHNICAL_SPECS]
+    + [('has_writers', 'B')]
+    + [(spec[0], KIND_FORMATS[spec[4]]) for spec in WRITERS_INPUTS]
+)
+RECORD = struct.Struct('<' + ''.join(fmt for _, fmt in FIELDS))
+FINGERPRINT = zlib.crc32(json.dumps([FIELDS, STATUS_VALUES], sort_keys=True).encode())
+
+if np is not None:
+    DTYPE = np.dtype([(name, '<' + fmt.replace('d', 'f8').replace('B', 'u1').replace('H', 'u2'))
+                      for name, fmt in FIELDS])
+    assert DTYPE.itemsize == RECORD.size
+    # Wire code -> rule code (codes the rules do not test for map to 0)
+    RULE_CODES = {}
+    for _name, _values in STATUS_VALUES.items():
+        _lookup = np.zeros(256, dtype=np.float64)
+        for _code, _value in enumerate(_values):
+            _lookup[_code] = STATUS_CODES.get(_name, {}).get(_value, 0)
+        RULE_CODES[_name] = _lookup
+
+
+def _split(payload):
+    """(technical_data, writers_data) exactly as professional_signal_generation reads a payload"""
+    technical_data = payload[0] if isinstance(payload, list) and payload else payload
+    writers_data = technical_data if 'writersZone' in technical_data else {}
+    return technical_data, writers_data
+
+
+def _codes(values, specs):
+    for k, spec in enumerate(specs):
+        if spec[4] == STATUS:
+            values[k] = _status_lookup(WIRE_CODES[spec[0]], values[k], 0)
+    return values
+
+
+def encode(payloads):
+    """Binary body for a list of JSON payloads (raises on the inputs /predict would reject)"""
+    parts = [HEADER.pack(MAGIC, FINGERPRINT)]
+    for payload in payloads:
+        technical_data, writers_data = _split(payload)
+        has_writers = bool(writers_data) and 'writersZone' in writers_data
+        values = _codes(_read_inputs(technical_data, TECHNICAL_SPECS), TECHNICAL_SPECS)
+        values.append(has_writers)
+        if has_writers:
+            values += _codes(_read_inputs(writers_data, WRITERS_INPUTS), WRITERS_INPUTS)
+        else:
+            values += [0] * len(WRITERS_INPUTS)
+        parts.append(RECORD.pack(*values))
+    return b''.join(parts)
+
+
+def decode(body):
+    """The records of a binary body as a read-only NumPy view of it (ValueError if malformed)"""
+    if np is None:
+        raise RuntimeError("Decoding binary snapshots requires numpy")
+    if len(body) < HEADER.size:
+        raise ValueError("Binary body is shorter than its header")
+    magic, fingerprint = HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError("Binary body does not start with the NTW1 magic")
+    if fingerprint != FINGERPRINT:
+        raise ValueError(f"Record layout {fingerprint:08x} does not match the server's {FINGERPRINT:08x}")
+    if (len(body) - HEADER.size) % RECORD.size:
+        raise ValueError(f"Binary body is not a whole number of {RECORD.size}-byte records")
+    return np.frombuffer(body, dtype=DTYPE, offset=HEADER.size)
+
+
+def to_features(records, rules):
+    """Feature matrix of CompiledRules for decoded records, column-major like backtest.encode_table"""
+    features = np.zeros((len(records), len(rules.columns)), dtype=np.float64, order='F')
+    has_writers = records['has_writers'] != 0
+    for name, _ in FIELDS:
+        column = records[name]
+        if name in RULE_CODES:
+            column = RULE_CODES[name][column]
+        features[:, rules.column_index[name]] = column
+    # Like a payload without writersZone: the rules see no writers inputs at all
+    writers_columns = [rules.column_index[spec[0]] for spec in WRITERS_INPUTS]
+    features[np.ix_(~has_writers, writers_columns)] = 0
+    return features
+
+
+def _status_value(name, code):
+    values = STATUS_VALUES[name]
+    return values[code] if code < len(values) else ''
+
+
+# (node or None, field, status vocabulary or None, is a count) per record field, for to_payloads
+_TECHNICAL_LAYOUT = [(node, field, STATUS_VALUES.get(name), False) for name, node, field, _, _ in TECHNICAL_SPECS]
+_WRITERS_LAYOUT = [(None, field, STATUS_VALUES.get(name), kind == COUNT) for name, _, field, _, kind in WRITERS_INPUTS]
+
+
+def to_payloads(records):
+    """JSON payloads that score exactly like the records"""
+    payloads = []
+    split = len(_TECHNICAL_LAYOUT)
+    for values in RECORD.iter_unpack(records.tobytes()):
+        payload = {}
+        for (node, field, statuses, _), value in zip(_TECHNICAL_LAYOUT, values):
+            if statuses is not None:
+                value = statuses[value] if value < len(statuses) else ''
+            if node is None:
+                payload[field] = value
+            else:
+                payload.setdefault(node, {})[field] = value
+        if values[split]:
+            for (_, field, statuses, count), value in zip(_WRITERS_LAYOUT, values[split + 1:]):
+                if statuses is not None:
+                    value = statuses[value] if value < len(statuses) else ''
+                elif count:
+                    value = [0] * value
+                payload[field] = value
+        payloads.append(payload)
+    return payloads
+
+
+def writers_echo(records):
+    """(writers_zone, writers_confidence) each record reports, as the JSON path would"""
+    return [
+        (_status_value('writers_zone', zone), confidence) if has_writers else ('UNKNOWN', 0)
+        for has_writers, zone, confidence in zip(
+            records['has_writers'].tolist(), records['writers_zone'].tolist(), records['writers_confidence'].tolist()
+        )
+    ]
+
+
+def schema():
+    """Layout description for clients in other languages"""
+    return {
+        'content_type': CONTENT_TYPE,
+        'magic': MAGIC.decode(),
+        'fingerprint': FINGERPRINT,
+        'record_size': RECORD.size,
+        'byte_order': 'little',
+        'fields': [{'name': name, 'format': fmt} for name, fmt in FIELDS],
+        'status_codes': {name: list(values) for name, values in STATUS_VALUES.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Binary snapshot layout")
+    parser.add_argument('--schema', action='store_true', help="print the record layout as JSON")
+    args = parser.parse_args()
+    if args.schema:
+        print(json.dumps(schema(), indent=2))
+    else:
+        print(f"{RECORD.size}-byte records, fingerprint {FINGERPRINT:08x}; --schema prints the layout")
+
+
+if __name__ == '__main__':
+    main()